@@ -0,0 +1,196 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+import models
+from change_tracking import bump_data_version
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Activities are queued in memory by the request path and written by a background thread,
+# in batches of up to ACTIVITY_FLUSH_SIZE or every ACTIVITY_FLUSH_INTERVAL_SECONDS.
+ACTIVITY_FLUSH_SIZE = int(os.getenv("ACTIVITY_FLUSH_SIZE", "200"))
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "1.0"))
+ACTIVITY_QUEUE_LIMIT = int(os.getenv("ACTIVITY_QUEUE_LIMIT", "10000"))
+# Activities older than this are deleted hourly; 0 keeps them forever
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "90"))
+ACTIVITY_COMPACT_INTERVAL_SECONDS = 3600
+ACTIVITY_COMPACT_BATCH = 5000
+
+TASK_CREATION = "task_creation"
+TASK_COMPLETION = "task_completion"
+CATEGORY_ADDITION = "category_addition"
+
+def compact_activities(db, retention_days, batch_size=ACTIVITY_COMPACT_BATCH):
+    """Deletes activities older than the retention period in batches. Returns the rows deleted."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = select(models.Activity.id).where(models.Activity.timestamp < cutoff).limit(batch_size)
+        count = db.execute(delete(models.Activity).where(models.Activity.id.in_(ids.scalar_subquery()))).rowcount
+        db.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+def emit_task_activity(user_id, title, before=None, after=None):
+    """Queues the activities for a task write, given its snapshots before and after."""
+    if after is None:
+        return
+    if before is None:
+        activity_log.emit(user_id, TASK_CREATION, f'Created "{title}"')
+    if after.status == "Completed" and (before is None or before.status != "Completed"):
+        activity_log.emit(user_id, TASK_COMPLETION, f'Completed "{title}"')
+
+class ActivityLog:
+    """Write-behind queue for activity events, flushed by one background thread."""
+
+    def __init__(self, session_factory, flush_size, flush_interval, queue_limit, retention_days):
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.queue_limit = queue_limit
+        self.retention_days = retention_days
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.compacted = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_seconds = 0.0
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._next_compaction = 0.0
+
+    def emit(self, user_id, activity_type, description):
+        """Queues an activity; call it after the write it describes has committed."""
+        with self._condition:
+            if len(self._queue) >= self.queue_limit:
+                self.dropped += 1
+                return
+            self._queue.append({
+                "user_id": user_id,
+                "type": activity_type,
+                "description": description,
+                "timestamp": datetime.utcnow(),
+            })
+            self.emitted += 1
+            if len(self._queue) >= self.flush_size:
+                self._condition.notify()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._next_compaction = time.monotonic() + 60
+        self._thread = threading.Thread(target=self._run, name="activity-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stops the flusher after writing everything still queued."""
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _take_batch(self):
+        with self._condition:
+            if len(self._queue) < self.flush_size and not self._stopping:
+                self._condition.wait(self.flush_interval)
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self.flush_size))]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                if not self.flush(batch):
+                    time.sleep(self.flush_interval)
+            elif self._stopping:
+                return
+            if self.retention_days and time.monotonic() >= self._next_compaction and not self._stopping:
+                self._next_compaction = time.monotonic() + ACTIVITY_COMPACT_INTERVAL_SECONDS
+                try:
+                    with self.session_factory() as db:
+                        self.compacted += compact_activities(db, self.retention_days)
+                except Exception:
+                    logger.exception("Activity compaction failed")
+
+    def flush(self, batch):
+        """Writes a batch with one multi-row INSERT and one commit. Returns False on failure."""
+        started = time.perf_counter()
+        try:
+            with self.session_factory() as db:
+                db.execute(insert(models.Activity), batch)
+                # Insights responses include recent activities, so their cache must see these
+                for user_id in sorted({row["user_id"] for row in batch}):
+                    bump_data_version(db, user_id)
+                db.commit()
+        except Exception:
+            self.flush_errors += 1
+            logger.exception("Failed to write %d activities", len(batch))
+            # Put the batch back for the next attempt unless the queue has filled up meanwhile
+            with self._condition:
+                if len(self._queue) + len(batch) <= self.queue_limit and not self._stopping:
+                    self._queue.extendleft(reversed(batch))
+                else:
+                    self.dropped += len(batch)
+            return False
+        elapsed = time.perf_counter() - started
+        self.written += len(batch)
+        self.flushes += 1
+        self._flush_seconds += elapsed
+        self.last_flush_ms = elapsed * 1000
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        return True
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "queue_limit": self.queue_limit,
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._flush_seconds * 1000 / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "compacted": self.compacted,
+        }
+
+activity_log = ActivityLog(
+    SessionLocal,
+    ACTIVITY_FLUSH_SIZE,
+    ACTIVITY_FLUSH_INTERVAL_SECONDS,
+    ACTIVITY_QUEUE_LIMIT,
+    ACTIVITY_RETENTION_DAYS,
+)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply the activity retention policy")
+    parser.add_argument("--days", type=int, default=ACTIVITY_RETENTION_DAYS, help="Keep activities newer than this")
+    args = parser.parse_args(argv)
+    if args.days <= 0:
+        print("Retention is disabled")
+        return 0
+    with SessionLocal() as db:
+        print(f"Deleted {compact_activities(db, args.days)} activities older than {args.days} days")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from cache import TTLCache
+from pool_metrics import WAIT_BUCKETS, Histogram
+from routers.auth import token_subject
+
+# Sheds excess traffic before it reaches the handlers, so one client cannot saturate a
+# worker for everyone else; false removes the middleware
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Concurrent requests per worker by route, as comma-separated `[METHOD ]path-prefix=limit`
+# rules; the first matching rule applies and `*` matches every request
+ADMISSION_LIMITS = os.getenv(
+    "ADMISSION_LIMITS", "POST /users/token=8,POST /users/register=8,*=64"
+)
+# Requests that may wait for a slot under each rule, and for how long, before a 503
+ADMISSION_QUEUE_LIMIT = int(os.getenv("ADMISSION_QUEUE_LIMIT", "64"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2"))
+ADMISSION_RETRY_AFTER_SECONDS = 1
+# Never queued or rate limited. Event streams stay open for hours and are capped per
+# user by EVENTS_MAX_CONNECTIONS_PER_USER instead; health probes must not be shed under load.
+ADMISSION_EXEMPT_PATHS = tuple(
+    path.strip()
+    for path in os.getenv("ADMISSION_EXEMPT_PATHS", "/metrics,/api/events,/healthz,/readyz").split(",")
+    if path.strip()
+)
+
+# Token buckets: requests per second and burst size, per authenticated user and, for
+# requests without a valid token, per client IP; a rate of 0 disables the limit
+RATE_LIMIT_USER_PER_SECOND = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "20"))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", "60"))
+RATE_LIMIT_IP_PER_SECOND = float(os.getenv("RATE_LIMIT_IP_PER_SECOND", "5"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+class Shed(Exception):
+    def __init__(self, status_code, reason, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+class RateLimiter:
+    """Token buckets by key. A bucket left idle until it would be full again is dropped,
+    which is the same as keeping it, so the store only holds recently active keys."""
+
+    def __init__(self, kind, rate, burst, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.kind = kind
+        self.rate = rate
+        self.burst = burst
+        self.limited = 0
+        self._buckets = TTLCache(maxsize=max_keys, ttl=burst / rate if rate > 0 else 0)
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def take(self, key):
+        """Takes a token for `key`, or returns the seconds until one is available."""
+        bucket = self._buckets.get(key)
+        now = time.monotonic()
+        if bucket is None:
+            bucket = TokenBucket(self.burst)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+        bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            self._buckets.set(key, bucket)
+            return 0
+        self._buckets.set(key, bucket)
+        self.limited += 1
+        return (1 - bucket.tokens) / self.rate
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+class ConcurrencyGate:
+    """At most `limit` requests at a time, with up to `queue_limit` waiting in arrival order
+    for at most `queue_timeout` seconds. Runs on the event loop only, so needs no lock."""
+
+    def __init__(self, rule, limit, queue_limit=ADMISSION_QUEUE_LIMIT,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT_SECONDS):
+        self.rule = rule
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed = {"queue_full": 0, "queue_timeout": 0}
+        self.wait = Histogram(WAIT_BUCKETS)
+        self._waiters = deque()
+
+    def _reject(self, reason):
+        self.shed[reason] += 1
+        raise Shed(503, reason, "Server is busy, please retry shortly", ADMISSION_RETRY_AFTER_SECONDS)
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self.wait.observe(0)
+            return
+        if len(self._waiters) >= self.queue_limit:
+            self._reject("queue_full")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so `active` is unchanged
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as error:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the wait ended: pass the slot on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            self._reject("queue_timeout")
+        finally:
+            self.wait.observe(time.perf_counter() - started)
+        self.admitted += 1
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "queue_limit": self.queue_limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "wait_seconds": self.wait.snapshot(),
+        }
+
+def parse_rules(spec):
+    """[(method or None, path prefix or None for `*`, limit)] from an ADMISSION_LIMITS value."""
+    rules = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        target, _, limit = item.rpartition("=")
+        method, _, prefix = target.strip().rpartition(" ")
+        rules.append((method.upper() or None, None if prefix == "*" else prefix, int(limit)))
+    return rules
+
+class AdmissionController:
+    def __init__(self, rules=ADMISSION_LIMITS, exempt_paths=ADMISSION_EXEMPT_PATHS):
+        self.rules = []
+        for method, prefix, limit in parse_rules(rules):
+            name = f"{method + ' ' if method else ''}{prefix or '*'}"
+            self.rules.append((method, prefix, ConcurrencyGate(name, limit)))
+        self.exempt_paths = exempt_paths
+        self.users = RateLimiter("user", RATE_LIMIT_USER_PER_SECOND, RATE_LIMIT_USER_BURST)
+        self.ips = RateLimiter("ip", RATE_LIMIT_IP_PER_SECOND, RATE_LIMIT_IP_BURST)
+
+    def gate(self, method, path):
+        for rule_method, prefix, gate in self.rules:
+            if (rule_method is None or rule_method == method) and (prefix is None or path.startswith(prefix)):
+                return gate
+        return None
+
+    def rate_limit(self, scope):
+        authorization = Headers(scope=scope).get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        username = token_subject(token) if scheme.lower() == "bearer" and token else None
+        if username is not None:
+            limiter, key = self.users, username
+        else:
+            client = scope.get("client")
+            limiter, key = self.ips, client[0] if client else ""
+        if not limiter.enabled:
+            return
+        retry_after = limiter.take(key)
+        if retry_after:
+            raise Shed(429, "rate_limited", "Too many requests", max(1, math.ceil(retry_after)))
+
+    def stats(self):
+        return {
+            "routes": {gate.rule: gate.stats() for _, _, gate in self.rules},
+            "rate_limits": {limiter.kind: limiter.stats() for limiter in (self.users, self.ips)},
+        }
+
+admission_controller = AdmissionController()
+
+class AdmissionMiddleware:
+    """Applies the rate limits, then waits for a concurrency slot of the request's route;
+    requests over either are answered at once with 429 or 503 and a Retry-After header."""
+
+    def __init__(self, app, controller=admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.controller.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.controller.gate(scope["method"], scope["path"])
+        try:
+            self.controller.rate_limit(scope)
+            if gate is not None:
+                await gate.acquire()
+        except Shed as shed:
+            response = JSONResponse(
+                {"detail": shed.detail},
+                status_code=shed.status_code,
+                headers={"Retry-After": str(shed.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if gate is not None:
+                gate.release()
+
+def admission_stats():
+    return admission_controller.stats()
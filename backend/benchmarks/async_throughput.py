@@ -0,0 +1,54 @@
+"""Concurrent request throughput of the async-session routers on a single worker.
+
+    python benchmarks/async_throughput.py --concurrency 32 --duration 10
+
+Run it on two checkouts to compare before/after numbers.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import Client, drive, login, run_server, summarize
+
+REQUESTS = [
+    ("GET", "/insights/"),
+    ("GET", "/reminders/"),
+    ("GET", "/users/me"),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks to create before measuring")
+    args = parser.parse_args()
+
+    with run_server() as (host, port):
+        client = Client(host, port)
+        client.token = login(client, "bench", "bench-password")
+        for i in range(args.tasks):
+            client.request("POST", "/api/tasks/", body={
+                "title": f"Task {i}",
+                "priority": "High" if i % 4 == 0 else "Medium",
+                "status": "Completed" if i % 3 == 0 else "Pending",
+            })
+        for i in range(20):
+            client.request("POST", "/reminders/", body={"content": f"Reminder {i}"})
+        client.close()
+
+        latencies, statuses, elapsed = drive(host, port, client.token, REQUESTS, args.concurrency, args.duration)
+
+    total = sum(len(values) for values in latencies.values())
+    print(json.dumps({
+        "concurrency": args.concurrency,
+        "throughput_rps": round(total / elapsed, 1),
+        "routes": {
+            path: dict(summarize(values, elapsed), statuses=statuses[path])
+            for path, values in latencies.items()
+        },
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import contextlib
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(latencies, elapsed=None):
+    summary = {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+class Client:
+    """Minimal keep-alive HTTP client so benchmarks have no third-party dependencies."""
+
+    def __init__(self, host, port, token=None):
+        self.host = host
+        self.port = port
+        self.token = token
+        self._conn = None
+
+    def request(self, method, path, body=None, form=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif body is not None and not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                return response.status, data, response
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def json(self, method, path, **kwargs):
+        status, data, _ = self.request(method, path, **kwargs)
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def login(client, username, password, email=None):
+    client.request("POST", "/users/register", body={
+        "username": username,
+        "email": email or f"{username}@example.com",
+        "password": password,
+    })
+    status, data = client.json("POST", "/users/token", form={"username": username, "password": password})
+    if status != 200:
+        raise RuntimeError(f"Login failed with {status}: {data}")
+    return data["access_token"]
+
+@contextlib.contextmanager
+def run_server(database_url=None, env=None, args=None, port=None, startup_timeout=30, workers=None):
+    """Starts uvicorn on a fresh SQLite database (unless one is given) and yields (host, port).
+    With `workers`, runs the production launcher (serve.py) with that many processes instead."""
+    port = port or free_port()
+    with tempfile.TemporaryDirectory(prefix="taskflow-bench-") as tmpdir:
+        server_env = dict(os.environ)
+        server_env["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        # Load generators would otherwise be rate limited and shed; opt back in through `env`
+        server_env["ADMISSION_ENABLED"] = "false"
+        server_env.update(env or {})
+        if workers:
+            command = [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1",
+                       "--port", str(port), "--log-level", "warning", *(args or [])]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                       "--port", str(port), "--log-level", "warning", *(args or [])]
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=server_env)
+        try:
+            wait_until_ready("127.0.0.1", port, process, startup_timeout)
+            yield "127.0.0.1", port
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+def wait_until_ready(host, port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            client = Client(host, port)
+            status, _, _ = client.request("GET", "/")
+            client.close()
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time")
+
+def request_label(request):
+    method, path = request[:2]
+    return path if method == "GET" else f"{method} {path}"
+
+def drive(host, port, token, requests, concurrency, duration):
+    """Replays `requests` ((method, path) or (method, path, body)) from `concurrency` threads
+    for `duration` seconds. GET requests are labelled by path, others by "METHOD path".
+
+    Returns ({label: [latency, ...]}, {label: {status: count}}, elapsed_seconds).
+    """
+    import threading
+
+    labels = [request_label(request) for request in requests]
+    latencies = {label: [] for label in labels}
+    statuses = {label: {} for label in labels}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        client = Client(host, port, token)
+        local_latencies = {label: [] for label in labels}
+        local_statuses = {label: {} for label in labels}
+        index = offset
+        while time.monotonic() < deadline:
+            request = requests[index % len(requests)]
+            label = labels[index % len(requests)]
+            index += 1
+            start = time.perf_counter()
+            status, _, _ = client.request(request[0], request[1], body=request[2] if len(request) > 2 else None)
+            local_latencies[label].append(time.perf_counter() - start)
+            local_statuses[label][status] = local_statuses[label].get(status, 0) + 1
+        client.close()
+        with lock:
+            for label, values in local_latencies.items():
+                latencies[label].extend(values)
+                for status, count in local_statuses[label].items():
+                    statuses[label][status] = statuses[label].get(status, 0) + count
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.monotonic() - started
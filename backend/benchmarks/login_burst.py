@@ -0,0 +1,71 @@
+"""Latency of unrelated endpoints while logins hammer the server.
+
+    python benchmarks/login_burst.py --login-concurrency 16 --duration 10
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import Client, login, run_server, summarize
+
+def probe(host, port, token, duration):
+    """Sequentially requests cheap endpoints and records their latency."""
+    client = Client(host, port, token)
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for path in ("/", "/api/tags/"):
+            start = time.perf_counter()
+            client.request("GET", path)
+            latencies.append(time.perf_counter() - start)
+    client.close()
+    return latencies
+
+def hammer_logins(host, port, stop, results):
+    client = Client(host, port)
+    counts = {}
+    while not stop.is_set():
+        status, _, _ = client.request("POST", "/users/token", form={"username": "bench", "password": "bench-password"})
+        counts[status] = counts.get(status, 0) + 1
+    client.close()
+    for status, count in counts.items():
+        results[status] = results.get(status, 0) + count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with run_server() as (host, port):
+        token = login(Client(host, port), "bench", "bench-password")
+
+        idle = summarize(probe(host, port, token, args.duration))
+
+        stop = threading.Event()
+        login_statuses = {}
+        workers = [
+            threading.Thread(target=hammer_logins, args=(host, port, stop, login_statuses))
+            for _ in range(args.login_concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            loaded = summarize(probe(host, port, token, args.duration))
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+
+    print(json.dumps({
+        "unrelated_endpoints_idle": idle,
+        "unrelated_endpoints_during_logins": loaded,
+        "login_statuses": login_statuses,
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Task search latency: full-text index versus a LIKE scan.
+
+    python benchmarks/search_latency.py --tasks 100000
+    python benchmarks/search_latency.py --database-url postgresql://... --tasks 100000
+
+Seeds one user's tasks directly in the database (plus a second user, so the index is
+shared as in production) and times the queries GET /api/tasks/search runs.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import BACKEND_DIR, summarize
+
+WORDS = (
+    "report budget meeting invoice review draft release deploy backup design client "
+    "schedule travel dentist groceries workout refactor migrate interview roadmap "
+    "payroll audit contract launch survey feedback onboarding hiring quarterly weekly"
+).split()
+
+VOCABULARY_SIZE = 20000
+
+# "report" is in most tasks, so ranking it scores nearly every row; "weekly" is in ~5%
+QUERIES = {
+    "frequent word": "report",
+    "common word": "weekly",
+    "two words": "budget review",
+    "prefix": "onboa",
+    "rare word": "zanzibar",
+}
+
+def seed(engine, users, tasks_per_user, batch=5000):
+    from sqlalchemy import insert
+
+    import models
+
+    rng = random.Random(42)
+    # Word frequencies follow a Zipf curve, as in real text: a few words are everywhere,
+    # most are rare. The named words above take the most frequent ranks.
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "so", "de", "pa", "xu", "fe"]
+    vocabulary = list(WORDS)
+    while len(vocabulary) < VOCABULARY_SIZE:
+        vocabulary.append("".join(rng.choices(syllables, k=rng.randint(2, 4))))
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    with engine.begin() as connection:
+        user_ids = [
+            connection.execute(insert(models.User).values(
+                username=f"search{i}", email=f"search{i}@example.com", hashed_password="x"
+            )).inserted_primary_key[0]
+            for i in range(users)
+        ]
+    for user_id in user_ids:
+        for start in range(0, tasks_per_user, batch):
+            rows = []
+            for i in range(start, min(start + batch, tasks_per_user)):
+                title = " ".join(rng.choices(vocabulary, cum_weights=weights, k=3))
+                description = " ".join(rng.choices(vocabulary, cum_weights=weights, k=12))
+                if i % 10000 == 0:
+                    description += " zanzibar"
+                rows.append({"title": title, "description": description, "owner_id": user_id,
+                             "status": "Pending", "priority": "Medium"})
+            with engine.begin() as connection:
+                connection.execute(insert(models.Task), rows)
+    return user_ids[0]
+
+def measure(session_factory, build_query, owner_id, iterations, limit):
+    from task_search import search_terms
+
+    results = {}
+    for name, text in QUERIES.items():
+        latencies = []
+        with session_factory() as db:
+            for _ in range(iterations):
+                start = time.perf_counter()
+                build_query(db, owner_id, search_terms(text)).limit(limit).all()
+                latencies.append(time.perf_counter() - start)
+        results[name] = summarize(latencies)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Database to seed (defaults to a scratch SQLite file)")
+    parser.add_argument("--tasks", type=int, default=100000, help="Tasks per user")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="taskflow-search-") as tmpdir:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'search.db')}"
+        sys.path.insert(0, BACKEND_DIR)
+        import database
+        import migrations
+        from task_search import like_search_query, search_query
+
+        migrations.upgrade(database.engine)
+        started = time.monotonic()
+        owner_id = seed(database.engine, args.users, args.tasks)
+        print(f"Seeded {args.users} x {args.tasks} tasks in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+        report = {
+            "dialect": database.engine.dialect.name,
+            "tasks_per_user": args.tasks,
+            "full_text": measure(database.SessionLocal, search_query, owner_id, args.iterations, args.limit),
+            "like_scan": measure(database.SessionLocal, like_search_query, owner_id, args.iterations, args.limit),
+        }
+        database.engine.dispose()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
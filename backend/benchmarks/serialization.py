@@ -0,0 +1,125 @@
+"""Serialization cost of a task list: response_model validation versus orjson from column rows.
+
+    python benchmarks/serialization.py --tasks 10000
+
+Seeds one user's tasks in a scratch SQLite database and runs both paths GET /api/tasks/
+can take, reporting CPU time per run and the body size raw, gzip and brotli compressed.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import BACKEND_DIR, percentile
+
+def seed(engine, tasks):
+    from sqlalchemy import insert
+
+    import models
+
+    with engine.begin() as connection:
+        user_id = connection.execute(insert(models.User).values(
+            username="serializer", email="serializer@example.com", hashed_password="x"
+        )).inserted_primary_key[0]
+        category_id = connection.execute(insert(models.Category).values(
+            name="Work", color="#2196F3", owner_id=user_id
+        )).inserted_primary_key[0]
+        connection.execute(insert(models.Task), [
+            {
+                "title": f"Task {i}",
+                "description": f"Follow up on item {i} with the team before the weekly review",
+                "status": ("Pending", "In Progress", "Completed")[i % 3],
+                "priority": ("Low", "Medium", "High")[i % 3],
+                "due_date": None if i % 4 == 0 else datetime(2030, 1, i % 28 + 1, 9),
+                "owner_id": user_id,
+                "category_id": category_id if i % 2 else None,
+            }
+            for i in range(tasks)
+        ])
+    return user_id
+
+def model_path(db, owner_id):
+    """What a response_model endpoint does: ORM objects, validation, jsonable_encoder, json."""
+    from typing import List
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    import models
+    from routers.tasks import TaskResponse
+
+    field = create_response_field(name="response", type_=List[TaskResponse])
+    tasks = db.query(models.Task).filter(models.Task.owner_id == owner_id).order_by(models.Task.id).all()
+    content = asyncio.run(serialize_response(field=field, response_content=tasks))
+    return JSONResponse(content).body
+
+def fast_path(db, owner_id):
+    import models
+    from fast_json import dumps
+    from routers.tasks import TASK_RESPONSE_ROW
+
+    rows = db.query(TASK_RESPONSE_ROW).filter(models.Task.owner_id == owner_id).order_by(models.Task.id).all()
+    return dumps(rows)
+
+def measure(session_factory, render, owner_id, iterations):
+    import brotli
+
+    from compression import BROTLI_QUALITY, GZIP_LEVEL
+
+    cpu = []
+    for _ in range(iterations):
+        with session_factory() as db:
+            started = time.process_time()
+            body = render(db, owner_id)
+            cpu.append(time.process_time() - started)
+    started = time.process_time()
+    gzipped = gzip.compress(body, GZIP_LEVEL)
+    gzip_ms = (time.process_time() - started) * 1000
+    started = time.process_time()
+    brotlied = brotli.compress(body, quality=BROTLI_QUALITY)
+    brotli_ms = (time.process_time() - started) * 1000
+    return {
+        "cpu_p50_ms": round(percentile(cpu, 50) * 1000, 2),
+        "cpu_p95_ms": round(percentile(cpu, 95) * 1000, 2),
+        "bytes": len(body),
+        "gzip_bytes": len(gzipped),
+        "gzip_cpu_ms": round(gzip_ms, 2),
+        "brotli_bytes": len(brotlied),
+        "brotli_cpu_ms": round(brotli_ms, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="taskflow-serialize-") as tmpdir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'serialize.db')}"
+        sys.path.insert(0, BACKEND_DIR)
+        import database
+        import migrations
+
+        migrations.upgrade(database.engine)
+        owner_id = seed(database.engine, args.tasks)
+        with database.SessionLocal() as db:
+            if json.loads(model_path(db, owner_id)) != json.loads(fast_path(db, owner_id)):
+                sys.exit("The two paths produced different JSON")
+
+        report = {
+            "tasks": args.tasks,
+            "response_model": measure(database.SessionLocal, model_path, owner_id, args.iterations),
+            "orjson_rows": measure(database.SessionLocal, fast_path, owner_id, args.iterations),
+        }
+        database.engine.dispose()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Concurrent reads and writes against SQLite: the basic profile versus the production profile.
+
+    python benchmarks/sqlite_contention.py --concurrency 32 --duration 10 --workers 4
+
+Runs the same mixed workload against a server started with SQLITE_PROFILE=basic (rollback
+journal, driver defaults, one pool for everything) and SQLITE_PROFILE=production (WAL,
+pragmas, read-only reader pool, one writer connection per process), and counts the failed
+requests. The failures are "database is locked" errors: writes that waited past the busy
+timeout. The production profile must not have any; the script exits with 1 if it does.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import BACKEND_DIR, Client, drive, login, run_server, summarize
+
+SEED_TASKS = 200
+
+def workload(task_ids):
+    return [
+        ("GET", "/api/tasks/?limit=100"),
+        ("POST", "/api/tasks/", {"title": "Contended", "priority": "High"}),
+        ("GET", "/insights/"),
+        ("PUT", f"/api/tasks/{task_ids[0]}", {"status": "In Progress"}),
+        ("GET", "/api/categories/"),
+        ("POST", "/reminders/", {"content": "Contended"}),
+        ("GET", "/reminders/"),
+        ("PATCH", f"/api/tasks/{task_ids[1]}/status", {"status": "Completed"}),
+    ]
+
+def migrated_database(tmpdir, env):
+    # Migrate up front: several workers applying migrations at once would race on startup
+    url = f"sqlite:///{os.path.join(tmpdir, 'contention.db')}"
+    subprocess.run(
+        [sys.executable, "migrations.py", "upgrade"], cwd=BACKEND_DIR,
+        env=dict(os.environ, DATABASE_URL=url, **env), check=True, stdout=subprocess.DEVNULL
+    )
+    return url
+
+def run(profile, concurrency, duration, workers):
+    env = {"SQLITE_PROFILE": profile, "RUN_MIGRATIONS_ON_STARTUP": "false"}
+    with tempfile.TemporaryDirectory(prefix="taskflow-contention-") as tmpdir, run_server(
+        database_url=migrated_database(tmpdir, env), env=env, args=["--workers", str(workers)]
+    ) as (host, port):
+        client = Client(host, port)
+        client.token = login(client, "contention", "contention-password")
+        client.request("POST", "/api/categories/", body={"name": "Work", "color": "#2196F3"})
+        task_ids = [
+            client.json("POST", "/api/tasks/", body={"title": f"Task {i}"})[1]["id"]
+            for i in range(SEED_TASKS)
+        ]
+        client.close()
+        latencies, statuses, elapsed = drive(host, port, client.token, workload(task_ids), concurrency, duration)
+
+    total = sum(len(values) for values in latencies.values())
+    failed = sum(count for route in statuses.values() for status, count in route.items() if status >= 500)
+    return {
+        "throughput_rps": round(total / elapsed, 1),
+        "requests": total,
+        "failed": failed,
+        "routes": {
+            label: dict(summarize(values, elapsed), statuses=statuses[label])
+            for label, values in latencies.items()
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--profile", choices=["basic", "production"], action="append",
+                        help="Profiles to run (default: both)")
+    args = parser.parse_args()
+
+    report = {"concurrency": args.concurrency, "workers": args.workers}
+    for profile in args.profile or ["basic", "production"]:
+        report[profile] = run(profile, args.concurrency, args.duration, args.workers)
+    print(json.dumps(report, indent=2))
+    if report.get("production", {}).get("failed"):
+        print(f"production profile: {report['production']['failed']} failed requests", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
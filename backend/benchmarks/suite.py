@@ -0,0 +1,344 @@
+"""Throughput and p50/p95/p99 latency of every API route against a seeded database.
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json --threshold 0.25
+    python benchmarks/suite.py --routes tasks --users 50 --tasks 2000 --concurrency 32
+
+Seeds a scratch SQLite database with bulk inserts (users, categories, tags, tasks with tag
+links, reminders and activities), starts uvicorn on it and drives each route on its own at
+the given concurrency, after a short warm-up. Everything runs offline. With --compare, the
+run exits non-zero when a route's p95 latency grew, or its throughput fell, by more than the
+threshold relative to the saved results.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import BACKEND_DIR, Client, run_server, summarize
+
+PASSWORD = "bench-password"
+STATUSES = ("Pending", "In Progress", "Completed")
+PRIORITIES = ("Low", "Medium", "High")
+FORM = {"Content-Type": "application/x-www-form-urlencoded"}
+WORDS = ("report", "invoice", "review", "meeting", "deploy", "budget", "design", "follow-up", "draft", "call")
+
+def seed(database_url, users, tasks, categories, tags, reminders, seed_value=1):
+    """Fills a fresh database through executemany INSERTs and rebuilds the counters the
+    routers maintain incrementally. Returns the benchmark user's ids by entity."""
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert, select
+
+    import database
+    import migrations
+    import models
+    from password_hashing import pwd_context
+    from task_counters import rebuild_counters, rebuild_weekly_stats
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    migrations.upgrade(database.engine)
+    hashed = pwd_context.hash(PASSWORD)
+
+    with database.engine.begin() as connection:
+        connection.execute(insert(models.User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed}
+            for i in range(users)
+        ])
+        user_ids = connection.scalars(select(models.User.id).order_by(models.User.id)).all()
+        connection.execute(insert(models.Category), [
+            {"name": f"Category {i}", "color": "#2196F3", "owner_id": user_id}
+            for user_id in user_ids for i in range(categories)
+        ])
+        connection.execute(insert(models.Tag), [
+            {"name": f"#tag{i}", "color": "#F44336", "owner_id": user_id}
+            for user_id in user_ids for i in range(tags)
+        ])
+        category_ids, tag_ids = {}, {}
+        for row in connection.execute(select(models.Category.id, models.Category.owner_id)):
+            category_ids.setdefault(row.owner_id, []).append(row.id)
+        for row in connection.execute(select(models.Tag.id, models.Tag.owner_id)):
+            tag_ids.setdefault(row.owner_id, []).append(row.id)
+
+        for user_id in user_ids:
+            connection.execute(insert(models.Task), [
+                {
+                    "title": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}",
+                    "description": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)} before the weekly review",
+                    "status": rng.choice(STATUSES),
+                    "priority": rng.choice(PRIORITIES),
+                    "due_date": None if i % 4 == 0 else now + timedelta(days=rng.randint(-30, 60)),
+                    "created_at": now - timedelta(days=rng.randint(0, 90)),
+                    "owner_id": user_id,
+                    "category_id": rng.choice(category_ids[user_id]) if categories and i % 3 else None,
+                }
+                for i in range(tasks)
+            ])
+        task_ids = {}
+        for row in connection.execute(select(models.Task.id, models.Task.owner_id)):
+            task_ids.setdefault(row.owner_id, []).append(row.id)
+        if tags:
+            connection.execute(insert(models.task_tags), [
+                {"task_id": task_id, "tag_id": tag_id}
+                for user_id, ids in task_ids.items()
+                for task_id in ids
+                for tag_id in rng.sample(tag_ids[user_id], min(len(tag_ids[user_id]), rng.randint(0, 2)))
+            ])
+        if reminders:
+            connection.execute(insert(models.Reminder), [
+                {"content": f"Reminder {i}", "user_id": user_id}
+                for user_id in user_ids for i in range(reminders)
+            ])
+        connection.execute(insert(models.Activity), [
+            {"type": "task_creation", "description": f'Created "Task {i}"', "user_id": user_id,
+             "timestamp": now - timedelta(hours=i)}
+            for user_id in user_ids for i in range(20)
+        ])
+
+    with database.SessionLocal() as db:
+        rebuild_counters(db)
+        rebuild_weekly_stats(db)
+        db.commit()
+    database.engine.dispose()
+
+    user_id = user_ids[0]
+    return {
+        "username": "user0",
+        "tasks": task_ids.get(user_id, []),
+        "categories": category_ids.get(user_id, []),
+        "tags": tag_ids.get(user_id, []),
+    }
+
+class Context:
+    """Per-thread state for building requests: the thread's client, the seeded ids and a
+    source of unique names. Setup requests made here are not timed."""
+
+    _counter = itertools.count()
+
+    def __init__(self, client, seeded, rng):
+        self.client = client
+        self.seeded = seeded
+        self.rng = rng
+        self.sync_token = None
+
+    def unique(self, prefix):
+        return f"{prefix}-{next(self._counter)}"
+
+    def task_id(self):
+        return self.rng.choice(self.seeded["tasks"])
+
+    def tag_id(self):
+        return self.rng.choice(self.seeded["tags"])
+
+    def category_id(self):
+        return self.rng.choice(self.seeded["categories"])
+
+    def create(self, path, body):
+        status, data = self.client.json("POST", path, body=body)
+        if status not in (200, 201):
+            raise RuntimeError(f"Setup request POST {path} failed with {status}: {data}")
+        return data["id"]
+
+    def delta_since(self):
+        if self.sync_token is None:
+            _, snapshot = self.client.json("GET", f"/api/sync/?client_id={id(self)}")
+            self.sync_token = snapshot["token"]
+        return f"/api/sync/?client_id={id(self)}&since={self.sync_token}"
+
+def import_body(ctx):
+    lines = [json.dumps({"title": ctx.unique("Imported"), "priority": "Low"}) for _ in range(50)]
+    return ("\n".join(lines) + "\n").encode()
+
+def attach_tag(ctx):
+    task_id, tag_id = ctx.task_id(), ctx.tag_id()
+    ctx.client.request("POST", f"/api/tasks/{task_id}/tags/{tag_id}")
+    return "DELETE", f"/api/tasks/{task_id}/tags/{tag_id}"
+
+# Label -> function(ctx) returning (method, path[, body[, headers]]). Reads come first, so
+# the rows written by later routes don't change what earlier ones measure.
+ROUTES = {
+    "GET /": lambda ctx: ("GET", "/"),
+    "GET /readyz": lambda ctx: ("GET", "/readyz"),
+    "GET /users/me": lambda ctx: ("GET", "/users/me"),
+    "GET /users/all": lambda ctx: ("GET", "/users/all"),
+    "GET /api/tasks/": lambda ctx: ("GET", "/api/tasks/?limit=100"),
+    "GET /api/tasks/ filtered": lambda ctx: ("GET", "/api/tasks/?status=Pending&priority=High&sort=due_date&limit=50"),
+    "GET /api/tasks/ offset": lambda ctx: ("GET", f"/api/tasks/?skip={ctx.rng.randint(0, 200)}&limit=50"),
+    "GET /api/tasks/search": lambda ctx: ("GET", f"/api/tasks/search?q={ctx.rng.choice(WORDS)}"),
+    "GET /api/tasks/export": lambda ctx: ("GET", "/api/tasks/export"),
+    "GET /api/tasks/{task_id}": lambda ctx: ("GET", f"/api/tasks/{ctx.task_id()}"),
+    "GET /api/categories/": lambda ctx: ("GET", "/api/categories/"),
+    "GET /api/categories/{category_id}": lambda ctx: ("GET", f"/api/categories/{ctx.category_id()}"),
+    "GET /api/tags/": lambda ctx: ("GET", "/api/tags/"),
+    "GET /api/tags/{tag_id}": lambda ctx: ("GET", f"/api/tags/{ctx.tag_id()}"),
+    "GET /insights/": lambda ctx: ("GET", "/insights/"),
+    "GET /reminders/": lambda ctx: ("GET", "/reminders/"),
+    "GET /api/sync/ snapshot": lambda ctx: ("GET", f"/api/sync/?client_id={ctx.unique('client')}"),
+    "GET /api/sync/ delta": lambda ctx: ("GET", ctx.delta_since()),
+    "POST /users/token": lambda ctx: ("POST", "/users/token", urlencode({"username": ctx.seeded["username"], "password": PASSWORD}), FORM),
+    "POST /users/register": lambda ctx: ("POST", "/users/register", {
+        "username": (name := ctx.unique("bench")), "email": f"{name}@example.com", "password": PASSWORD,
+    }),
+    "POST /api/tasks/": lambda ctx: ("POST", "/api/tasks/", {"title": ctx.unique("Task"), "priority": "High"}),
+    "PUT /api/tasks/{task_id}": lambda ctx: ("PUT", f"/api/tasks/{ctx.task_id()}", {
+        "title": ctx.unique("Renamed"), "priority": ctx.rng.choice(PRIORITIES),
+    }),
+    "PATCH /api/tasks/{task_id}/status": lambda ctx: ("PATCH", f"/api/tasks/{ctx.task_id()}/status", {
+        "status": ctx.rng.choice(STATUSES),
+    }),
+    "DELETE /api/tasks/{task_id}": lambda ctx: ("DELETE", f"/api/tasks/{ctx.create('/api/tasks/', {'title': 'Doomed'})}"),
+    "POST /api/tasks/bulk": lambda ctx: ("POST", "/api/tasks/bulk", {"operations": [
+        *({"op": "create", "task": {"title": ctx.unique("Bulk")}} for _ in range(5)),
+        *({"op": "status", "id": ctx.task_id(), "status": ctx.rng.choice(STATUSES)} for _ in range(5)),
+    ]}),
+    "POST /api/tasks/import": lambda ctx: ("POST", "/api/tasks/import", import_body(ctx), {"Content-Type": "application/x-ndjson"}),
+    "POST /api/tasks/tags/attach": lambda ctx: ("POST", "/api/tasks/tags/attach", {
+        "task_ids": [ctx.task_id() for _ in range(10)], "tag_ids": [ctx.tag_id()],
+    }),
+    "POST /api/tasks/tags/detach": lambda ctx: ("POST", "/api/tasks/tags/detach", {
+        "task_ids": [ctx.task_id() for _ in range(10)], "tag_ids": [ctx.tag_id()],
+    }),
+    "POST /api/tasks/{task_id}/tags/{tag_id}": lambda ctx: ("POST", f"/api/tasks/{ctx.task_id()}/tags/{ctx.tag_id()}"),
+    "DELETE /api/tasks/{task_id}/tags/{tag_id}": attach_tag,
+    "POST /api/categories/": lambda ctx: ("POST", "/api/categories/", {"name": ctx.unique("Category"), "color": "#4CAF50"}),
+    "PUT /api/categories/{category_id}": lambda ctx: ("PUT", f"/api/categories/{ctx.category_id()}", {
+        "name": ctx.unique("Category"), "color": "#4CAF50",
+    }),
+    "DELETE /api/categories/{category_id}": lambda ctx: ("DELETE", f"/api/categories/{ctx.create('/api/categories/', {'name': 'Doomed', 'color': '#000000'})}"),
+    "POST /api/tags/": lambda ctx: ("POST", "/api/tags/", {"name": ctx.unique("tag"), "color": "#FF9800"}),
+    "PUT /api/tags/{tag_id}": lambda ctx: ("PUT", f"/api/tags/{ctx.tag_id()}", {"name": ctx.unique("tag"), "color": "#FF9800"}),
+    "DELETE /api/tags/{tag_id}": lambda ctx: ("DELETE", f"/api/tags/{ctx.create('/api/tags/', {'name': 'doomed', 'color': '#000000'})}"),
+    "POST /reminders/": lambda ctx: ("POST", "/reminders/", {"content": ctx.unique("Reminder")}),
+    "PUT /reminders/{reminder_id}": lambda ctx: ("PUT", f"/reminders/{ctx.seeded['reminder']}", {"content": ctx.unique("Reminder")}),
+    "DELETE /reminders/{reminder_id}": lambda ctx: ("DELETE", f"/reminders/{ctx.create('/reminders/', {'content': 'Doomed'})}"),
+}
+
+def run_route(host, port, token, seeded, prepare, concurrency, duration, warmup):
+    """Drives one route from `concurrency` threads; requests in the first `warmup` seconds
+    are not counted. Returns (latencies, statuses, measured_seconds)."""
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    measure_from = time.monotonic() + warmup
+    deadline = measure_from + duration
+
+    def worker(index):
+        client = Client(host, port, token)
+        ctx = Context(client, seeded, random.Random(index))
+        local_latencies, local_statuses = [], {}
+        while time.monotonic() < deadline:
+            method, path, body, headers = (*prepare(ctx), None, None)[:4]
+            measured = time.monotonic() >= measure_from
+            started = time.perf_counter()
+            status, _, _ = client.request(method, path, body=body, headers=headers)
+            elapsed = time.perf_counter() - started
+            if measured:
+                local_latencies.append(elapsed)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+        client.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, max(time.monotonic() - measure_from, 1e-9)
+
+def compare(results, baseline, threshold):
+    """Routes whose p95 latency rose or throughput fell by more than `threshold`."""
+    regressions = []
+    for label, current in results["routes"].items():
+        before = baseline.get("routes", {}).get(label)
+        if not before or not before.get("requests") or not current.get("requests"):
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {before['p95_ms']} ms -> {current['p95_ms']} ms")
+        if before["throughput_rps"] and current["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{label}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=500, help="Tasks per user")
+    parser.add_argument("--categories", type=int, default=8, help="Categories per user")
+    parser.add_argument("--tags", type=int, default=10, help="Tags per user")
+    parser.add_argument("--reminders", type=int, default=20, help="Reminders per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="Measured seconds per route")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds per route")
+    parser.add_argument("--routes", default=None, help="Only routes whose label matches this regex")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON file from an earlier --output")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra server environment, e.g. --env FAST_JSON_RESPONSES=true")
+    args = parser.parse_args(argv)
+
+    routes = {
+        label: prepare for label, prepare in ROUTES.items()
+        if args.routes is None or re.search(args.routes, label)
+    }
+    env = dict(item.split("=", 1) for item in args.env)
+    env["RUN_MIGRATIONS_ON_STARTUP"] = "false"
+
+    with tempfile.TemporaryDirectory(prefix="taskflow-suite-") as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'suite.db')}"
+        started = time.monotonic()
+        seeded = seed(database_url, args.users, args.tasks, args.categories, args.tags, args.reminders)
+        seed_seconds = time.monotonic() - started
+
+        results = {
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "seed_seconds": round(seed_seconds, 2),
+            "routes": {},
+        }
+        with run_server(database_url=database_url, env=env) as (host, port):
+            client = Client(host, port)
+            status, data = client.json("POST", "/users/token", form={"username": seeded["username"], "password": PASSWORD})
+            if status != 200:
+                sys.exit(f"Login failed with {status}: {data}")
+            client.token = data["access_token"]
+            _, reminders = client.json("GET", "/reminders/")
+            seeded["reminder"] = reminders[0]["id"] if reminders else Context(client, seeded, None).create("/reminders/", {"content": "Kept"})
+            client.close()
+
+            for label, prepare in routes.items():
+                latencies, statuses, elapsed = run_route(
+                    host, port, client.token, seeded, prepare, args.concurrency, args.duration, args.warmup
+                )
+                results["routes"][label] = dict(summarize(latencies, elapsed), statuses=statuses)
+                print(f"{label:45s} {results['routes'][label].get('throughput_rps', 0):8.1f} req/s  "
+                      f"p50 {results['routes'][label]['p50_ms']:8.2f}  p95 {results['routes'][label]['p95_ms']:8.2f}  "
+                      f"p99 {results['routes'][label]['p99_ms']:8.2f} ms  {statuses}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        print(f"{len(regressions)} regressions beyond {args.threshold:.0%}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
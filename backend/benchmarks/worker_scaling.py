@@ -0,0 +1,95 @@
+"""Throughput of the production launcher (serve.py) from one worker up to one per CPU.
+
+    python benchmarks/worker_scaling.py --workers 1,2,4 --concurrency 64 --duration 10
+
+Starts serve.py with each worker count on a seeded SQLite database (production profile)
+and drives a read-heavy mix from several load processes, so the client is not limited by
+one GIL. The load generator shares the machine with the server: for figures past half the
+cores, run the server elsewhere and point the same requests at it.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import Client, drive, login, run_server, summarize
+
+REQUESTS = [
+    ("GET", "/api/tasks/?limit=100"),
+    ("GET", "/insights/"),
+    ("GET", "/api/categories/"),
+    ("GET", "/users/me"),
+    ("POST", "/api/tasks/", {"title": "Scaling", "priority": "High"}),
+]
+
+def default_worker_counts():
+    cpus = os.cpu_count() or 1
+    counts = []
+    count = 1
+    while count < cpus:
+        counts.append(count)
+        count *= 2
+    return counts + [cpus]
+
+def load(job):
+    host, port, token, concurrency, duration = job
+    return drive(host, port, token, REQUESTS, concurrency, duration)
+
+def run(workers, concurrency, duration, processes, tasks):
+    env = {"SQLITE_PROFILE": "production", "SERVER_MAX_REQUESTS": "0"}
+    with run_server(env=env, workers=workers) as (host, port):
+        client = Client(host, port)
+        client.token = login(client, "scaling", "scaling-password")
+        client.request("POST", "/api/categories/", body={"name": "Work", "color": "#2196F3"})
+        for i in range(tasks):
+            client.request("POST", "/api/tasks/", body={"title": f"Task {i}"})
+        client.close()
+        # Let every worker finish booting before measuring
+        time.sleep(1)
+
+        per_process = max(1, concurrency // processes)
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(load, [(host, port, client.token, per_process, duration)] * processes)
+
+    latencies = {}
+    statuses = {}
+    for route_latencies, route_statuses, _ in results:
+        for label, values in route_latencies.items():
+            latencies.setdefault(label, []).extend(values)
+        for label, counts in route_statuses.items():
+            merged = statuses.setdefault(label, {})
+            for status, count in counts.items():
+                merged[status] = merged.get(status, 0) + count
+    elapsed = max(result[2] for result in results)
+    every = [value for values in latencies.values() for value in values]
+    return dict(
+        summarize(every, elapsed),
+        failed=sum(count for counts in statuses.values() for status, count in counts.items() if status >= 500),
+        routes={label: summarize(values, elapsed) for label, values in latencies.items()},
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default=None, help="Comma-separated worker counts (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent connections in total")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--load-processes", type=int, default=max(2, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks to create before measuring")
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.workers.split(",")] if args.workers else default_worker_counts()
+    report = {"cpus": os.cpu_count(), "concurrency": args.concurrency, "runs": {}}
+    baseline = None
+    for workers in counts:
+        result = run(workers, args.concurrency, args.duration, args.load_processes, args.tasks)
+        baseline = baseline or result["throughput_rps"]
+        result["speedup"] = round(result["throughput_rps"] / baseline, 2) if baseline else None
+        report["runs"][workers] = result
+        print(f"{workers} workers: {result['throughput_rps']} req/s, {result['speedup']}x", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
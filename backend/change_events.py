@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+import database
+import fast_json
+import models
+from change_tracking import CHANGES_PENDING
+from pool_metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Changes committed by other worker processes are picked up this often while any client
+# is connected; this worker's own commits are sent right away
+EVENTS_POLL_INTERVAL_SECONDS = float(os.getenv("EVENTS_POLL_INTERVAL_SECONDS", "1.0"))
+# A comment line sent on idle streams so proxies keep them open
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+# Undelivered events a connection may fall behind by before it is dropped as too slow
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+EVENTS_MAX_CONNECTIONS_PER_USER = int(os.getenv("EVENTS_MAX_CONNECTIONS_PER_USER", "5"))
+EVENTS_BATCH_SIZE = 1000
+# Beyond this many connected users the change log is read without a user filter
+EVENTS_USER_FILTER_LIMIT = 500
+# Ids a late commit may land below ones already read. SQLite serializes writers, so its
+# ids always commit in order; other databases may commit concurrent transactions out of order.
+EVENTS_REORDER_WINDOW = 0 if database.DATABASE_URL.startswith("sqlite") else 1000
+
+DELIVERY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Subscriber:
+    __slots__ = ("user_id", "queue", "dropped")
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+        self.dropped = False
+
+def change_frame(token, rows):
+    """One SSE `changes` event for a user's change_log rows: the latest op per entity,
+    grouped, and the sync token that covers them."""
+    latest = {}
+    for row in rows:
+        latest[(row.entity, row.entity_id)] = row.op
+    grouped = defaultdict(list)
+    for (entity, entity_id), op in latest.items():
+        grouped[(entity, op)].append(entity_id)
+    payload = {
+        "token": str(token),
+        "changes": [{"entity": entity, "op": op, "ids": ids} for (entity, op), ids in grouped.items()],
+    }
+    return b"id: %d\nevent: changes\ndata: %s\n\n" % (token, fast_json.dumps(payload))
+
+class ChangeHub:
+    """Fans change_log rows out to the event streams of their users.
+
+    One relay task per worker reads new rows while anyone is connected: right after a
+    commit of this process that recorded changes, and every EVENTS_POLL_INTERVAL_SECONDS
+    for commits of other processes. Runs on the event loop, except wake()."""
+
+    def __init__(self):
+        self.published = 0
+        self.dropped = 0
+        self.connections_total = 0
+        self.polls = 0
+        self.delivery = Histogram(DELIVERY_BUCKETS)
+        self._subscribers = defaultdict(set)
+        self._delivered = {}
+        self._cursor = None
+        self._loop = None
+        self._wake = None
+        self._woken_at = None
+        self._task = None
+
+    @property
+    def connections(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def subscribe(self, user_id):
+        """A Subscriber for the user's stream, or None when the user has too many open.
+        It receives changes committed from now on."""
+        if len(self._subscribers.get(user_id, ())) >= EVENTS_MAX_CONNECTIONS_PER_USER:
+            return None
+        if self._cursor is None:
+            async with database.async_read_engine.connect() as connection:
+                cursor = await connection.scalar(select(func.max(models.ChangeLog.id))) or 0
+            # Another subscriber may have read it meanwhile; the lower value misses nothing
+            if self._cursor is None:
+                self._cursor = cursor
+        subscriber = Subscriber(user_id)
+        self._subscribers[user_id].add(subscriber)
+        self._delivered.setdefault(user_id, self._cursor)
+        self.connections_total += 1
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._relay())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscribers = self._subscribers.get(subscriber.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[subscriber.user_id]
+            self._delivered.pop(subscriber.user_id, None)
+            if not self._subscribers and self._wake is not None:
+                # Let the relay see it has nobody left to serve
+                self._wake.set()
+
+    def wake(self):
+        """Reads the change log now; called after commits that recorded changes, on any thread."""
+        loop = self._loop
+        if loop is None or not self._subscribers:
+            return
+        if self._woken_at is None:
+            self._woken_at = time.perf_counter()
+        try:
+            loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:  # the loop has closed
+            pass
+
+    def close(self):
+        """Ends every open stream, when the worker shuts down. EventSource clients reconnect,
+        to another worker, and reload."""
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                try:
+                    subscriber.queue.put_nowait(None)
+                except asyncio.QueueFull:
+                    # Behind anyway: it ends with an overflow event once its queue is read
+                    subscriber.dropped = True
+
+    def delivered(self, published_at):
+        self.delivery.observe(time.perf_counter() - published_at)
+
+    async def _relay(self):
+        try:
+            while self._subscribers:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), EVENTS_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                if not self._subscribers:
+                    break
+                published_at = self._woken_at or time.perf_counter()
+                self._woken_at = None
+                try:
+                    await self._poll(published_at)
+                except Exception:
+                    logger.exception("Reading the change log for event streams failed")
+        finally:
+            # The next subscriber reads the cursor afresh, skipping what nobody was connected for
+            self._task = None
+            if not self._subscribers:
+                self._cursor = None
+
+    async def _poll(self, published_at):
+        log = models.ChangeLog
+        async with database.async_read_engine.connect() as connection:
+            self.polls += 1
+            after = self._cursor - EVENTS_REORDER_WINDOW
+            rows_by_user = defaultdict(list)
+            while True:
+                query = (
+                    select(log.id, log.user_id, log.entity, log.entity_id, log.op)
+                    .where(log.id > after)
+                    .order_by(log.id)
+                    .limit(EVENTS_BATCH_SIZE)
+                )
+                if len(self._subscribers) <= EVENTS_USER_FILTER_LIMIT:
+                    query = query.where(log.user_id.in_(list(self._subscribers)))
+                rows = (await connection.execute(query)).all()
+                for row in rows:
+                    # Each user's ids commit in order, so anything at or below the last one
+                    # delivered has been sent already
+                    if row.id > self._delivered.get(row.user_id, row.id):
+                        rows_by_user[row.user_id].append(row)
+                if rows:
+                    after = rows[-1].id
+                    self._cursor = max(self._cursor, after)
+                if len(rows) < EVENTS_BATCH_SIZE:
+                    break
+
+        for user_id, rows in rows_by_user.items():
+            token = rows[-1].id
+            if user_id in self._delivered:
+                self._delivered[user_id] = token
+            self._publish(user_id, change_frame(token, rows), published_at)
+
+    def _publish(self, user_id, frame, published_at):
+        for subscriber in list(self._subscribers.get(user_id, ())):
+            try:
+                subscriber.queue.put_nowait((published_at, frame))
+                self.published += 1
+            except asyncio.QueueFull:
+                # The client is not reading; it reconnects and reloads rather than stall fan-out
+                subscriber.dropped = True
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+
+    def stats(self):
+        return {
+            "connections": self.connections,
+            "users": len(self._subscribers),
+            "connections_total": self.connections_total,
+            "published": self.published,
+            "dropped": self.dropped,
+            "polls": self.polls,
+            "delivery_seconds": self.delivery.snapshot(),
+        }
+
+change_hub = ChangeHub()
+
+@event.listens_for(Session, "after_commit")
+def _wake_hub(session):
+    if session.info.pop(CHANGES_PENDING, False):
+        change_hub.wake()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(CHANGES_PENDING, None)
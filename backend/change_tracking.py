@@ -0,0 +1,125 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import Select, delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+from database import dialect_insert
+
+# Entities a sync client mirrors, as recorded in change_log.entity
+TASK = "task"
+CATEGORY = "category"
+TAG = "tag"
+REMINDER = "reminder"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Session.info flag of a transaction that recorded changes; event streams are woken when it commits
+CHANGES_PENDING = "changes_pending"
+
+# Sync clients not seen for this long are forgotten; they get a full snapshot when they return
+SYNC_CLIENT_TTL_DAYS = int(os.getenv("SYNC_CLIENT_TTL_DAYS", "30"))
+
+def _version_statement(db, user_id: int):
+    versions = models.UserDataVersion
+    statement = dialect_insert(db, versions).values(user_id=user_id, version=1)
+    return statement.on_conflict_do_update(
+        index_elements=[versions.user_id],
+        set_={"version": versions.version + 1},
+    )
+
+def _change_statement(user_id: int, entity: str, ids, op: str):
+    """INSERT for change_log rows; `ids` is a list of ids or a SELECT of one id column."""
+    columns = ["user_id", "entity", "entity_id", "op"]
+    if isinstance(ids, Select):
+        entity_ids = ids.subquery()
+        rows = select(literal(user_id), literal(entity), entity_ids.c[0], literal(op))
+        return insert(models.ChangeLog).from_select(columns, rows), None
+    rows = [{"user_id": user_id, "entity": entity, "entity_id": entity_id, "op": op} for entity_id in ids]
+    return (insert(models.ChangeLog), rows) if rows else (None, None)
+
+def bump_data_version(db: Session, user_id: int):
+    """Marks the user's data as changed; runs inside the caller's transaction."""
+    db.execute(_version_statement(db, user_id))
+
+def record_changes(db: Session, user_id: int, entity: str, ids, op: str = UPSERT):
+    """Bumps the user's data version and appends the changed ids to the change log.
+
+    The version row is written first: it stays locked until commit, so one user's
+    change_log ids are handed out in commit order and sync tokens never skip a change.
+    """
+    db.execute(_version_statement(db, user_id))
+    statement, rows = _change_statement(user_id, entity, ids, op)
+    if statement is not None:
+        db.execute(statement, rows)
+        db.info[CHANGES_PENDING] = True
+
+async def record_changes_async(db: AsyncSession, user_id: int, entity: str, ids, op: str = UPSERT):
+    await db.execute(_version_statement(db, user_id))
+    statement, rows = _change_statement(user_id, entity, ids, op)
+    if statement is not None:
+        await db.execute(statement, rows)
+        db.info[CHANGES_PENDING] = True
+
+def _version_query(user_id: int):
+    return select(models.UserDataVersion.version).where(models.UserDataVersion.user_id == user_id)
+
+def get_data_version(db: Session, user_id: int) -> int:
+    return db.scalar(_version_query(user_id)) or 0
+
+async def get_data_version_async(db: AsyncSession, user_id: int) -> int:
+    return (await db.scalar(_version_query(user_id))) or 0
+
+def compact_change_log(db: Session, user_id=None):
+    """Forgets stale sync clients, then deletes the change_log rows every remaining client
+    of the user has already synced past. Returns the number of rows deleted."""
+    clients = models.SyncClient
+    log = models.ChangeLog
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_CLIENT_TTL_DAYS)
+    forget = delete(clients).where(clients.last_seen < cutoff)
+    if user_id is not None:
+        forget = forget.where(clients.user_id == user_id)
+    db.execute(forget)
+
+    horizons = select(clients.user_id, func.min(clients.token).label("token")).group_by(clients.user_id)
+    if user_id is not None:
+        horizons = horizons.where(clients.user_id == user_id)
+    deleted = 0
+    synced_users = []
+    for client_user_id, token in db.execute(horizons).all():
+        synced_users.append(client_user_id)
+        deleted += db.execute(delete(log).where(log.user_id == client_user_id, log.id <= token)).rowcount
+
+    # Without clients nobody needs the log; recent rows are kept in case a first sync
+    # is registering its client right now
+    unsynced = delete(log).where(log.changed_at < datetime.utcnow() - timedelta(hours=1))
+    if user_id is None:
+        unsynced = unsynced.where(log.user_id.notin_(select(clients.user_id)))
+    elif user_id not in synced_users:
+        unsynced = unsynced.where(log.user_id == user_id)
+    else:
+        unsynced = None
+    if unsynced is not None:
+        deleted += db.execute(unsynced).rowcount
+    db.commit()
+    return deleted
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact the sync change log")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--user", type=int, default=None, help="Limit to a single user id")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        print(f"Deleted {compact_change_log(db, args.user)} change log rows")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
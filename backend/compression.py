@@ -0,0 +1,109 @@
+import os
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+# Response bodies at least this large are compressed with brotli or gzip, whichever the
+# client prefers (brotli on a tie); 0 disables compression
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Levels tuned for dynamic responses: most of the size win for a fraction of the CPU
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+
+# Event streams are left alone: compressors hold data back, which would delay events
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+def choose_encoding(accept_encoding):
+    """Picks "br" or "gzip" from an Accept-Encoding header, or None."""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip()] = quality
+    best = max(("br", "gzip"), key=lambda name: weights.get(name, weights.get("*", 0.0)))
+    return best if weights.get(best, weights.get("*", 0.0)) > 0 else None
+
+class _Compressor:
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            # wbits 31 writes the gzip container rather than a raw zlib stream
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._brotli.process(data) if self._brotli else self._zlib.compress(data)
+
+    def finish(self):
+        return self._brotli.finish() if self._brotli else self._zlib.flush()
+
+class CompressionMiddleware:
+    """Compresses responses of COMPRESSIBLE_TYPES that are streamed or at least
+    `minimum_size` bytes long."""
+
+    def __init__(self, app, minimum_size=COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.minimum_size:
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk decides whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                if (
+                    "content-encoding" not in headers
+                    and content_type in COMPRESSIBLE_TYPES
+                    and (more_body or len(body) >= self.minimum_size)
+                ):
+                    compressor = _Compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body:
+                        del headers["content-length"]
+                    else:
+                        body = compressor.compress(body) + compressor.finish()
+                        headers["Content-Length"] = str(len(body))
+                        await send(start)
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                await send(start)
+                start = None
+            if compressor is None:
+                await send(message)
+                return
+            body = compressor.compress(message.get("body", b""))
+            more_body = message.get("more_body", False)
+            if not more_body:
+                body += compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,9 +1,19 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.util import await_only
+import asyncio
 import os
+import sqlite3
+import threading
 from dotenv import load_dotenv
 
+from pool_metrics import InstrumentedAsyncPool, InstrumentedQueuePool, instrument
+
 load_dotenv()
 
 # Get database URL from environment variable, fallback to SQLite for local development
@@ -13,15 +23,274 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/taskflow.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
+# Async drivers used for the same database by the async routers
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def get_async_database_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# Connection pools of the PostgreSQL engines and the production SQLite ones. Connections are
+# recycled after DB_POOL_RECYCLE seconds (-1 never) and, with DB_POOL_PRE_PING, tested
+# before use so one dropped by the server is replaced instead of failing a request.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+def pool_options(is_async=False, **overrides):
+    """create_engine arguments for an instrumented pool with the DB_POOL_* settings."""
+    options = {
+        "poolclass": InstrumentedAsyncPool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    options.update(overrides)
+    return options
+
+# A file-backed SQLite database runs in WAL mode with separate pools of writer and read-only
+# connections, unless SQLITE_PROFILE is set to "basic"
+_url = make_url(DATABASE_URL)
+SQLITE_PRODUCTION = (
+    _url.get_backend_name() == "sqlite"
+    and _url.database not in (None, "", ":memory:")
+    and os.getenv("SQLITE_PROFILE", "production").lower() == "production"
+)
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# A statement that still finds the database locked after busy_timeout is run again this many
+# times, when it failed before its transaction began and so changed nothing
+SQLITE_BUSY_RETRIES = int(os.getenv("SQLITE_BUSY_RETRIES", "3"))
+
+SQLITE_PRAGMAS = [
+    ("journal_mode", "WAL"),     # readers and the writer no longer block each other
+    ("synchronous", "NORMAL"),   # with WAL, a power loss can only drop the last commits
+    ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+    ("foreign_keys", "ON"),
+    ("cache_size", -65536),      # 64 MiB page cache per connection
+    ("mmap_size", 268435456),    # read through a 256 MiB memory map
+]
+
+# The driver opens a transaction right before the first INSERT, UPDATE or DELETE. IMMEDIATE
+# takes the write lock at that point, so writers queue up one at a time (for up to
+# busy_timeout) instead of failing with "database is locked" when a transaction that read
+# first tries to upgrade. Reads after a commit, such as refreshing the saved row, run
+# without a transaction and never hold the lock.
+class RetryingCursor(sqlite3.Cursor):
+    """Runs a statement again when it could not begin its transaction because another
+    process held the write lock past busy_timeout. SQLite's busy handler polls rather than
+    queueing, so with several worker processes an unlucky writer can wait out the timeout."""
+
+    def execute(self, sql, parameters=()):
+        return self._retry(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._retry(super().executemany, sql, list(seq_of_parameters))
+
+    def _retry(self, execute, sql, parameters):
+        for attempt in range(SQLITE_BUSY_RETRIES + 1):
+            # Inside a transaction a failed statement may not be repeated on its own
+            began = self.connection.in_transaction
+            try:
+                return execute(sql, parameters)
+            except sqlite3.OperationalError as e:
+                if began or attempt == SQLITE_BUSY_RETRIES or not str(e).startswith("database is locked"):
+                    raise
+
+class WriterConnection(sqlite3.Connection):
+    def cursor(self, factory=RetryingCursor):
+        return super().cursor(factory)
+
+SQLITE_WRITER_ARGS = {"isolation_level": "IMMEDIATE", "factory": WriterConnection}
+
+class WriterLock:
+    """Lets one writer connection be checked out at a time in this process, by the sync
+    engine or the async one, so a worker's writes queue here instead of in SQLite's busy
+    handler. Each writer engine keeps a single connection, so at most one caller per engine
+    waits for the lock; the others wait in the pool."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.holder = None
+        self._lock = threading.Lock()
+
+    def acquire(self, connection_record):
+        if not self._lock.acquire(timeout=self.timeout):
+            raise PoolTimeoutError("Timed out waiting for the SQLite writer connection")
+        self.holder = connection_record
+
+    async def acquire_async(self, connection_record):
+        # Waits in an executor thread, so the event loop keeps serving other requests
+        acquiring = asyncio.get_running_loop().run_in_executor(None, self._lock.acquire, True, self.timeout)
+        try:
+            acquired = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The thread may still get the lock; give it back when it does
+            acquiring.add_done_callback(
+                lambda done: done.exception() is None and done.result() and self._lock.release()
+            )
+            raise
+        if not acquired:
+            raise PoolTimeoutError("Timed out waiting for the SQLite writer connection")
+        self.holder = connection_record
+
+    def release(self, connection_record):
+        # A checkout that failed before taking the lock is checked in too
+        if self.holder is connection_record:
+            self.holder = None
+            self._lock.release()
+
+def serialize_writers(engine, lock, is_async=False):
+    """Holds `lock` while a connection of `engine` (a sync engine, or the sync_engine of an
+    async one) is checked out."""
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        if is_async:
+            # Checkouts of an async engine run in a greenlet that may await
+            await_only(lock.acquire_async(connection_record))
+        else:
+            lock.acquire(connection_record)
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        lock.release(connection_record)
+
+def configure_sqlite(engine, writer):
+    """Applies SQLITE_PRAGMAS to every new connection of `engine` (a sync engine, or the
+    sync_engine of an async one); reader connections are query-only."""
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        if not writer:
+            # SQLAlchemy emits BEGIN itself below, so a request reads from one snapshot
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name}={value}")
+        if not writer:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    if not writer:
+        @event.listens_for(engine, "begin")
+        def begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+def enforce_sqlite_foreign_keys(engine):
+    """SQLite checks foreign keys, and applies their ON DELETE CASCADE rules, only on
+    connections that ask for it."""
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+if SQLITE_PRODUCTION:
+    async_url = get_async_database_url(DATABASE_URL)
+    # SQLite has one writer at a time anyway: each process keeps a single writer connection
+    writer_pool = {"pool_size": 1, "max_overflow": 0}
+    engine = create_engine(DATABASE_URL, connect_args=SQLITE_WRITER_ARGS, **pool_options(**writer_pool))
+    read_engine = create_engine(DATABASE_URL, **pool_options(pool_size=SQLITE_READ_POOL_SIZE))
+    async_engine = create_async_engine(async_url, connect_args=SQLITE_WRITER_ARGS, **pool_options(True, **writer_pool))
+    async_read_engine = create_async_engine(async_url, **pool_options(True, pool_size=SQLITE_READ_POOL_SIZE))
+    configure_sqlite(engine, writer=True)
+    configure_sqlite(read_engine, writer=False)
+    configure_sqlite(async_engine.sync_engine, writer=True)
+    configure_sqlite(async_read_engine.sync_engine, writer=False)
+    writer_lock = WriterLock(DB_POOL_TIMEOUT)
+    serialize_writers(engine, writer_lock)
+    serialize_writers(async_engine.sync_engine, writer_lock, is_async=True)
+    instrument(engine, "sync")
+    instrument(read_engine, "sync_read")
+    instrument(async_engine.sync_engine, "async")
+    instrument(async_read_engine.sync_engine, "async_read")
+elif _url.get_backend_name() != "sqlite":
+    engine = read_engine = create_engine(DATABASE_URL, **pool_options())
+    async_engine = async_read_engine = create_async_engine(
+        get_async_database_url(DATABASE_URL), **pool_options(True)
+    )
+    instrument(engine, "sync")
+    instrument(async_engine.sync_engine, "async")
+else:
+    # SQLITE_PROFILE=basic or an in-memory database: the driver's default pools
+    engine = read_engine = create_engine(DATABASE_URL)
+    async_engine = async_read_engine = create_async_engine(get_async_database_url(DATABASE_URL))
+    enforce_sqlite_foreign_keys(engine)
+    enforce_sqlite_foreign_keys(async_engine.sync_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+async def dispose_async_engines():
+    # Pooled aiosqlite connections each run a thread that keeps the process alive
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+
+async def check_database():
+    """One round trip on a read connection; raises when the database cannot be reached."""
+    async with async_read_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
 
 Base = declarative_base()
 
+def dialect_insert(db, table):
+    """INSERT construct supporting ON CONFLICT clauses on the database behind `db`."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
 # Dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Read-only handlers use these, so they never wait for the writer
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# FastAPI closes dependency sessions only after the response has been sent. Handlers call
+# these once their database work is done, so the connection goes back to the pool before
+# the response is serialized. Attributes already loaded stay readable; lazy loads fail.
+def lock_for_write(db):
+    """Takes the write lock before the reads a write is computed from. SQLite has no row
+    locks and pysqlite only begins the transaction at the first write, so the session's
+    transaction is started with BEGIN IMMEDIATE now; other databases lock the rows that are
+    then selected with with_for_update()."""
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def release_session(db):
+    db.close()
+
+async def release_async_session(db):
+    await db.close()
+
+# Async dependency for `async def` handlers, so database I/O never blocks the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
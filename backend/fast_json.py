@@ -0,0 +1,34 @@
+import os
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Bundle
+
+# List endpoints serialize rows straight from column tuples with orjson instead of
+# validating every row into its response model. The JSON is the same either way.
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+def _default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(payload) -> bytes:
+    # UTC datetimes end in "Z", as pydantic writes them
+    return orjson.dumps(payload, default=_default, option=orjson.OPT_UTC_Z)
+
+class RecordBundle(Bundle):
+    """Columns loaded straight into dicts keyed by column name, ready for dumps()."""
+
+    def create_row_processor(self, query, procs, labels):
+        def proc(row):
+            return dict(zip(labels, [column(row) for column in procs]))
+        return proc
+
+def row_records(rows):
+    """Column rows as dicts keyed by column name, in select order."""
+    return [row._asdict() for row in rows]
+
+def json_response(payload, headers=None):
+    return Response(content=dumps(payload), media_type="application/json", headers=headers)
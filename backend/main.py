@@ -1,13 +1,43 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth, tasks, categories, tags, insights, users, reminders
-from database import engine
-import models
+from routers import auth, tasks, categories, tags, insights, users, reminders, sync, events
+from activity_log import activity_log
+from admission import ADMISSION_ENABLED, AdmissionMiddleware
+from compression import CompressionMiddleware
+from database import check_database, dispose_async_engines, engine
+from metrics import CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, instrument_engines, render_metrics
+from password_hashing import hashing_pool
+from query_profiler import SQL_PROFILE, QueryProfileMiddleware
+from reminder_scheduler import REMINDER_SCHEDULER_ENABLED, reminder_scheduler
+import migrations
 
-# Create tables if they don't exist
-models.Base.metadata.create_all(bind=engine)
+# Set to false when migrations run as a separate deploy step (`python migrations.py upgrade`)
+RUN_MIGRATIONS_ON_STARTUP = os.getenv("RUN_MIGRATIONS_ON_STARTUP", "true").lower() == "true"
+# /readyz fails when the database takes longer than this to answer
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
 
-app = FastAPI(title="TaskFlow API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables and apply pending schema migrations
+    if RUN_MIGRATIONS_ON_STARTUP:
+        migrations.upgrade(engine)
+    activity_log.start()
+    if REMINDER_SCHEDULER_ENABLED:
+        reminder_scheduler.start()
+    yield
+    reminder_scheduler.stop()
+    # Write queued activities before the process exits
+    activity_log.stop()
+    hashing_pool.shutdown()
+    await dispose_async_engines()
+
+app = FastAPI(title="TaskFlow API", lifespan=lifespan)
+# Set by serve.py once the worker is shutting down, so /readyz turns load balancers away
+app.state.draining = False
 
 # Configure CORS
 origins = [
@@ -22,6 +52,9 @@ origins = [
     "https://task-flow-xxm5.onrender.com", # Render Frontend URL
 ]
 
+if ADMISSION_ENABLED:
+    # Inside CORS, so browsers can read the Retry-After of shed requests
+    app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -31,6 +64,14 @@ app.add_middleware(
     expose_headers=["*"],
     max_age=3600,
 )
+app.add_middleware(CompressionMiddleware)
+if METRICS_ENABLED:
+    # Outermost, so latencies include compression and CORS handling
+    instrument_engines()
+    app.add_middleware(MetricsMiddleware)
+if SQL_PROFILE:
+    # Debug only: Server-Timing headers and warnings for repeated statement shapes
+    app.add_middleware(QueryProfileMiddleware)
 
 # Include routers
 app.include_router(auth.router)
@@ -40,8 +81,31 @@ app.include_router(tags.router)
 app.include_router(insights.router)
 app.include_router(users.router)
 app.include_router(reminders.router)
+app.include_router(sync.router)
+app.include_router(events.router)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to TaskFlow API"}
-    
\ No newline at end of file
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the worker is serving requests. Touches nothing else, so a slow database
+    does not get healthy workers restarted."""
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: the worker is not shutting down and the database answers."""
+    if app.state.draining:
+        return JSONResponse({"status": "draining"}, status_code=503)
+    try:
+        await asyncio.wait_for(check_database(), READINESS_TIMEOUT_SECONDS)
+    except Exception:
+        return JSONResponse({"status": "unavailable", "detail": "Database unreachable"}, status_code=503)
+    return {"status": "ready"}
+
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return Response(content=render_metrics(), media_type=CONTENT_TYPE)
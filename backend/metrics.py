@@ -0,0 +1,305 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+import database
+from activity_log import activity_log
+from admission import admission_stats
+from change_events import change_hub
+from password_hashing import hashing_pool
+from reminder_scheduler import reminder_scheduler
+from pool_metrics import Histogram, pool_stats
+from response_cache import response_cache_stats
+from routers.auth import auth_cache_stats
+
+# Served at GET /metrics in the Prometheus text format; false removes the endpoint and
+# the request middleware
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+UNMATCHED_ROUTE = "<unmatched>"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+class _RequestQueries:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+# Statements of the request being handled. Set by the middleware; threadpool handlers see
+# the same object because anyio runs them in a copy of the request's context.
+_request_queries = ContextVar("request_queries", default=None)
+
+class _RouteMetrics:
+    __slots__ = ("latency", "statements", "db_seconds", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_seconds = Histogram(DB_TIME_BUCKETS)
+        self.statuses = {}
+
+class Registry:
+    """Request and SQL metrics collected in process, rendered for Prometheus."""
+
+    def __init__(self):
+        self.in_flight = {}
+        self.statements = 0
+        self.statement_seconds = 0.0
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def route(self, method, path):
+        key = (method, path)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self._routes.setdefault(key, _RouteMetrics())
+        return metrics
+
+    def started(self, method):
+        with self._lock:
+            self.in_flight[method] = self.in_flight.get(method, 0) + 1
+
+    def finished(self, method, path, status, seconds, queries):
+        metrics = self.route(method, path)
+        metrics.latency.observe(seconds)
+        metrics.statements.observe(queries.statements)
+        metrics.db_seconds.observe(queries.seconds)
+        with self._lock:
+            self.in_flight[method] -= 1
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def statement(self, seconds):
+        with self._lock:
+            self.statements += 1
+            self.statement_seconds += seconds
+
+    def routes(self):
+        with self._lock:
+            return sorted(self._routes.items())
+
+registry = Registry()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    registry.statement(elapsed)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.statements += 1
+        queries.seconds += elapsed
+
+def instrument_engines():
+    engines = {database.engine, database.read_engine,
+               database.async_engine.sync_engine, database.async_read_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+_route_paths = {}
+
+def route_path(scope):
+    """The path template of the route that handled the request, such as /api/tasks/{task_id}."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    path = _route_paths.get(endpoint)
+    if path is None:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                path = _route_paths[endpoint] = route.path
+                break
+        else:
+            return UNMATCHED_ROUTE
+    return path
+
+class MetricsMiddleware:
+    """Records latency, status and SQL statements of every HTTP request by route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        queries = _RequestQueries()
+        token = _request_queries.set(queries)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.started(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.finished(method, route_path(scope), status, time.perf_counter() - started, queries)
+            _request_queries.reset(token)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+class _Exposition:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name, snapshot, **labels):
+        for bound, count in snapshot["buckets"].items():
+            self.sample(f"{name}_bucket", count, **labels, le=bound)
+        self.sample(f"{name}_bucket", snapshot["count"], **labels, le="+Inf")
+        self.sample(f"{name}_sum", snapshot["sum"], **labels)
+        self.sample(f"{name}_count", snapshot["count"], **labels)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+def render_metrics():
+    out = _Exposition()
+    routes = registry.routes()
+
+    out.family("taskflow_http_requests_total", "counter", "HTTP requests by route and status code.")
+    for (method, path), metrics in routes:
+        for status, count in sorted(metrics.statuses.items()):
+            out.sample("taskflow_http_requests_total", count, method=method, route=path, status=status)
+    out.family("taskflow_http_requests_in_flight", "gauge", "HTTP requests being handled.")
+    for method, count in sorted(registry.in_flight.items()):
+        out.sample("taskflow_http_requests_in_flight", count, method=method)
+    out.family("taskflow_http_request_duration_seconds", "histogram", "HTTP request latency by route.")
+    for (method, path), metrics in routes:
+        out.histogram("taskflow_http_request_duration_seconds", metrics.latency.snapshot(), method=method, route=path)
+    out.family("taskflow_http_request_db_statements", "histogram", "SQL statements executed per HTTP request.")
+    for (method, path), metrics in routes:
+        out.histogram("taskflow_http_request_db_statements", metrics.statements.snapshot(), method=method, route=path)
+    out.family("taskflow_http_request_db_seconds", "histogram", "Time spent in SQL statements per HTTP request.")
+    for (method, path), metrics in routes:
+        out.histogram("taskflow_http_request_db_seconds", metrics.db_seconds.snapshot(), method=method, route=path)
+
+    out.family("taskflow_db_statements_total", "counter", "SQL statements executed, including background work.")
+    out.sample("taskflow_db_statements_total", registry.statements)
+    out.family("taskflow_db_statement_seconds_total", "counter", "Time spent in SQL statements.")
+    out.sample("taskflow_db_statement_seconds_total", round(registry.statement_seconds, 6))
+
+    pools = pool_stats()
+    out.family("taskflow_db_pool_connections", "gauge", "Pooled connections by state.")
+    for pool, stats in pools.items():
+        for state in ("in_use", "idle", "overflow"):
+            out.sample("taskflow_db_pool_connections", stats[state], pool=pool, state=state)
+    out.family("taskflow_db_pool_size", "gauge", "Configured pool size.")
+    for pool, stats in pools.items():
+        out.sample("taskflow_db_pool_size", stats["size"], pool=pool)
+    out.family("taskflow_db_pool_checkouts_total", "counter", "Connection checkouts.")
+    for pool, stats in pools.items():
+        out.sample("taskflow_db_pool_checkouts_total", stats["checkouts"], pool=pool)
+    out.family("taskflow_db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection.")
+    for pool, stats in pools.items():
+        out.sample("taskflow_db_pool_timeouts_total", stats["timeouts"], pool=pool)
+    out.family("taskflow_db_pool_wait_seconds", "histogram", "Time waited to check out a connection.")
+    for pool, stats in pools.items():
+        out.histogram("taskflow_db_pool_wait_seconds", stats["wait_seconds"], pool=pool)
+    out.family("taskflow_db_pool_held_seconds", "histogram", "Time a connection stayed checked out.")
+    for pool, stats in pools.items():
+        out.histogram("taskflow_db_pool_held_seconds", stats["held_seconds"], pool=pool)
+
+    responses = response_cache_stats()
+    out.family("taskflow_response_cache_requests_total", "counter", "Cacheable responses by outcome.")
+    for outcome in ("not_modified", "cache_hits", "rendered"):
+        out.sample("taskflow_response_cache_requests_total", responses[outcome], outcome=outcome)
+    caches = {"response": responses["entries"], **auth_cache_stats()}
+    out.family("taskflow_cache_entries", "gauge", "Entries held by in-process caches.")
+    for cache, stats in caches.items():
+        out.sample("taskflow_cache_entries", stats["size"], cache=cache)
+    out.family("taskflow_cache_lookups_total", "counter", "In-process cache lookups by result.")
+    for cache, stats in caches.items():
+        out.sample("taskflow_cache_lookups_total", stats["hits"], cache=cache, result="hit")
+        out.sample("taskflow_cache_lookups_total", stats["misses"], cache=cache, result="miss")
+
+    hashing = hashing_pool.stats()
+    out.family("taskflow_password_hash_queue_depth", "gauge", "Running and waiting password hash jobs.")
+    out.sample("taskflow_password_hash_queue_depth", hashing["depth"])
+    out.family("taskflow_password_hash_jobs_total", "counter", "Password hash jobs by outcome.")
+    out.sample("taskflow_password_hash_jobs_total", hashing["completed"], outcome="completed")
+    out.sample("taskflow_password_hash_jobs_total", hashing["rejected"], outcome="rejected")
+
+    admission = admission_stats()
+    out.family("taskflow_admission_requests_in_flight", "gauge", "Admitted requests running by admission rule.")
+    for rule, stats in admission["routes"].items():
+        out.sample("taskflow_admission_requests_in_flight", stats["active"], rule=rule)
+    out.family("taskflow_admission_queue_depth", "gauge", "Requests waiting for a slot by admission rule.")
+    for rule, stats in admission["routes"].items():
+        out.sample("taskflow_admission_queue_depth", stats["queued"], rule=rule)
+    out.family("taskflow_admission_limit", "gauge", "Concurrent requests allowed by admission rule.")
+    for rule, stats in admission["routes"].items():
+        out.sample("taskflow_admission_limit", stats["limit"], rule=rule)
+    out.family("taskflow_admission_queue_wait_seconds", "histogram", "Time requests waited for an admission slot.")
+    for rule, stats in admission["routes"].items():
+        out.histogram("taskflow_admission_queue_wait_seconds", stats["wait_seconds"], rule=rule)
+    out.family("taskflow_admission_shed_total", "counter", "Requests answered 503 by admission rule and reason.")
+    for rule, stats in admission["routes"].items():
+        for reason, count in stats["shed"].items():
+            out.sample("taskflow_admission_shed_total", count, rule=rule, reason=reason)
+    out.family("taskflow_rate_limited_total", "counter", "Requests answered 429, by user or client IP bucket.")
+    for kind, stats in admission["rate_limits"].items():
+        out.sample("taskflow_rate_limited_total", stats["limited"], key=kind)
+
+    streams = change_hub.stats()
+    out.family("taskflow_events_connections", "gauge", "Open server-sent event streams.")
+    out.sample("taskflow_events_connections", streams["connections"])
+    out.family("taskflow_events_connections_total", "counter", "Event streams opened.")
+    out.sample("taskflow_events_connections_total", streams["connections_total"])
+    out.family("taskflow_events_published_total", "counter", "Change events queued to streams.")
+    out.sample("taskflow_events_published_total", streams["published"])
+    out.family("taskflow_events_dropped_total", "counter", "Streams closed for falling too far behind.")
+    out.sample("taskflow_events_dropped_total", streams["dropped"])
+    out.family("taskflow_events_delivery_seconds", "histogram", "Time from commit (or from the poll that found it) to an event being sent.")
+    out.histogram("taskflow_events_delivery_seconds", streams["delivery_seconds"])
+
+    activities = activity_log.stats()
+    out.family("taskflow_activity_queue_depth", "gauge", "Activity events waiting to be written.")
+    out.sample("taskflow_activity_queue_depth", activities["queue_depth"])
+    out.family("taskflow_activity_events_total", "counter", "Activity events by outcome.")
+    for outcome in ("emitted", "written", "dropped"):
+        out.sample("taskflow_activity_events_total", activities[outcome], outcome=outcome)
+    out.family("taskflow_activity_flush_errors_total", "counter", "Failed activity batch writes.")
+    out.sample("taskflow_activity_flush_errors_total", activities["flush_errors"])
+
+    reminders = reminder_scheduler.stats()
+    out.family("taskflow_reminders_pending", "gauge", "Due-date reminders waiting in the timer heap.")
+    out.sample("taskflow_reminders_pending", reminders["pending"])
+    out.family("taskflow_reminders_total", "counter", "Due-date reminders come due by outcome.")
+    for outcome in ("fired", "stale", "duplicates"):
+        out.sample("taskflow_reminders_total", reminders[outcome], outcome=outcome)
+    out.family("taskflow_reminders_errors_total", "counter", "Failed reminder batch writes.")
+    out.sample("taskflow_reminders_errors_total", reminders["errors"])
+    return out.text()
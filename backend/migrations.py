@@ -0,0 +1,254 @@
+import argparse
+import sys
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.schema import AddConstraint, CreateTable
+from sqlalchemy.sql import func
+
+import models
+
+# Applied migrations are tracked in their own metadata so create_all never touches it
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+MIGRATIONS = []
+
+def migration(version, name):
+    def register(apply):
+        MIGRATIONS.append((version, name, apply))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return apply
+    return register
+
+def create_indexes(connection, indexes):
+    # CREATE INDEX IF NOT EXISTS works on SQLite and Postgres and leaves existing data in place
+    for name, table, columns, unique in indexes:
+        connection.execute(text(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+        ))
+
+@migration(1, "production_indexes")
+def add_production_indexes(connection):
+    # Drop duplicate task/tag links first so the unique index can be built
+    if connection.dialect.name == "postgresql":
+        # tid has no MIN() before PostgreSQL 14, so keep the lowest ctid by comparison
+        connection.execute(text(
+            "DELETE FROM task_tags a USING task_tags b "
+            "WHERE a.ctid > b.ctid AND a.task_id = b.task_id AND a.tag_id = b.tag_id"
+        ))
+    else:
+        connection.execute(text(
+            "DELETE FROM task_tags WHERE rowid NOT IN "
+            "(SELECT MIN(rowid) FROM task_tags GROUP BY task_id, tag_id)"
+        ))
+    create_indexes(connection, [
+        ("ix_tasks_owner_id_id", "tasks", ["owner_id", "id"], False),
+        ("ix_tasks_owner_created_at", "tasks", ["owner_id", "created_at", "id"], False),
+        ("ix_tasks_owner_updated_at", "tasks", ["owner_id", "updated_at", "id"], False),
+        ("ix_tasks_owner_due_date", "tasks", ["owner_id", "due_date", "id"], False),
+        ("ix_tasks_owner_status", "tasks", ["owner_id", "status", "id"], False),
+        ("ix_tasks_owner_priority", "tasks", ["owner_id", "priority", "id"], False),
+        ("ix_tasks_owner_category", "tasks", ["owner_id", "category_id", "id"], False),
+        ("ix_tasks_category_id", "tasks", ["category_id"], False),
+        ("uq_task_tags_task_id_tag_id", "task_tags", ["task_id", "tag_id"], True),
+        ("ix_task_tags_tag_id_task_id", "task_tags", ["tag_id", "task_id"], False),
+        ("ix_activities_user_id_timestamp", "activities", ["user_id", "timestamp"], False),
+        ("ix_categories_owner_id", "categories", ["owner_id"], False),
+        ("ix_tags_owner_id", "tags", ["owner_id"], False),
+        ("ix_reminders_user_id", "reminders", ["user_id"], False),
+    ])
+
+@migration(2, "weekly_task_stats_backfill")
+def backfill_weekly_task_stats(connection):
+    # The table itself comes from create_all; fill it from existing tasks
+    from task_counters import rebuild_weekly_stats
+    rebuild_weekly_stats(connection)
+
+@migration(3, "task_tags_primary_key")
+def add_task_tags_primary_key(connection):
+    # Fresh databases get the composite key from create_all; older ones only have the
+    # unique index from migration 1, which the primary key replaces
+    if not inspect(connection).get_pk_constraint("task_tags")["constrained_columns"]:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                "DELETE FROM task_tags WHERE task_id IS NULL OR tag_id IS NULL "
+                "OR task_id NOT IN (SELECT id FROM tasks) OR tag_id NOT IN (SELECT id FROM tags)"
+            ))
+            connection.execute(text("ALTER TABLE task_tags ADD PRIMARY KEY (task_id, tag_id)"))
+        else:
+            # SQLite cannot add a primary key to an existing table, so copy it; a copy left
+            # by an earlier failed attempt is discarded
+            connection.execute(text("DROP TABLE IF EXISTS task_tags_new"))
+            connection.execute(text(
+                "CREATE TABLE task_tags_new ("
+                "task_id INTEGER NOT NULL REFERENCES tasks (id), "
+                "tag_id INTEGER NOT NULL REFERENCES tags (id), "
+                "PRIMARY KEY (task_id, tag_id))"
+            ))
+            # Foreign keys were never enforced before, so links to deleted tasks or tags may
+            # exist; they would fail the new table's REFERENCES checks
+            connection.execute(text(
+                "INSERT OR IGNORE INTO task_tags_new (task_id, tag_id) "
+                "SELECT task_id, tag_id FROM task_tags "
+                "WHERE task_id IN (SELECT id FROM tasks) AND tag_id IN (SELECT id FROM tags)"
+            ))
+            connection.execute(text("DROP TABLE task_tags"))
+            connection.execute(text("ALTER TABLE task_tags_new RENAME TO task_tags"))
+    connection.execute(text("DROP INDEX IF EXISTS uq_task_tags_task_id_tag_id"))
+    create_indexes(connection, [
+        ("ix_task_tags_tag_id_task_id", "task_tags", ["tag_id", "task_id"], False),
+    ])
+
+@migration(4, "task_search_index")
+def add_task_search_index(connection):
+    # FTS5 table and triggers on SQLite, a GIN tsvector expression index on Postgres
+    from task_search import create_search_index
+    create_search_index(connection)
+
+@migration(5, "activities_timestamp_index")
+def add_activities_timestamp_index(connection):
+    create_indexes(connection, [
+        ("ix_activities_timestamp", "activities", ["timestamp"], False),
+    ])
+
+def recreate_foreign_keys(connection, name):
+    """Brings the foreign keys of table `name` in line with models (ON DELETE rules included),
+    deleting rows that reference missing parents first."""
+    table = models.Base.metadata.tables[name]
+    orphaned = " OR ".join(
+        f"({fk.parent.name} IS NOT NULL AND {fk.parent.name} NOT IN "
+        f"(SELECT {fk.column.name} FROM {fk.column.table.name}))"
+        for fk in table.foreign_keys
+    )
+    connection.execute(text(f"DELETE FROM {name} WHERE {orphaned}"))
+
+    if connection.dialect.name == "postgresql":
+        for foreign_key in inspect(connection).get_foreign_keys(name):
+            connection.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{foreign_key["name"]}"'))
+        for constraint in table.foreign_key_constraints:
+            connection.execute(AddConstraint(constraint))
+        return
+
+    # SQLite cannot alter constraints, so copy the table into one created from the model
+    copies = MetaData()
+    for other in models.Base.metadata.sorted_tables:
+        if other is not table:
+            other.to_metadata(copies)
+    replacement = table.to_metadata(copies, name=f"{name}_new")
+    columns = ", ".join(column.name for column in table.columns)
+    connection.execute(text(f"DROP TABLE IF EXISTS {name}_new"))
+    connection.execute(CreateTable(replacement))
+    connection.execute(text(f"INSERT INTO {name}_new ({columns}) SELECT {columns} FROM {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+    connection.execute(text(f"ALTER TABLE {name}_new RENAME TO {name}"))
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+@migration(6, "cascading_foreign_keys")
+def add_cascading_foreign_keys(connection):
+    # Tag links and category counters are deleted by the database with their parent row.
+    # Fresh databases get the cascades from create_all.
+    for name in ("task_tags", "category_stats"):
+        wanted = {fk.parent.name for fk in models.Base.metadata.tables[name].foreign_keys if fk.ondelete}
+        cascading = {
+            column
+            for fk in inspect(connection).get_foreign_keys(name)
+            if (fk["options"].get("ondelete") or "").upper() == "CASCADE"
+            for column in fk["constrained_columns"]
+        }
+        if not wanted <= cascading:
+            recreate_foreign_keys(connection, name)
+
+@migration(7, "due_date_reminders")
+def add_due_date_reminders(connection):
+    # Fresh databases get the columns from create_all
+    existing = {column["name"] for column in inspect(connection).get_columns("reminders")}
+    for column in models.Reminder.__table__.columns:
+        if column.name in existing:
+            continue
+        definition = f"{column.name} {column.type.compile(dialect=connection.dialect)}"
+        for foreign_key in column.foreign_keys:
+            definition += f" REFERENCES {foreign_key.column.table.name} ({foreign_key.column.name})"
+            if foreign_key.ondelete:
+                definition += f" ON DELETE {foreign_key.ondelete}"
+        connection.execute(text(f"ALTER TABLE reminders ADD COLUMN {definition}"))
+    create_indexes(connection, [
+        ("uq_reminders_task_kind_remind_at", "reminders", ["task_id", "kind", "remind_at"], True),
+        ("ix_tasks_due_date", "tasks", ["due_date"], False),
+    ])
+
+def applied_versions(connection):
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+# Postgres advisory lock key held while upgrading
+UPGRADE_LOCK_ID = 7_146_823
+
+def lock_for_upgrade(connection):
+    """Starts the transaction under a lock that serializes upgrades across processes.
+    pysqlite runs DDL before the first DML outside any transaction, so SQLite gets an
+    explicit BEGIN IMMEDIATE: a failed step then leaves no tables behind."""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": UPGRADE_LOCK_ID})
+
+def upgrade(engine, target=None):
+    """Creates missing tables, then applies pending migrations in order, each in its own
+    transaction. Returns the versions applied; a failing migration is rolled back and raised."""
+    with engine.begin() as connection:
+        lock_for_upgrade(connection)
+        models.Base.metadata.create_all(bind=connection)
+        migration_metadata.create_all(bind=connection)
+
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.begin() as connection:
+            lock_for_upgrade(connection)
+            # Read under the lock: another process may have applied it meanwhile
+            if version in applied_versions(connection):
+                continue
+            apply(connection)
+            connection.execute(schema_migrations.insert().values(version=version, name=name))
+        applied.append(version)
+    return applied
+
+def current_version(engine):
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        return max(applied_versions(connection), default=0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subcommands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="Stop at this version")
+    subcommands.add_parser("current", help="Print the current schema version")
+    subcommands.add_parser("history", help="List known migrations")
+    args = parser.parse_args(argv)
+
+    from database import engine
+
+    if args.command == "upgrade":
+        applied = upgrade(engine, args.to)
+        print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+    elif args.command == "current":
+        print(current_version(engine))
+    else:
+        migration_metadata.create_all(bind=engine)
+        with engine.connect() as connection:
+            done = applied_versions(connection)
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:4d}  {name}  {'applied' if version in done else 'pending'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
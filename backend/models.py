@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Table
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Date, DateTime, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -7,8 +7,11 @@ from database import Base
 task_tags = Table(
     'task_tags',
     Base.metadata,
-    Column('task_id', Integer, ForeignKey('tasks.id')),
-    Column('tag_id', Integer, ForeignKey('tags.id'))
+    # Links are removed by the database along with their task or tag
+    Column('task_id', Integer, ForeignKey('tasks.id', ondelete='CASCADE'), primary_key=True),
+    Column('tag_id', Integer, ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    # Serves the tag filter of GET /api/tasks
+    Index('ix_task_tags_tag_id_task_id', 'tag_id', 'task_id')
 )
 
 class User(Base):
@@ -39,11 +42,25 @@ class Task(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     owner_id = Column(Integer, ForeignKey("users.id"))
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True, index=True)
 
     owner = relationship("User", back_populates="tasks")
     category = relationship("Category", back_populates="tasks")
-    tags = relationship("Tag", secondary=task_tags, back_populates="tasks")
+    tags = relationship("Tag", secondary=task_tags, back_populates="tasks", passive_deletes=True)
+
+    # Composite indexes matching the filters and keyset sorts of GET /api/tasks;
+    # each ends in id so (owner_id, sort_key, id) pages are index range scans
+    __table_args__ = (
+        Index("ix_tasks_owner_id_id", "owner_id", "id"),
+        Index("ix_tasks_owner_created_at", "owner_id", "created_at", "id"),
+        Index("ix_tasks_owner_updated_at", "owner_id", "updated_at", "id"),
+        Index("ix_tasks_owner_due_date", "owner_id", "due_date", "id"),
+        Index("ix_tasks_owner_status", "owner_id", "status", "id"),
+        Index("ix_tasks_owner_priority", "owner_id", "priority", "id"),
+        Index("ix_tasks_owner_category", "owner_id", "category_id", "id"),
+        # Serves the due-date window the reminder scheduler loads
+        Index("ix_tasks_due_date", "due_date"),
+    )
 
 class Category(Base):
     __tablename__ = "categories"
@@ -51,7 +68,7 @@ class Category(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     color = Column(String)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     owner = relationship("User", back_populates="categories")
@@ -63,10 +80,10 @@ class Tag(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     color = Column(String)
-    owner_id = Column(Integer, ForeignKey("users.id"))
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
     
     owner = relationship("User", back_populates="tags")
-    tasks = relationship("Task", secondary=task_tags, back_populates="tags")
+    tasks = relationship("Task", secondary=task_tags, back_populates="tags", passive_deletes=True)
 
 class Activity(Base):
     __tablename__ = "activities"
@@ -79,6 +96,12 @@ class Activity(Base):
 
     user = relationship("User", back_populates="activities")
 
+    __table_args__ = (
+        Index("ix_activities_user_id_timestamp", "user_id", "timestamp"),
+        # Serves the retention sweep in activity_log
+        Index("ix_activities_timestamp", "timestamp"),
+    )
+
 class Reminder(Base):
     __tablename__ = "reminders"
 
@@ -86,6 +109,66 @@ class Reminder(Base):
     content = Column(String, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    user_id = Column(Integer, ForeignKey("users.id"))
-
-    user = relationship("User", back_populates="reminders")
\ No newline at end of file
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # Set on reminders fired by the due-date scheduler; notes written by the user have none
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="SET NULL"), nullable=True)
+    kind = Column(String, nullable=True)  # due_soon, overdue
+    remind_at = Column(DateTime(timezone=True), nullable=True)
+
+    user = relationship("User", back_populates="reminders")
+
+    __table_args__ = (
+        # A reminder fires once per task, kind and time, however many workers try
+        Index("uq_reminders_task_kind_remind_at", "task_id", "kind", "remind_at", unique=True),
+    )
+
+class CategoryStats(Base):
+    __tablename__ = "category_stats"
+
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    task_count = Column(Integer, nullable=False, default=0)
+    completed_tasks = Column(Integer, nullable=False, default=0)
+    in_progress_tasks = Column(Integer, nullable=False, default=0)
+
+class WeeklyTaskStats(Base):
+    __tablename__ = "weekly_task_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Monday (UTC) of the week the counts belong to
+    week_start = Column(Date, primary_key=True)
+    tasks_created = Column(Integer, nullable=False, default=0)
+    tasks_completed = Column(Integer, nullable=False, default=0)
+
+class UserDataVersion(Base):
+    __tablename__ = "user_data_versions"
+
+    # Incremented by every write to the user's tasks, categories and tags
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    # The id is the sync token: clients ask for changes with an id above the last one they saw
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    entity = Column(String, nullable=False)  # task, category, tag, reminder
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # upsert, delete
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_change_log_user_id_id", "user_id", "id"),
+        # Compaction deletes the newest rows too; ids must never be handed out again
+        {"sqlite_autoincrement": True},
+    )
+
+class SyncClient(Base):
+    __tablename__ = "sync_clients"
+
+    # Last token each client synced to; change_log rows below every client's token are compacted
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    client_id = Column(String, primary_key=True)
+    token = Column(Integer, nullable=False, default=0)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,80 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from sqlalchemy import String, literal, tuple_, type_coerce
+
+# Decoded position of the last row of the previous page
+Cursor = namedtuple("Cursor", ["value", "id", "in_nulls"])
+
+def encode_cursor(sort, order, value, row_id):
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    payload = {"s": sort, "o": order, "v": value, "i": row_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort, order):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, row_id = payload["v"], int(payload["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if payload.get("s") != sort or payload.get("o") != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    return Cursor(value, row_id, value is None)
+
+def _row_id(row):
+    # Rows are ORM entities, or dicts when the query loads a RecordBundle
+    return row["id"] if isinstance(row, dict) else row.id
+
+def keyset_paginate(query, column, id_column, sort, order, cursor, limit, nullable=False):
+    """Returns (rows, next_cursor) for one page of `query` ordered by (column, id).
+
+    Each page is a range scan on an index that ends in (column, id), so page N costs
+    the same as page 1. NULL sort values come last, as a second range ordered by id.
+    """
+    descending = order == "desc"
+    after = decode_cursor(cursor, sort, order) if cursor else None
+
+    def id_after(query, row_id):
+        return query.filter(id_column < row_id if descending else id_column > row_id)
+
+    def order_by_id(query):
+        return query.order_by(id_column.desc() if descending else id_column.asc())
+
+    if column is id_column:
+        page = query
+        if after:
+            page = id_after(page, after.id)
+        rows = [(row, _row_id(row)) for row in order_by_id(page).limit(limit + 1).all()]
+    else:
+        # Compare against the raw stored value, so the cursor matches exactly what the
+        # database holds (SQLite keeps CURRENT_TIMESTAMP values without microseconds)
+        raw_value = type_coerce(column, String).label("cursor_value")
+        rows = []
+        if not (after and after.in_nulls):
+            page = query.add_columns(raw_value)
+            if nullable:
+                page = page.filter(column.isnot(None))
+            if after:
+                position = tuple_(type_coerce(column, String), id_column)
+                bound = tuple_(literal(after.value, String), literal(after.id))
+                page = page.filter(position < bound if descending else position > bound)
+            page = page.order_by(column.desc() if descending else column.asc())
+            rows = order_by_id(page).limit(limit + 1).all()
+        if nullable and len(rows) <= limit:
+            page = query.add_columns(raw_value).filter(column.is_(None))
+            if after and after.in_nulls:
+                page = id_after(page, after.id)
+            rows += order_by_id(page).limit(limit + 1 - len(rows)).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last_row, last_value = rows[-1]
+        next_cursor = encode_cursor(sort, order, last_value, _row_id(last_row))
+    return [row for row, _ in rows], next_cursor
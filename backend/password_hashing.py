@@ -0,0 +1,79 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the event loop
+# without blocking it. Work beyond HASH_QUEUE_LIMIT (running + waiting) is rejected.
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+HASH_RETRY_AFTER_SECONDS = 1
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class HashingPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _reserve(self):
+        with self._lock:
+            if self.depth >= self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests, please retry shortly",
+                    headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+                )
+            self.depth += 1
+
+    def _release(self):
+        with self._lock:
+            self.depth -= 1
+            self.completed += 1
+
+    def _get_executor(self):
+        # Created on first use, and again after shutdown() when the app starts once more
+        # in the same process (another lifespan, a second TestClient)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hashing")
+            return self._executor
+
+    async def run(self, func, *args):
+        self._reserve()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._release()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "depth": self.depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+hashing_pool = HashingPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.run(pwd_context.hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(pwd_context.verify, plain_password, hashed_password)
@@ -0,0 +1,119 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds in seconds, as Prometheus histogram buckets ("+Inf" is implied)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+HELD_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Thread-safe histogram with cumulative bucket counts, as Prometheus exposes them."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._counts = [0] * len(self.buckets)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if index < len(self._counts):
+                self._counts[index] += 1
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[bound] = running
+            return {"buckets": cumulative, "count": self.count, "sum": round(self.sum, 6)}
+
+class PoolMonitor:
+    """Checkout waits, connection hold times and timeouts of one engine's pool."""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.held = Histogram(HELD_BUCKETS)
+
+    def stats(self):
+        pool = self.engine.pool
+        return {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+            "in_use": pool.checkedout(),
+            "idle": pool.checkedin(),
+            # overflow() counts down from -size while the pool is still filling up
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait.snapshot(),
+            "held_seconds": self.held.snapshot(),
+        }
+
+class _InstrumentedPool:
+    monitor = None
+
+    def _do_get(self):
+        # Time spent here is waiting for a free connection, or opening an overflow one
+        monitor = self.monitor
+        if monitor is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            monitor.timeouts += 1
+            raise
+        finally:
+            monitor.wait.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        # Engine.dispose() swaps in a fresh pool; keep counting into the same monitor
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        return pool
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+class InstrumentedAsyncPool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+_monitors = {}
+
+def instrument(engine, name):
+    """Attaches a PoolMonitor to `engine` (a sync engine, or the sync_engine of an async one),
+    whose pool must be one of the instrumented pool classes."""
+    monitor = PoolMonitor(name, engine)
+    engine.pool.monitor = monitor
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        monitor.checkouts += 1
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            monitor.held.observe(time.perf_counter() - started)
+
+    _monitors[name] = monitor
+    return monitor
+
+def pool_stats():
+    """Stats of every instrumented pool, by engine name."""
+    return {name: monitor.stats() for name, monitor in _monitors.items()}
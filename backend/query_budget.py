@@ -0,0 +1,105 @@
+"""Count the SQL statements each endpoint runs and fail on N+1 patterns or blown budgets.
+
+    python query_budget.py                      # scratch SQLite database
+    python query_budget.py --database-url postgresql://...
+
+Drives the same requests as query_plans.py in-process (requires httpx for FastAPI's
+TestClient) through QueryProfileMiddleware, and checks every request against its endpoint's
+budget in QUERY_BUDGETS and for a statement shape repeated SQL_REPEAT_THRESHOLD or more
+times. tests/test_query_budget.py runs the same check under pytest.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# Statements per request; authentication accounts for one on most endpoints
+DEFAULT_BUDGET = 6
+QUERY_BUDGETS = {
+    "DELETE /api/categories/{category_id}": 8,    # plus five per TASK_DELETE_CHUNK_SIZE tasks
+    "GET /api/sync/": 9,
+    "GET /insights/": 7,
+    # The explicit BEGIN IMMEDIATE that locks the task before its "before" snapshot is read
+    "PATCH /api/tasks/{task_id}/status": 7,
+    "PUT /api/tasks/{task_id}": 7,
+    "POST /api/tasks/bulk": 11,       # the four operations query_plans.py sends
+    "POST /api/tasks/import": 15,
+}
+# Statement shapes an endpoint may repeat by design
+ALLOWED_REPEATS = {
+    # Tagged rows need their ids back, and ordered RETURNING is one INSERT per row on SQLite
+    "POST /api/tasks/import": ("INSERT INTO tasks",),
+}
+
+def profile_endpoints(app):
+    """Drives exercise_routers through `app` and returns the SQL profiles of its requests,
+    by endpoint ("GET /api/tasks/{task_id}")."""
+    from fastapi.testclient import TestClient
+
+    from metrics import route_path
+    from query_plans import exercise_routers
+    from query_profiler import SQL_PROFILE, QueryProfileMiddleware
+
+    endpoints = {}
+
+    def observe(scope, profile):
+        key = f"{scope['method']} {route_path(scope)}"
+        endpoints.setdefault(key, []).append(profile)
+
+    QueryProfileMiddleware.observers.append(observe)
+    try:
+        # With SQL_PROFILE on, the app profiles its requests already
+        with TestClient(app if SQL_PROFILE else QueryProfileMiddleware(app)) as client:
+            exercise_routers(client)
+    finally:
+        QueryProfileMiddleware.observers.remove(observe)
+    return endpoints
+
+def check_budgets(endpoints):
+    """Checks profiles from profile_endpoints() and returns (endpoint, statements, budget,
+    problems) for each endpoint; problems is empty for those within their budget."""
+    from query_profiler import SQL_REPEAT_THRESHOLD
+
+    results = []
+    for endpoint, profiles in sorted(endpoints.items()):
+        budget = QUERY_BUDGETS.get(endpoint, DEFAULT_BUDGET)
+        worst = max(profiles, key=lambda profile: profile.count)
+        problems = []
+        if worst.count > budget:
+            problems.append(f"{worst.count} statements, budget is {budget}")
+        for profile in profiles:
+            for shape, count in profile.repeated(SQL_REPEAT_THRESHOLD):
+                if not shape.startswith(ALLOWED_REPEATS.get(endpoint, ())):
+                    problems.append(f"{count}x {shape}")
+        results.append((endpoint, worst.count, budget, list(dict.fromkeys(problems))))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Database to check (defaults to a scratch SQLite file)")
+    parser.add_argument("--verbose", action="store_true", help="Print every endpoint, not only failures")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="taskflow-budget-") as tmpdir:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'budget.db')}"
+
+        import database
+        import main as app_module
+
+        endpoints = profile_endpoints(app_module.app)
+        database.engine.dispose()
+        database.read_engine.dispose()
+
+    failures = 0
+    for endpoint, statements, budget, problems in check_budgets(endpoints):
+        if problems:
+            failures += 1
+        if problems or args.verbose:
+            print(f"{'OVER' if problems else 'ok  '}  {statements:3d}/{budget:<3d} {endpoint}")
+            for problem in problems:
+                print(f"    {problem}")
+    print(f"{len(endpoints)} endpoints checked, {failures} over budget or repeating statements")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""EXPLAIN every SQL statement the routers run and fail on full table scans.
+
+    python query_plans.py                      # scratch SQLite database
+    python query_plans.py --database-url postgresql://...
+
+Drives the API in-process (requires httpx for FastAPI's TestClient), records each
+SELECT/UPDATE/DELETE sent to the database, and checks its query plan.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)(?! USING)")
+
+def exercise_routers(client):
+    """Calls every router endpoint once with realistic data."""
+    client.post("/users/register", json={"username": "plans", "email": "plans@example.com", "password": "plans"})
+    token = client.post("/users/token", data={"username": "plans", "password": "plans"}).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+
+    client.get("/users/me")
+    category = client.post("/api/categories/", json={"name": "Work", "color": "#2196F3"}).json()
+    other = client.post("/api/categories/", json={"name": "Home", "color": "#4CAF50"}).json()
+    tag = client.post("/api/tags/", json={"name": "urgent", "color": "#F44336"}).json()
+    tasks = [
+        client.post("/api/tasks/", json={
+            "title": f"Task {i}",
+            "status": ["Pending", "In Progress", "Completed"][i % 3],
+            "priority": "High" if i % 2 else "Low",
+            "due_date": f"2030-01-{i + 1:02d}" if i % 4 else None,
+            "category_id": category["id"] if i % 2 else other["id"],
+        }).json()
+        for i in range(12)
+    ]
+    task_id = tasks[0]["id"]
+    client.post(f"/api/tasks/{task_id}/tags/{tag['id']}")
+    client.post("/api/tasks/tags/attach", json={"task_ids": [t["id"] for t in tasks[:6]], "tag_ids": [tag["id"]]})
+    client.post("/api/tasks/tags/detach", json={"task_ids": [t["id"] for t in tasks[3:6]], "tag_ids": [tag["id"]]})
+
+    for params in [
+        {},
+        {"category_id": category["id"]},
+        {"status": "Pending", "priority": "High"},
+        {"tag_id": tag["id"]},
+        {"due_after": "2030-01-02", "due_before": "2030-01-09", "sort": "due_date"},
+        {"sort": "created_at", "order": "desc", "limit": 5},
+        {"sort": "updated_at", "limit": 5},
+        {"skip": 5, "limit": 5},
+    ]:
+        response = client.get("/api/tasks/", params=params)
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor:
+            client.get("/api/tasks/", params=dict(params, cursor=cursor))
+
+    client.get(f"/api/tasks/{task_id}")
+    client.get("/api/tasks/search", params={"q": "task 1"})
+    exported = client.get("/api/tasks/export").content
+    client.get("/api/tasks/export", params={"format": "csv"})
+    client.post("/api/tasks/import", content=exported, headers={"Content-Type": "application/x-ndjson"})
+    client.post("/api/tasks/bulk", json={"operations": [
+        {"op": "create", "task": {"title": "Bulk", "category_id": category["id"]}},
+        {"op": "status", "id": tasks[2]["id"], "status": "Completed"},
+        {"op": "update", "id": tasks[3]["id"], "task": {"priority": "High", "category_id": other["id"]}},
+        {"op": "delete", "id": tasks[4]["id"]},
+    ]})
+    client.put(f"/api/tasks/{task_id}", json={"title": "Renamed", "category_id": other["id"]})
+    client.patch(f"/api/tasks/{task_id}/status", json={"status": "Completed"})
+    client.get("/api/categories/")
+    client.get(f"/api/categories/{category['id']}")
+    client.put(f"/api/categories/{category['id']}", json={"name": "Office", "color": "#2196F3"})
+    client.get("/api/tags/")
+    client.get(f"/api/tags/{tag['id']}")
+    client.put(f"/api/tags/{tag['id']}", json={"name": "later", "color": "#F44336"})
+    client.get("/insights/")
+    token = client.get("/api/sync/", params={"client_id": "plans"}).json()["token"]
+    reminder = client.post("/reminders/", json={"content": "Call back"}).json()
+    client.get("/reminders/")
+    client.put(f"/reminders/{reminder['id']}", json={"content": "Call back today"})
+    client.delete(f"/reminders/{reminder['id']}")
+    client.delete(f"/api/tasks/{task_id}/tags/{tag['id']}")
+    client.delete(f"/api/tasks/{tasks[1]['id']}")
+    client.delete(f"/api/tags/{tag['id']}")
+    client.delete(f"/api/categories/{other['id']}")
+    token = client.get("/api/sync/", params={"client_id": "plans", "since": token}).json()["token"]
+    client.get("/api/sync/", params={"client_id": "plans", "since": token})
+
+def full_scans(dialect, plan, tables):
+    if dialect == "sqlite":
+        # Scans of subqueries and CTEs (e.g. "SCAN anon_1") read an already filtered result
+        return [
+            row[3] for row in plan
+            if (match := SQLITE_FULL_SCAN.match(row[3])) and match.group(1) in tables
+        ]
+    scans = []
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            scans.append(f"Seq Scan on {node.get('Relation Name')}")
+        for child in node.get("Plans", []):
+            walk(child)
+    document = plan[0][0]
+    if isinstance(document, str):
+        document = json.loads(document)
+    walk(document[0]["Plan"])
+    return scans
+
+def explain_prefix(dialect):
+    return "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN (FORMAT JSON) "
+
+def check_sync(engine, statements, tables):
+    results = []
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            connection.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(explain_prefix(engine.dialect.name) + statement, parameters).fetchall()
+            results.append((statement, full_scans(engine.dialect.name, plan, tables)))
+    return results
+
+async def check_async(engine, statements, tables):
+    results = []
+    async with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            await connection.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            plan = (await connection.exec_driver_sql(explain_prefix(engine.dialect.name) + statement, parameters)).fetchall()
+            results.append((statement, full_scans(engine.dialect.name, plan, tables)))
+    await engine.dispose()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Database to check (defaults to a scratch SQLite file)")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement, not only full scans")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="taskflow-plans-") as tmpdir:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'plans.db')}"
+
+        from fastapi.testclient import TestClient
+        from sqlalchemy import event
+
+        import database
+        import main as app_module
+
+        captured = {"sync": {}, "async": {}}
+
+        def recorder(kind):
+            def record(conn, cursor, statement, parameters, context, executemany):
+                if not executemany and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    captured[kind].setdefault(statement, parameters)
+            return record
+
+        with TestClient(app_module.app) as client:
+            for engine in {database.engine, database.read_engine}:
+                event.listen(engine, "before_cursor_execute", recorder("sync"))
+            for engine in {database.async_engine, database.async_read_engine}:
+                event.listen(engine.sync_engine, "before_cursor_execute", recorder("async"))
+            exercise_routers(client)
+
+        tables = set(database.Base.metadata.tables)
+        results = check_sync(database.engine, list(captured["sync"].items()), tables)
+        results += asyncio.run(check_async(database.async_engine, list(captured["async"].items()), tables))
+        database.engine.dispose()
+        database.read_engine.dispose()
+
+    failures = 0
+    for statement, scans in results:
+        if scans:
+            failures += 1
+        if scans or args.verbose:
+            print(("FULL SCAN " if scans else "ok        ") + " ".join(statement.split()))
+            for scan in scans:
+                print(f"    {scan}")
+    print(f"{len(results)} statements checked, {failures} with full table scans")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
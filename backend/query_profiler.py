@@ -0,0 +1,169 @@
+"""Per-request SQL profiles: every statement a request runs, grouped by shape.
+
+With SQL_PROFILE=true, QueryProfileMiddleware adds a Server-Timing header to each response
+and logs statement shapes a request repeats, the signature of an N+1 query loop. In tests:
+
+    pytest_plugins = ["query_profiler"]
+
+    def test_list_tasks(client, query_profile):
+        client.get("/api/tasks/")
+        query_profile.check(budget=3)
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# A shape run this many times in one request is reported as a likely N+1
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "3"))
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETERS = re.compile(r"\?|%\(\w+\)s|%s|\$\d+|:\w+")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+def normalize(statement):
+    """The shape of a statement: literals and parameters become ?, and IN lists of any
+    length become (?), so the same query with different values compares equal."""
+    shape = _PARAMETERS.sub("?", _LITERALS.sub("?", statement))
+    return " ".join(_VALUE_LISTS.sub("(?)", shape).split())
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryProfile:
+    def __init__(self):
+        self.statements = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement, seconds):
+        with self._lock:
+            self.statements.append((statement, seconds))
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.statements)
+
+    def shapes(self):
+        """Statement counts by shape, most frequent first."""
+        return Counter(normalize(statement) for statement, _ in self.statements).most_common()
+
+    def repeated(self, threshold=SQL_REPEAT_THRESHOLD):
+        return [(shape, count) for shape, count in self.shapes() if count >= threshold]
+
+    def server_timing(self):
+        elapsed = (time.perf_counter() - self.started) * 1000
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.count} queries", app;dur={elapsed:.1f}'
+
+    def check(self, budget=None, repeat_threshold=SQL_REPEAT_THRESHOLD):
+        """Raises QueryBudgetExceeded when more than `budget` statements ran or a shape
+        repeated `repeat_threshold` times."""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f"{self.count} statements, budget is {budget}")
+        for shape, count in self.repeated(repeat_threshold):
+            problems.append(f"{count}x {shape}")
+        if problems:
+            raise QueryBudgetExceeded("\n".join(problems))
+
+# The profile of the request being handled, set by QueryProfileMiddleware
+_request_profile = ContextVar("request_profile", default=None)
+# Profiles recording every statement in the process, opened by profile_queries()
+_global_profiles = []
+_installed = set()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["profile_started"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("profile_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    profile = _request_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    for profile in _global_profiles:
+        profile.record(statement, elapsed)
+
+def install():
+    """Listens to the statements of every engine in database.py. Safe to call repeatedly."""
+    import database
+
+    engines = {database.engine, database.read_engine,
+               database.async_engine.sync_engine, database.async_read_engine.sync_engine}
+    for engine in engines - _installed:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        _installed.add(engine)
+
+@contextmanager
+def profile_queries():
+    """Records every statement run while the block executes, on any thread. TestClient
+    runs the app on its own thread, where a request-scoped profile would not be seen."""
+    install()
+    profile = QueryProfile()
+    _global_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _global_profiles.remove(profile)
+
+class QueryProfileMiddleware:
+    """Profiles each request's SQL: a Server-Timing header on the response, a warning
+    for repeated statement shapes, and the profile passed to every `observers` callback
+    as observer(scope, profile)."""
+
+    observers = []
+
+    def __init__(self, app, repeat_threshold=SQL_REPEAT_THRESHOLD):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = _request_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", profile.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_profile.reset(token)
+            for shape, count in profile.repeated(self.repeat_threshold):
+                logger.warning("%s %s ran %dx: %s", scope["method"], scope["path"], count, shape)
+            for observer in self.observers:
+                observer(scope, profile)
+
+try:
+    import pytest
+except ImportError:  # only needed by test suites
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_profile():
+        with profile_queries() as profile:
+            yield profile
@@ -0,0 +1,297 @@
+import argparse
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+import models
+from change_tracking import REMINDER, record_changes
+from database import SessionLocal, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+REMINDER_SCHEDULER_ENABLED = os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() == "true"
+# Reminders fired per task, as comma-separated kind=minutes relative to the due date:
+# negative before it, positive after. A kind may appear more than once.
+REMINDER_OFFSETS = os.getenv("REMINDER_OFFSETS", "due_soon=-1440,overdue=0")
+# Due dates firing within this many minutes are held in memory; later ones are loaded as
+# the window moves forward, every REMINDER_REFILL_SECONDS
+REMINDER_HORIZON_MINUTES = float(os.getenv("REMINDER_HORIZON_MINUTES", "360"))
+REMINDER_REFILL_SECONDS = float(os.getenv("REMINDER_REFILL_SECONDS", "60"))
+# Upper bound on reminders held in memory; the window shrinks to fit
+REMINDER_MAX_PENDING = int(os.getenv("REMINDER_MAX_PENDING", "100000"))
+# Reminders missed while the server was down are still sent if at most this late
+REMINDER_CATCHUP_HOURS = float(os.getenv("REMINDER_CATCHUP_HOURS", "24"))
+REMINDER_BATCH_SIZE = 500
+REMINDER_RETRY_SECONDS = 5.0
+
+CONTENT = {
+    "due_soon": 'Due soon: "{title}" is due {due:%Y-%m-%d %H:%M} UTC',
+    "overdue": 'Overdue: "{title}" was due {due:%Y-%m-%d %H:%M} UTC',
+}
+
+def parse_offsets(spec):
+    """[(kind, timedelta)] from a REMINDER_OFFSETS value."""
+    offsets = []
+    for item in spec.split(","):
+        if item.strip():
+            kind, _, minutes = item.partition("=")
+            offsets.append((kind.strip(), timedelta(minutes=float(minutes))))
+    return offsets
+
+def utc(value):
+    """Naive UTC, the form due dates are compared in; SQLite returns naive values as stored."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class ReminderScheduler:
+    """Fires "due soon" and "overdue" reminders for task due dates from a timer heap.
+
+    The heap holds (fire_at, task_id, kind, due_date) for reminders firing before
+    `loaded_until`, at most `max_pending` of them. One background thread sleeps until the
+    earliest entry, fires everything due in one transaction, and extends the window with
+    range queries on tasks.due_date. Task writes push their new due dates with schedule();
+    entries made stale by a later change, completion or deletion are recognised when they
+    come due and skipped. Reminders are inserted with ON CONFLICT DO NOTHING on
+    (task_id, kind, remind_at), so restarts and other workers never fire one twice.
+    """
+
+    def __init__(self, session_factory, offsets, horizon, refill_interval, max_pending, catchup):
+        self.session_factory = session_factory
+        self.offsets = offsets
+        self.horizon = horizon
+        self.refill_interval = refill_interval
+        self.max_pending = max_pending
+        self.catchup = catchup
+        self.loaded_until = None
+        self.fired = 0
+        self.stale = 0
+        self.duplicates = 0
+        self.errors = 0
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._next_refill = 0.0
+
+    def wants(self, due_date):
+        """Whether schedule() would hold any reminder of this due date in memory."""
+        if due_date is None or self.loaded_until is None:
+            return False
+        due_date = utc(due_date)
+        earliest = datetime.utcnow() - self.catchup
+        return any(earliest <= due_date + offset < self.loaded_until for _, offset in self.offsets)
+
+    def schedule(self, task_id, due_date):
+        """Queues the reminders of a task's due date; call after the write has committed."""
+        if due_date is None:
+            return
+        due_date = utc(due_date)
+        earliest = datetime.utcnow() - self.catchup
+        with self._condition:
+            if self.loaded_until is None:
+                return
+            for kind, offset in self.offsets:
+                fire_at = due_date + offset
+                if fire_at < earliest or fire_at >= self.loaded_until:
+                    # Too late to send, or left for the refill that reaches it
+                    continue
+                if len(self._heap) >= self.max_pending:
+                    self.loaded_until = fire_at
+                    continue
+                heapq.heappush(self._heap, (fire_at, task_id, kind, due_date))
+                if self._heap[0][0] == fire_at:
+                    self._condition.notify()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping = False
+        with self._condition:
+            self._heap = []
+            self.loaded_until = datetime.utcnow() - self.catchup
+        self._next_refill = 0.0
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping:
+            if time.monotonic() >= self._next_refill:
+                self._next_refill = time.monotonic() + self.refill_interval
+                try:
+                    self.refill()
+                except Exception:
+                    logger.exception("Loading upcoming due dates failed")
+            due = self._take_due()
+            if due and not self.fire(due):
+                with self._condition:
+                    for entry in due:
+                        heapq.heappush(self._heap, entry)
+                    self._condition.wait(REMINDER_RETRY_SECONDS)
+
+    def _take_due(self):
+        """Waits until an entry comes due or the next refill, and pops up to a batch of due entries."""
+        with self._condition:
+            if self._stopping:
+                return []
+            now = datetime.utcnow()
+            if not self._heap or self._heap[0][0] > now:
+                wait = self._next_refill - time.monotonic()
+                if self._heap:
+                    wait = min(wait, (self._heap[0][0] - now).total_seconds())
+                self._condition.wait(max(wait, 0))
+                now = datetime.utcnow()
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < REMINDER_BATCH_SIZE:
+                due.append(heapq.heappop(self._heap))
+            return due
+
+    def refill(self, end=None):
+        """Loads the reminders firing between `loaded_until` and `end` (now + horizon), as many as fit."""
+        end = end or datetime.utcnow() + self.horizon
+        with self._condition:
+            start = self.loaded_until
+            room = self.max_pending - len(self._heap)
+        if start >= end or room <= 0:
+            return
+        task = models.Task
+        entries = []
+        loaded_until = end
+        with self.session_factory() as db:
+            for kind, offset in self.offsets:
+                rows = db.execute(
+                    select(task.id, task.due_date)
+                    .where(task.due_date >= start - offset, task.due_date < end - offset, task.status != "Completed")
+                    .order_by(task.due_date)
+                    .limit(room)
+                ).all()
+                entries.extend((utc(row.due_date) + offset, row.id, kind, utc(row.due_date)) for row in rows)
+                if len(rows) == room:
+                    # Truncated: the window ends where this kind's loaded rows do
+                    loaded_until = min(loaded_until, utc(rows[-1].due_date) + offset)
+        entries = sorted(entry for entry in entries if entry[0] < loaded_until)
+        with self._condition:
+            room = self.max_pending - len(self._heap)
+            if len(entries) > room:
+                loaded_until = entries[room][0]
+                entries = entries[:room]
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+            # schedule() lowers the bound when it runs out of room; that must stick
+            self.loaded_until = loaded_until if self.loaded_until == start else min(self.loaded_until, loaded_until)
+            self._condition.notify()
+
+    def run_once(self):
+        """Fires every reminder due now without the background thread. Returns the number fired."""
+        fired = self.fired
+        with self._condition:
+            self._heap = []
+            self.loaded_until = datetime.utcnow() - self.catchup
+        now = datetime.utcnow()
+        while True:
+            self.refill(now)
+            while self._heap:
+                batch = [heapq.heappop(self._heap) for _ in range(min(len(self._heap), REMINDER_BATCH_SIZE))]
+                if not self.fire(batch):
+                    return self.fired - fired
+            if self.loaded_until >= now:
+                return self.fired - fired
+
+    def fire(self, entries):
+        """Inserts the reminders of due entries whose task still has that due date and is not
+        completed, and records them for sync and event streams. Returns False on failure."""
+        task = models.Task
+        try:
+            with self.session_factory() as db:
+                tasks = {
+                    row.id: row
+                    for row in db.execute(
+                        select(task.id, task.owner_id, task.title, task.due_date, task.status)
+                        .where(task.id.in_({entry[1] for entry in entries}))
+                    )
+                }
+                rows = {}
+                for fire_at, task_id, kind, due_date in entries:
+                    current = tasks.get(task_id)
+                    if current is None or current.status == "Completed" or utc(current.due_date) != due_date:
+                        self.stale += 1
+                        continue
+                    rows[(task_id, kind, fire_at)] = {
+                        "user_id": current.owner_id,
+                        "task_id": task_id,
+                        "kind": kind,
+                        "remind_at": fire_at,
+                        "content": CONTENT.get(kind, "{title}: due {due:%Y-%m-%d %H:%M} UTC").format(
+                            title=current.title, due=due_date
+                        ),
+                    }
+                if not rows:
+                    return True
+                reminders = models.Reminder
+                created = db.execute(
+                    dialect_insert(db, reminders)
+                    .values(list(rows.values()))
+                    .on_conflict_do_nothing(index_elements=["task_id", "kind", "remind_at"])
+                    .returning(reminders.id, reminders.user_id)
+                ).all()
+                by_user = defaultdict(list)
+                for reminder_id, user_id in created:
+                    by_user[user_id].append(reminder_id)
+                for user_id, ids in sorted(by_user.items()):
+                    record_changes(db, user_id, REMINDER, ids)
+                db.commit()
+        except Exception:
+            self.errors += 1
+            logger.exception("Failed to fire %d reminders", len(entries))
+            return False
+        self.fired += len(created)
+        self.duplicates += len(rows) - len(created)
+        return True
+
+    def stats(self):
+        with self._condition:
+            return {
+                "pending": len(self._heap),
+                "max_pending": self.max_pending,
+                "next_fire_at": self._heap[0][0].isoformat() if self._heap else None,
+                "loaded_until": self.loaded_until.isoformat() if self.loaded_until else None,
+                "fired": self.fired,
+                "stale": self.stale,
+                "duplicates": self.duplicates,
+                "errors": self.errors,
+            }
+
+reminder_scheduler = ReminderScheduler(
+    SessionLocal,
+    parse_offsets(REMINDER_OFFSETS),
+    timedelta(minutes=REMINDER_HORIZON_MINUTES),
+    REMINDER_REFILL_SECONDS,
+    REMINDER_MAX_PENDING,
+    timedelta(hours=REMINDER_CATCHUP_HOURS),
+)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fire due-date reminders that are due now")
+    parser.add_argument("command", choices=["run-once"])
+    parser.parse_args(argv)
+    print(f"Fired {reminder_scheduler.run_once()} reminders")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import threading
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+from cache import TTLCache
+
+# Rendered JSON bodies keyed by (route, user, params) and tagged with the user's data
+# version; an entry is only served while that version is current.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+_stats_lock = threading.Lock()
+_stats = {"not_modified": 0, "cache_hits": 0, "rendered": 0}
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+def make_etag(key, version):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+    return f'W/"{version}-{digest}"'
+
+def _etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (value.strip() for value in header.split(","))
+
+def _headers(etag):
+    # no-cache lets browsers keep the body but revalidate it with If-None-Match every time
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def cached_response(request: Request, key, version):
+    """Returns (response, etag). `response` is set when the request can be answered without
+    rendering: a 304 for a matching If-None-Match, or the cached body for this version."""
+    etag = make_etag(key, version)
+    if _etag_matches(request, etag):
+        _count("not_modified")
+        return Response(status_code=304, headers=_headers(etag)), etag
+    entry = response_cache.get(key)
+    if entry is not None and entry[0] == etag:
+        _count("cache_hits")
+        return Response(content=entry[1], media_type="application/json", headers=_headers(etag)), etag
+    return None, etag
+
+def render_response(key, etag, payload):
+    if fast_json.FAST_JSON_RESPONSES:
+        body = fast_json.dumps(payload)
+    else:
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+    response_cache.set(key, (etag, body))
+    _count("rendered")
+    return Response(content=body, media_type="application/json", headers=_headers(etag))
+
+def response_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    served = stats["not_modified"] + stats["cache_hits"]
+    total = served + stats["rendered"]
+    stats["hit_rate"] = served / total if total else 0.0
+    stats["entries"] = response_cache.stats()
+    return stats
@@ -1,12 +1,17 @@
+from collections import namedtuple
 from datetime import datetime, timedelta
 from typing import Optional
+import os
+import time
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import User
-from database import get_db
+from database import get_async_db, get_async_read_db
+from cache import TTLCache
+from password_hashing import hash_password, verify_password
 from pydantic import BaseModel
 
 router = APIRouter(
@@ -19,7 +24,16 @@ SECRET_KEY = "1b5ea099b51d1fc6180c0e264fbd49ee12c445ce53aa8f27d72416517505f992"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# In-process cache of decoded tokens and authenticated users. Entries live at most
+# AUTH_CACHE_TTL_SECONDS, which also bounds staleness across worker processes.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+token_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL_SECONDS)
+
+# Detached, read-only view of the user row handed to the routers
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "username", "email", "is_active", "created_at"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/token")
 
@@ -41,12 +55,6 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta if expires_delta else timedelta(minutes=15))
@@ -54,23 +62,69 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def invalidate_user(username: str):
+    user_cache.delete(username)
+
+def auth_cache_stats():
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    # Covers deactivation, credential changes and renames (old and new username)
+    history = inspect(target).attrs.username.history
+    for username in [target.username, *history.deleted]:
+        if username:
+            invalidate_user(username)
+
+def _decode_token(token: str):
+    token_data = token_cache.get(token)
+    if token_data is not None:
+        return token_data
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    token_data = TokenData(username=username)
+    expires_in = payload["exp"] - time.time() if "exp" in payload else AUTH_CACHE_TTL_SECONDS
+    token_cache.set(token, token_data, ttl=expires_in)
+    return token_data
+
+def token_subject(token: str) -> Optional[str]:
+    """Username of a validly signed, unexpired token, or None. Cached like authentication."""
+    try:
+        token_data = _decode_token(token)
+    except JWTError:
+        return None
+    return token_data.username if token_data is not None else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        token_data = _decode_token(token)
+        if token_data is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = user_cache.get(token_data.username)
     if user is None:
-        raise credentials_exception
+        db_user = await db.scalar(select(User).where(User.username == token_data.username))
+        if db_user is None:
+            raise credentials_exception
+        user = AuthenticatedUser(
+            id=db_user.id,
+            username=db_user.username,
+            email=db_user.email,
+            is_active=db_user.is_active,
+            created_at=db_user.created_at,
+        )
+        user_cache.set(user.username, user)
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
     return user
 
 @router.get("/me", response_model=UserResponse)
@@ -78,9 +132,13 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.post("/register")
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if username already exists
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def register_user(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db)
+):
+    # Check if username already exists (on a reader, so the writer is only held for the insert)
+    db_user = await read_db.scalar(select(User).where(User.username == user.username))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -88,30 +146,29 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if email already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await read_db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user (bcrypt runs on the hashing pool, not the event loop)
+    hashed_password = await hash_password(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     
     return {"message": "User created successfully"}
 
 @router.post("/token")
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 from typing import List
 import random
 
 import models
 import schemas
-from database import get_db
+from activity_log import CATEGORY_ADDITION, activity_log
+from change_tracking import CATEGORY, DELETE, get_data_version, record_changes
+from database import get_db, get_read_db, release_session
+from response_cache import cached_response, render_response
 from routers.auth import get_current_user
+from task_counters import get_categories_with_counts, init_category_stats
+from task_deletion import delete_tasks
 
 router = APIRouter(
     prefix="/api/categories",
@@ -32,45 +38,41 @@ def create_category(
         owner_id=current_user.id
     )
     db.add(db_category)
+    db.flush()
+    init_category_stats(db, db_category)
+    record_changes(db, current_user.id, CATEGORY, [db_category.id])
     db.commit()
     db.refresh(db_category)
+    activity_log.emit(current_user.id, CATEGORY_ADDITION, f'Created category "{db_category.name}"')
     return db_category
 
 @router.get("/", response_model=List[schemas.Category])
 def get_categories(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    categories = db.query(models.Category).filter(
-        models.Category.owner_id == current_user.id
-    ).all()
-    
-    # Add task count and completed tasks count to each category
-    for category in categories:
-        tasks = db.query(models.Task).filter(
-            models.Task.category_id == category.id,
-            models.Task.owner_id == current_user.id
-        ).all()
-        
-        category.task_count = len(tasks)
-        category.completed_tasks = len([task for task in tasks if task.status == "Completed"])
-        category.in_progress_tasks = len([task for task in tasks if task.status == "In Progress"])
-    
-    return categories
+    # Unchanged polls are answered from the version check alone
+    key = ("categories", current_user.id)
+    response, etag = cached_response(request, key, get_data_version(db, current_user.id))
+    if response is not None:
+        return response
+
+    # Task counts come from one grouped query (or the counters table) instead of one query per category
+    categories = get_categories_with_counts(db, current_user.id)
+    release_session(db)
+    return render_response(key, etag, [schemas.Category.model_validate(category) for category in categories])
 
 @router.get("/{category_id}", response_model=schemas.Category)
 def get_category(
     category_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    category = db.query(models.Category).filter(
-        models.Category.id == category_id,
-        models.Category.owner_id == current_user.id
-    ).first()
-    if category is None:
+    categories = get_categories_with_counts(db, current_user.id, category_id)
+    if not categories:
         raise HTTPException(status_code=404, detail="Category not found")
-    return category
+    return categories[0]
 
 @router.put("/{category_id}", response_model=schemas.Category)
 def update_category(
@@ -88,6 +90,7 @@ def update_category(
     
     db_category.name = category.name
     db_category.color = category.color or db_category.color
+    record_changes(db, current_user.id, CATEGORY, [category_id])
     
     db.commit()
     db.refresh(db_category)
@@ -99,26 +102,20 @@ def delete_category(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    owned = db.scalar(select(models.Category.id).where(
+        models.Category.id == category_id,
+        models.Category.owner_id == current_user.id
+    ))
+    if owned is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+
     try:
-        db_category = db.query(models.Category).filter(
-            models.Category.id == category_id,
-            models.Category.owner_id == current_user.id
-        ).first()
-        
-        if db_category is None:
-            raise HTTPException(status_code=404, detail="Category not found")
-        
-        # First, delete all tasks in this category
-        tasks = db.query(models.Task).filter(
-            models.Task.category_id == category_id,
-            models.Task.owner_id == current_user.id
-        ).all()
-        
-        for task in tasks:
-            db.delete(task)
-        
-        # Then delete the category
-        db.delete(db_category)
+        # First its tasks, in chunks that commit one at a time; the last chunk shares the
+        # transaction that deletes the category, so no task can be added in between
+        delete_tasks(db, current_user.id, models.Task.category_id == category_id)
+        # The counters row goes with the category through ON DELETE CASCADE
+        db.execute(delete(models.Category).where(models.Category.id == category_id))
+        record_changes(db, current_user.id, CATEGORY, [category_id], DELETE)
         db.commit()
         
         return {"message": "Category and its tasks deleted successfully"}
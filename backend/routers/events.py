@@ -0,0 +1,78 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+
+from change_events import EVENTS_HEARTBEAT_SECONDS, change_hub
+from database import get_async_read_db, release_async_session
+from routers.auth import get_current_user
+
+router = APIRouter(
+    prefix="/api/events",
+    tags=["events"]
+)
+
+bearer_token = OAuth2PasswordBearer(tokenUrl="/users/token", auto_error=False)
+
+READY = b"retry: 5000\nevent: ready\ndata: {}\n\n"
+HEARTBEAT = b": keepalive\n\n"
+# Sent to a client that fell too far behind, before its stream is closed
+OVERFLOW = b"event: overflow\ndata: {}\n\n"
+
+async def event_stream(subscriber):
+    try:
+        yield READY
+        while not subscriber.dropped:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield HEARTBEAT
+                continue
+            if item is None:
+                # The worker is shutting down
+                return
+            published_at, frame = item
+            yield frame
+            change_hub.delivered(published_at)
+        yield OVERFLOW
+    finally:
+        change_hub.unsubscribe(subscriber)
+
+@router.get("/")
+async def stream_events(
+    # EventSource cannot send an Authorization header, so the token may come in the query
+    access_token: Optional[str] = Query(None),
+    header_token: Optional[str] = Depends(bearer_token),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Server-sent `changes` events whenever the user's tasks, categories, tags or reminders
+    change. Each carries the changed ids by entity and op, and a sync token for /api/sync/."""
+    token = header_token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    current_user = await get_current_user(token, db)
+    # The stream may stay open for hours; it must not hold a pooled connection
+    await release_async_session(db)
+
+    subscriber = await change_hub.subscribe(current_user.id)
+    if subscriber is None:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many open event streams")
+
+    async def close():
+        # Also covers clients that disconnect before the stream starts
+        change_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(close),
+    )
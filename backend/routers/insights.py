@@ -1,72 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 from typing import List
-from database import get_db
-from models import Task, Activity, User
-from schemas import InsightsResponse, HighPriorityTask, Activity as ActivitySchema, WeeklyInsights
+import os
+from change_tracking import get_data_version_async
+from database import get_async_read_db
+from models import Task, Activity, User, WeeklyTaskStats
+from schemas import InsightsResponse, HighPriorityTask, Activity as ActivitySchema, WeeklyInsights, WeeklyStats
+from response_cache import cached_response, render_response
 from routers.auth import get_current_user
+from task_counters import week_start
 
 router = APIRouter(
     prefix="/insights",
     tags=["insights"]
 )
 
+# Weekly counts come from the weekly_task_stats rollup, maintained by task writes.
+# When disabled they are computed from the tasks table in one conditional aggregate.
+INSIGHTS_ROLLUP_ENABLED = os.getenv("INSIGHTS_ROLLUP", "true").lower() == "true"
+
+def days_until(due_date):
+    now = datetime.now(due_date.tzinfo) if due_date.tzinfo else datetime.now()
+    return (due_date - now).days
+
+async def weekly_counts_from_rollup(db: AsyncSession, user_id: int, weeks):
+    rows = await db.execute(
+        select(WeeklyTaskStats.week_start, WeeklyTaskStats.tasks_created, WeeklyTaskStats.tasks_completed).where(
+            WeeklyTaskStats.user_id == user_id,
+            WeeklyTaskStats.week_start >= weeks[0],
+            WeeklyTaskStats.week_start <= weeks[-1]
+        )
+    )
+    counts = {row.week_start: (row.tasks_created, row.tasks_completed) for row in rows}
+    return [counts.get(week, (0, 0)) for week in weeks]
+
+async def weekly_counts_from_tasks(db: AsyncSession, user_id: int, weeks):
+    # One pass over the user's recent tasks with a conditional count per week
+    completed_at = func.coalesce(Task.updated_at, Task.created_at)
+    columns = []
+    for week in weeks:
+        start = datetime.combine(week, datetime.min.time())
+        end = start + timedelta(days=7)
+        columns.append(func.sum(case(
+            (and_(Task.created_at >= start, Task.created_at < end), 1), else_=0
+        )))
+        columns.append(func.sum(case(
+            (and_(Task.status == "Completed", completed_at >= start, completed_at < end), 1), else_=0
+        )))
+    first_start = datetime.combine(weeks[0], datetime.min.time())
+    row = (await db.execute(
+        select(*columns).where(
+            Task.owner_id == user_id,
+            or_(Task.created_at >= first_start, Task.updated_at >= first_start)
+        )
+    )).one()
+    return [(row[i] or 0, row[i + 1] or 0) for i in range(0, len(row), 2)]
+
 @router.get("/", response_model=InsightsResponse)
 async def get_insights(
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db),
+    trend_weeks: int = Query(0, ge=0, le=52)
 ):
-    # Get high priority tasks
-    high_priority_tasks = db.query(Task).filter(
-        Task.owner_id == current_user.id,
-        Task.priority == "High",
-        Task.status != "Completed"
-    ).all()
+    # days_remaining and the current week move with the clock, so the hour is part of the key:
+    # a cached response is at most an hour behind them
+    key = ("insights", current_user.id, trend_weeks, datetime.now().strftime("%Y-%m-%dT%H"))
+    response, etag = cached_response(request, key, await get_data_version_async(db, current_user.id))
+    if response is not None:
+        return response
+
+    # Get high priority tasks, loading category and tags up front (no lazy loads on an async session)
+    high_priority_tasks = (await db.scalars(
+        select(Task).options(
+            selectinload(Task.category),
+            selectinload(Task.tags)
+        ).where(
+            Task.owner_id == current_user.id,
+            Task.priority == "High",
+            Task.status != "Completed"
+        )
+    )).all()
 
     # Calculate days remaining for each task
     high_priority_tasks_with_days = []
     for task in high_priority_tasks:
-        days_remaining = None
+        high_priority_task = HighPriorityTask.model_validate(task)
         if task.due_date:
-            days_remaining = (task.due_date - datetime.now()).days
-        high_priority_tasks_with_days.append(
-            HighPriorityTask(
-                **task.__dict__,
-                days_remaining=days_remaining
-            )
-        )
+            high_priority_task.days_remaining = days_until(task.due_date)
+        high_priority_tasks_with_days.append(high_priority_task)
 
     # Get recent activities
-    recent_activities = db.query(Activity).filter(
-        Activity.user_id == current_user.id
-    ).order_by(Activity.timestamp.desc()).limit(10).all()
+    recent_activities = (await db.scalars(
+        select(Activity).where(
+            Activity.user_id == current_user.id
+        ).order_by(Activity.timestamp.desc()).limit(10)
+    )).all()
 
     # Calculate weekly insights
-    now = datetime.now()
-    week_start = now - timedelta(days=now.weekday())
-    last_week_start = week_start - timedelta(days=7)
+    this_week = week_start(datetime.utcnow())
+    weeks = [this_week - timedelta(weeks=i) for i in range(max(trend_weeks, 2) - 1, -1, -1)]
+    if INSIGHTS_ROLLUP_ENABLED:
+        counts = await weekly_counts_from_rollup(db, current_user.id, weeks)
+    else:
+        counts = await weekly_counts_from_tasks(db, current_user.id, weeks)
 
-    # This week's stats
-    tasks_created_this_week = db.query(func.count(Task.id)).filter(
-        Task.owner_id == current_user.id,
-        Task.created_at >= week_start
-    ).scalar()
-
-    tasks_completed_this_week = db.query(func.count(Task.id)).filter(
-        Task.owner_id == current_user.id,
-        Task.status == "Completed",
-        Task.updated_at >= week_start
-    ).scalar()
-
-    # Last week's stats for comparison
-    tasks_completed_last_week = db.query(func.count(Task.id)).filter(
-        Task.owner_id == current_user.id,
-        Task.status == "Completed",
-        Task.updated_at >= last_week_start,
-        Task.updated_at < week_start
-    ).scalar()
+    tasks_created_this_week, tasks_completed_this_week = counts[-1]
+    tasks_completed_last_week = counts[-2][1]
 
     # Calculate productivity trend
     productivity_trend = 0
@@ -80,8 +123,14 @@ async def get_insights(
         high_priority_tasks=len(high_priority_tasks)
     )
 
-    return InsightsResponse(
+    weekly_trend = [
+        WeeklyStats(week_start=week, tasks_created=created, tasks_completed=completed)
+        for week, (created, completed) in zip(weeks, counts)
+    ][-trend_weeks:] if trend_weeks else []
+
+    return render_response(key, etag, InsightsResponse(
         high_priority_tasks=high_priority_tasks_with_days,
         recent_activities=recent_activities,
-        weekly_insights=weekly_insights
-    ) 
\ No newline at end of file
+        weekly_insights=weekly_insights,
+        weekly_trend=weekly_trend
+    ))
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from models import Reminder as ReminderModel
 from schemas import Reminder, ReminderCreate, ReminderUpdate
-from database import get_db
+from change_tracking import DELETE, REMINDER, record_changes_async
+from database import get_async_db, get_async_read_db, release_async_session
+from fast_json import FAST_JSON_RESPONSES, json_response, row_records
 from routers.auth import get_current_user
 from models import User
 
@@ -13,32 +16,50 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[Reminder])
-def get_reminders(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(ReminderModel).filter(ReminderModel.user_id == current_user.id).all()
+async def get_reminders(db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    if FAST_JSON_RESPONSES:
+        reminders = row_records(await db.execute(
+            select(
+                ReminderModel.content, ReminderModel.id, ReminderModel.user_id,
+                ReminderModel.created_at, ReminderModel.updated_at,
+                ReminderModel.task_id, ReminderModel.kind, ReminderModel.remind_at
+            ).where(ReminderModel.user_id == current_user.id)
+        ))
+        await release_async_session(db)
+        return json_response(reminders)
+    reminders = (await db.scalars(select(ReminderModel).where(ReminderModel.user_id == current_user.id))).all()
+    await release_async_session(db)
+    return reminders
 
 @router.post("/", response_model=Reminder, status_code=status.HTTP_201_CREATED)
-def create_reminder(reminder: ReminderCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_reminder(reminder: ReminderCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     db_reminder = ReminderModel(content=reminder.content, user_id=current_user.id)
     db.add(db_reminder)
-    db.commit()
-    db.refresh(db_reminder)
+    await db.flush()
+    await record_changes_async(db, current_user.id, REMINDER, [db_reminder.id])
+    await db.commit()
+    await db.refresh(db_reminder)
+    await release_async_session(db)
     return db_reminder
 
 @router.put("/{reminder_id}", response_model=Reminder)
-def update_reminder(reminder_id: int, reminder: ReminderUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_reminder = db.query(ReminderModel).filter(ReminderModel.id == reminder_id, ReminderModel.user_id == current_user.id).first()
+async def update_reminder(reminder_id: int, reminder: ReminderUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    db_reminder = await db.scalar(select(ReminderModel).where(ReminderModel.id == reminder_id, ReminderModel.user_id == current_user.id))
     if not db_reminder:
         raise HTTPException(status_code=404, detail="Reminder not found")
     db_reminder.content = reminder.content
-    db.commit()
-    db.refresh(db_reminder)
+    await record_changes_async(db, current_user.id, REMINDER, [reminder_id])
+    await db.commit()
+    await db.refresh(db_reminder)
+    await release_async_session(db)
     return db_reminder
 
 @router.delete("/{reminder_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_reminder(reminder_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_reminder = db.query(ReminderModel).filter(ReminderModel.id == reminder_id, ReminderModel.user_id == current_user.id).first()
+async def delete_reminder(reminder_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    db_reminder = await db.scalar(select(ReminderModel).where(ReminderModel.id == reminder_id, ReminderModel.user_id == current_user.id))
     if not db_reminder:
         raise HTTPException(status_code=404, detail="Reminder not found")
-    db.delete(db_reminder)
-    db.commit()
-    return None 
\ No newline at end of file
+    await db.delete(db_reminder)
+    await record_changes_async(db, current_user.id, REMINDER, [reminder_id], DELETE)
+    await db.commit()
+    return None
\ No newline at end of file
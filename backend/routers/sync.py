@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+import models
+from change_tracking import CATEGORY, DELETE, REMINDER, TAG, TASK, compact_change_log
+from database import dialect_insert, get_async_db, get_async_read_db
+from routers.auth import get_current_user
+from schemas import Reminder, SyncCategory, SyncResponse, SyncTask, Tag, Tombstone
+
+router = APIRouter(
+    prefix="/api/sync",
+    tags=["sync"]
+)
+
+SYNC_PAGE_SIZE = 1000
+
+def _owned(model, user_id, ids):
+    owner = model.user_id if model is models.Reminder else model.owner_id
+    query = select(model).where(owner == user_id)
+    return query if ids is None else query.where(model.id.in_(ids))
+
+async def load_entities(db: AsyncSession, user_id: int, ids_by_entity=None):
+    """Loads the user's entities, all of them or only the given ids per entity type."""
+    def ids(entity):
+        return None if ids_by_entity is None else ids_by_entity.get(entity, [])
+
+    payload = {}
+    if ids(TASK) != []:
+        tasks = (await db.scalars(_owned(models.Task, user_id, ids(TASK)).options(selectinload(models.Task.tags)))).all()
+        payload["tasks"] = [
+            SyncTask.model_validate(task).model_copy(update={"tag_ids": sorted(tag.id for tag in task.tags)})
+            for task in tasks
+        ]
+    if ids(CATEGORY) != []:
+        categories = await db.scalars(_owned(models.Category, user_id, ids(CATEGORY)))
+        payload["categories"] = [SyncCategory.model_validate(category) for category in categories]
+    if ids(TAG) != []:
+        tags = await db.scalars(_owned(models.Tag, user_id, ids(TAG)))
+        payload["tags"] = [Tag.model_validate(tag) for tag in tags]
+    if ids(REMINDER) != []:
+        reminders = await db.scalars(_owned(models.Reminder, user_id, ids(REMINDER)))
+        payload["reminders"] = [Reminder.model_validate(reminder) for reminder in reminders]
+    return payload
+
+def parse_token(token: Optional[str]):
+    if not token:
+        return None
+    try:
+        return int(token)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+@router.get("/", response_model=SyncResponse)
+async def sync(
+    client_id: str = Query(..., min_length=1, max_length=64),
+    since: Optional[str] = None,
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Pass the returned token back as `since`; while has_more is true, call again right away.
+    # Without a usable token (first sync, or compacted past it) the response is a full snapshot.
+    # Everything is read on one reader snapshot; only the client's position goes to the writer.
+    since_id = parse_token(since)
+    log = models.ChangeLog
+    client = await read_db.get(models.SyncClient, (current_user.id, client_id))
+    reset = since_id is None or client is None or since_id < client.token
+
+    if reset:
+        # Read the token first: changes committed while loading are sent again next time
+        token = await read_db.scalar(select(func.max(log.id)).where(log.user_id == current_user.id)) or 0
+        response = SyncResponse(token=str(token), reset=True, **await load_entities(read_db, current_user.id))
+        acknowledged = 0
+    else:
+        changes = (await read_db.execute(
+            select(log.id, log.entity, log.entity_id, log.op)
+            .where(log.user_id == current_user.id, log.id > since_id)
+            .order_by(log.id)
+            .limit(limit)
+        )).all()
+        latest = {}
+        for change in changes:
+            latest[(change.entity, change.entity_id)] = change.op
+        upserts = defaultdict(list)
+        deleted = []
+        for (entity, entity_id), op in latest.items():
+            if op == DELETE:
+                deleted.append(Tombstone(entity=entity, id=entity_id))
+            else:
+                upserts[entity].append(entity_id)
+        response = SyncResponse(
+            token=str(changes[-1].id if changes else since_id),
+            has_more=len(changes) == limit,
+            deleted=deleted,
+            **await load_entities(read_db, current_user.id, upserts)
+        )
+        acknowledged = since_id
+
+    # The client has applied everything up to `since`; the log below every client's
+    # acknowledged token can go
+    clients = models.SyncClient
+    statement = dialect_insert(db, clients).values(
+        user_id=current_user.id, client_id=client_id, token=acknowledged, last_seen=datetime.utcnow()
+    )
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[clients.user_id, clients.client_id],
+        set_={"token": statement.excluded.token, "last_seen": statement.excluded.last_seen},
+    ))
+    await db.commit()
+    if client is not None and acknowledged > client.token:
+        await db.run_sync(compact_change_log, current_user.id)
+    return response
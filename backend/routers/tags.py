@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 from typing import List
 import random
 
 import models
 import schemas
-from database import get_db
+from change_tracking import DELETE, TAG, TASK, get_data_version, record_changes
+from database import get_db, get_read_db, release_session
+from fast_json import FAST_JSON_RESPONSES, row_records
+from response_cache import cached_response, render_response
 from routers.auth import get_current_user
 
 router = APIRouter(
@@ -35,24 +39,41 @@ def create_tag(
         owner_id=current_user.id
     )
     db.add(db_tag)
+    db.flush()
+    record_changes(db, current_user.id, TAG, [db_tag.id])
     db.commit()
     db.refresh(db_tag)
     return db_tag
 
 @router.get("/", response_model=List[schemas.Tag])
 def get_tags(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    key = ("tags", current_user.id)
+    response, etag = cached_response(request, key, get_data_version(db, current_user.id))
+    if response is not None:
+        return response
+
+    if FAST_JSON_RESPONSES:
+        tags = row_records(db.execute(
+            select(models.Tag.name, models.Tag.color, models.Tag.id, models.Tag.owner_id)
+            .where(models.Tag.owner_id == current_user.id)
+        ))
+        release_session(db)
+        return render_response(key, etag, tags)
+
     tags = db.query(models.Tag).filter(
         models.Tag.owner_id == current_user.id
     ).all()
-    return tags
+    release_session(db)
+    return render_response(key, etag, [schemas.Tag.model_validate(tag) for tag in tags])
 
 @router.get("/{tag_id}", response_model=schemas.Tag)
 def get_tag(
     tag_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     tag = db.query(models.Tag).filter(
@@ -82,6 +103,7 @@ def update_tag(
     
     db_tag.name = tag_name
     db_tag.color = tag.color or db_tag.color
+    record_changes(db, current_user.id, TAG, [tag_id])
     
     db.commit()
     db.refresh(db_tag)
@@ -93,13 +115,17 @@ def delete_tag(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_tag = db.query(models.Tag).filter(
+    owned = db.scalar(select(models.Tag.id).where(
         models.Tag.id == tag_id,
         models.Tag.owner_id == current_user.id
-    ).first()
-    if db_tag is None:
+    ))
+    if owned is None:
         raise HTTPException(status_code=404, detail="Tag not found")
     
-    db.delete(db_tag)
+    # Tasks that carried the tag change too; record them before the cascade drops the links
+    tagged_tasks = select(models.task_tags.c.task_id).where(models.task_tags.c.tag_id == tag_id)
+    record_changes(db, current_user.id, TASK, tagged_tasks)
+    record_changes(db, current_user.id, TAG, [tag_id], DELETE)
+    db.execute(delete(models.Tag).where(models.Tag.id == tag_id))
     db.commit()
     return {"message": "Tag deleted successfully"} 
\ No newline at end of file
@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select, true, update
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel
+from collections import defaultdict
 from datetime import datetime
 
 import models
-from database import get_db
+import task_search
+import task_transfer
+from activity_log import emit_task_activity
+from change_tracking import DELETE, TASK, record_changes
+from database import ReadSessionLocal, dialect_insert, get_db, get_read_db, lock_for_write, release_session
+from fast_json import FAST_JSON_RESPONSES, RecordBundle, json_response
+from pagination import decode_cursor, keyset_paginate
 from routers.auth import get_current_user
+from task_counters import CounterDeltas, TaskSnapshot, record_task_change, snapshot
+from task_deletion import delete_task_rows, delete_tasks
+from reminder_scheduler import reminder_scheduler
 
 router = APIRouter(
     prefix="/api/tasks",
@@ -43,6 +56,44 @@ class TaskResponse(TaskBase):
     class Config:
         from_attributes = True
 
+# TaskResponse columns in field order, for serializing rows without building the model
+TASK_RESPONSE_ROW = RecordBundle(
+    "task", models.Task.title, models.Task.description, models.Task.status, models.Task.id,
+    models.Task.owner_id, models.Task.priority, models.Task.due_date, models.Task.created_at,
+    models.Task.updated_at, models.Task.category_id, single_entity=True
+)
+
+class BulkTaskOperation(BaseModel):
+    op: Literal["create", "update", "status", "delete"]
+    id: Optional[int] = None
+    task: Optional[TaskUpdate] = None
+    status: Optional[str] = None
+
+class BulkTaskRequest(BaseModel):
+    operations: List[BulkTaskOperation]
+    # When set, any failed operation leaves the whole batch unapplied
+    atomic: bool = False
+
+class BulkTaskResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[int] = None
+    ok: bool = False
+    status_code: int = 200
+    detail: Optional[str] = None
+
+class BulkTaskResponse(BaseModel):
+    results: List[BulkTaskResult]
+    succeeded: int
+    failed: int
+
+class TaskTagsRequest(BaseModel):
+    task_ids: List[int]
+    tag_ids: List[int]
+
+BULK_MAX_OPERATIONS = 1000
+TAG_ASSIGNMENT_MAX_IDS = 1000
+
 @router.post("/", response_model=TaskResponse)
 def create_task(
     task: TaskCreate, 
@@ -83,8 +134,15 @@ def create_task(
             category_id=task.category_id
         )
         db.add(db_task)
+        db.flush()
+        after = snapshot(db_task, written=True)
+        record_task_change(db, after=after)
+        record_changes(db, current_user.id, TASK, [db_task.id])
         db.commit()
         db.refresh(db_task)
+        release_session(db)
+        emit_task_activity(current_user.id, db_task.title, after=after)
+        reminder_scheduler.schedule(db_task.id, db_task.due_date)
         return db_task
     except Exception as e:
         db.rollback()
@@ -93,37 +151,352 @@ def create_task(
             detail=f"An error occurred while creating the task: {str(e)}"
         )
 
+# Sort keys accepted by GET /api/tasks, with whether the column can be NULL
+TASK_SORT_KEYS = {
+    "id": (models.Task.id, False),
+    "created_at": (models.Task.created_at, False),
+    "updated_at": (models.Task.updated_at, True),
+    "due_date": (models.Task.due_date, True),
+}
+
+def parse_date_param(value: Optional[str], name: str):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {name} format. Please use ISO format (YYYY-MM-DD)"
+        )
+
+def reopened(before, after):
+    """A completed task moved back to another status, whose due date reminders apply again."""
+    return before.status == "Completed" and after.status != "Completed"
+
+def bulk_operation_values(op: BulkTaskOperation, owned_categories):
+    """Validates one bulk operation and returns the column values it writes."""
+    if op.op == "delete":
+        return {}
+    if op.op == "status":
+        new_status = op.status or (op.task.status if op.task else None)
+        if not new_status:
+            raise HTTPException(status_code=400, detail="status is required")
+        return {"status": new_status}
+    if op.task is None:
+        raise HTTPException(status_code=400, detail="task is required")
+
+    values = op.task.dict(exclude_unset=True)
+    if 'due_date' in values:
+        values['due_date'] = parse_date_param(values['due_date'], "due_date")
+    if values.get('category_id') is not None and values['category_id'] not in owned_categories:
+        raise HTTPException(status_code=404, detail="Category not found or you don't have access to it")
+    if op.op == "create":
+        if not values.get('title'):
+            raise HTTPException(status_code=400, detail="title is required")
+        # Every created row gets the same keys so the batch is a single INSERT
+        return {
+            "title": values['title'],
+            "description": values.get('description'),
+            "status": values.get('status') or "Pending",
+            "priority": values.get('priority') or "Medium",
+            "due_date": values.get('due_date'),
+            "category_id": values.get('category_id'),
+        }
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    return values
+
+@router.post("/bulk", response_model=BulkTaskResponse)
+def bulk_tasks(
+    request: BulkTaskRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Ownership of every referenced task and category is checked with one query each,
+    # then all writes go out as grouped INSERT/UPDATE/DELETE statements in one transaction.
+    operations = request.operations
+    if len(operations) > BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_MAX_OPERATIONS} operations are allowed per request"
+        )
+    results = [BulkTaskResult(index=index, op=op.op, id=op.id) for index, op in enumerate(operations)]
+
+    def fail(index, status_code, detail):
+        results[index].status_code = status_code
+        results[index].detail = detail
+
+    owned = {}
+    titles = {}
+    due_dates = {}
+    task_ids = {op.id for op in operations if op.op != "create" and op.id is not None}
+    if task_ids:
+        # Locked, so a concurrent write cannot change the "before" the counter deltas use
+        lock_for_write(db)
+        rows = db.execute(
+            select(
+                models.Task.id, models.Task.title, models.Task.category_id, models.Task.status,
+                models.Task.created_at, models.Task.updated_at, models.Task.due_date
+            ).where(models.Task.owner_id == current_user.id, models.Task.id.in_(task_ids))
+            .with_for_update()
+        ).all()
+        owned = {
+            row.id: TaskSnapshot(current_user.id, row.category_id, row.status, row.created_at, row.updated_at)
+            for row in rows
+        }
+        titles = {row.id: row.title for row in rows}
+        due_dates = {row.id: row.due_date for row in rows}
+    category_ids = {op.task.category_id for op in operations if op.task and op.task.category_id is not None}
+    owned_categories = set()
+    if category_ids:
+        owned_categories = set(db.scalars(
+            select(models.Category.id).where(
+                models.Category.owner_id == current_user.id,
+                models.Category.id.in_(category_ids)
+            )
+        ))
+
+    creates = []
+    changes = defaultdict(list)
+    deletes = []
+    seen = set()
+    for index, op in enumerate(operations):
+        try:
+            values = bulk_operation_values(op, owned_categories)
+        except HTTPException as e:
+            fail(index, e.status_code, e.detail)
+            continue
+        if op.op == "create":
+            creates.append((index, values))
+            continue
+        if op.id not in owned:
+            fail(index, 404, "Task not found")
+        elif op.id in seen:
+            fail(index, 409, "Task appears in more than one operation")
+        elif op.op == "delete":
+            seen.add(op.id)
+            deletes.append((index, op.id))
+        else:
+            # Operations writing identical values share one UPDATE ... WHERE id IN (...)
+            seen.add(op.id)
+            changes[tuple(sorted(values.items()))].append((index, op.id))
+
+    failed = sum(1 for result in results if result.status_code >= 400)
+    if failed and request.atomic:
+        for result in results:
+            if result.status_code < 400:
+                fail(result.index, 424, "Not applied because another operation failed")
+        response.status_code = 400
+        return BulkTaskResponse(results=results, succeeded=0, failed=len(results))
+
+    written_at = datetime.utcnow()
+    deltas = CounterDeltas()
+    activities = []
+    # (task id, due date) of written tasks that may need reminders
+    schedule = []
+    try:
+        if creates:
+            new_ids = db.scalars(
+                insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True),
+                [dict(values, owner_id=current_user.id) for _, values in creates]
+            ).all()
+            for (index, values), task_id in zip(creates, new_ids):
+                results[index].id = task_id
+                results[index].status_code = 201
+                after = TaskSnapshot(current_user.id, values["category_id"], values["status"], written_at, written_at)
+                deltas.add(after=after)
+                activities.append((values["title"], None, after))
+                schedule.append((task_id, values["due_date"]))
+
+        for key, items in changes.items():
+            values = dict(key)
+            db.execute(
+                update(models.Task)
+                .where(models.Task.owner_id == current_user.id, models.Task.id.in_([task_id for _, task_id in items]))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            counted = {name: values[name] for name in ("category_id", "status") if name in values}
+            for _, task_id in items:
+                before = owned[task_id]
+                after = before._replace(updated_at=written_at, **counted)
+                deltas.add(before, after)
+                activities.append((values.get("title", titles[task_id]), before, after))
+                if "due_date" in values or reopened(before, after):
+                    schedule.append((task_id, values.get("due_date", due_dates[task_id])))
+
+        if deletes:
+            delete_ids = [task_id for _, task_id in deletes]
+            for _, before in delete_task_rows(db, current_user.id, models.Task.id.in_(delete_ids)):
+                deltas.add(before=before)
+
+        deltas.flush(db)
+        written_ids = [results[index].id for index, _ in creates]
+        written_ids += [task_id for items in changes.values() for _, task_id in items]
+        if written_ids:
+            record_changes(db, current_user.id, TASK, written_ids)
+        if deletes:
+            record_changes(db, current_user.id, TASK, delete_ids, DELETE)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred while applying bulk task operations: {str(e)}"
+        )
+
+    for title, before, after in activities:
+        emit_task_activity(current_user.id, title, before, after)
+    for task_id, due_date in schedule:
+        reminder_scheduler.schedule(task_id, due_date)
+    for result in results:
+        result.ok = result.status_code < 400
+    return BulkTaskResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
 @router.get("/", response_model=List[TaskResponse])
 def get_tasks(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
     category_id: Optional[int] = None,
+    status: Optional[List[str]] = Query(None),
+    priority: Optional[List[str]] = Query(None),
+    tag_id: Optional[int] = None,
+    due_after: Optional[str] = None,
+    due_before: Optional[str] = None,
+    sort: str = Query("id", enum=list(TASK_SORT_KEYS)),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    cursor: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = Query(100, ge=1, le=1000)
 ):
+    # Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
+    # `skip` is kept for OFFSET paging by older clients and is ignored with a cursor.
+    due_after = parse_date_param(due_after, "due_after")
+    due_before = parse_date_param(due_before, "due_before")
+    sort_column, nullable = TASK_SORT_KEYS[sort]
+    if cursor:
+        decode_cursor(cursor, sort, order)
+
     try:
-        query = db.query(models.Task).filter(models.Task.owner_id == current_user.id)
+        entity = TASK_RESPONSE_ROW if FAST_JSON_RESPONSES else models.Task
+        query = db.query(entity).filter(models.Task.owner_id == current_user.id)
         
         if category_id is not None:
             query = query.filter(models.Task.category_id == category_id)
-        
-        tasks = query.offset(skip).limit(limit).all()
-        return tasks
+        if status:
+            query = query.filter(models.Task.status.in_(status))
+        if priority:
+            query = query.filter(models.Task.priority.in_(priority))
+        if tag_id is not None:
+            query = query.filter(models.Task.id.in_(
+                select(models.task_tags.c.task_id).where(models.task_tags.c.tag_id == tag_id)
+            ))
+        if due_after is not None:
+            query = query.filter(models.Task.due_date >= due_after)
+        if due_before is not None:
+            query = query.filter(models.Task.due_date < due_before)
+
+        if skip and not cursor:
+            if sort_column is models.Task.id:
+                query = query.order_by(models.Task.id.desc() if order == "desc" else models.Task.id.asc())
+            else:
+                query = query.order_by(
+                    sort_column.desc() if order == "desc" else sort_column.asc(),
+                    models.Task.id.desc() if order == "desc" else models.Task.id.asc()
+                )
+            tasks = query.offset(skip).limit(limit).all()
+            release_session(db)
+            return json_response(tasks) if FAST_JSON_RESPONSES else tasks
+
+        tasks, next_cursor = keyset_paginate(
+            query, sort_column, models.Task.id, sort, order, cursor, limit, nullable
+        )
+        release_session(db)
+        if FAST_JSON_RESPONSES:
+            response = json_response(tasks)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response if FAST_JSON_RESPONSES else tasks
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"An error occurred while fetching tasks: {str(e)}"
         )
 
+@router.get("/search", response_model=List[TaskResponse])
+def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    # Ranked matches on title and description; every word in q is matched as a prefix
+    tasks = task_search.search_tasks(db, current_user.id, q, skip, limit)
+    release_session(db)
+    return tasks
+
+@router.get("/export")
+def export_tasks(
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    current_user: models.User = Depends(get_current_user)
+):
+    # The generator owns its session, so the cursor stays open for the whole response
+    def stream():
+        with ReadSessionLocal() as db:
+            records = task_transfer.export_records(db, current_user.id)
+            if format == "csv":
+                yield from task_transfer.csv_lines(records)
+            else:
+                yield from task_transfer.ndjson_lines(records)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'}
+    )
+
+@router.post("/import")
+async def import_tasks(
+    request: Request,
+    format: str = Query("ndjson", enum=["ndjson", "csv"]),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # The upload is parsed as it arrives and written in committed batches; rows with an
+    # unknown category or tag are skipped and reported
+    importer = await run_in_threadpool(task_transfer.TaskImporter, db, current_user.id)
+    lines = task_transfer.iter_lines(request.stream())
+    records = task_transfer.csv_records(lines) if format == "csv" else task_transfer.ndjson_records(lines)
+    try:
+        async for line, record in records:
+            if importer.add(line, record):
+                await run_in_threadpool(importer.flush)
+        await run_in_threadpool(importer.finish)
+    except UnicodeDecodeError:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=400, detail="The upload must be UTF-8 encoded")
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred after importing {importer.imported} tasks: {str(e)}"
+        )
+    return {"imported": importer.imported, "failed": importer.failed, "errors": importer.errors}
+
 @router.get("/{task_id}", response_model=TaskResponse)
 def get_task(
     task_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user)
 ):
     task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    release_session(db)
     return task
 
 @router.put("/{task_id}", response_model=TaskResponse)
@@ -133,7 +506,11 @@ def update_task(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
+    # Locked, so a concurrent update cannot read the same "before" and count the change twice
+    lock_for_write(db)
+    db_task = db.query(models.Task).filter(
+        models.Task.id == task_id, models.Task.owner_id == current_user.id
+    ).with_for_update().first()
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -153,21 +530,39 @@ def update_task(
         else:
             task_data['due_date'] = None
 
+    # Validate category if it is being changed
+    if task_data.get('category_id') is not None:
+        category = db.query(models.Category).filter(
+            models.Category.id == task_data['category_id'],
+            models.Category.owner_id == current_user.id
+        ).first()
+        if not category:
+            raise HTTPException(
+                status_code=404,
+                detail="Category not found or you don't have access to it"
+            )
+
     # Update task attributes
+    before = snapshot(db_task)
     for key, value in task_data.items():
         setattr(db_task, key, value)
+    # An update that changes nothing issues no UPDATE, so updated_at keeps its value
+    after = snapshot(db_task, written=db.is_modified(db_task))
+    record_task_change(db, before, after)
+    record_changes(db, current_user.id, TASK, [task_id])
 
     db.commit()
     db.refresh(db_task)
+    release_session(db)
+    emit_task_activity(current_user.id, db_task.title, before, after)
+    if 'due_date' in task_data or reopened(before, after):
+        reminder_scheduler.schedule(db_task.id, db_task.due_date)
     return db_task
 
 @router.delete("/{task_id}")
 def delete_task(task_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
-    if not task:
+    if not delete_tasks(db, current_user.id, models.Task.id == task_id):
         raise HTTPException(status_code=404, detail="Task not found")
-
-    db.delete(task)
     db.commit()
     return {"message": "Task deleted successfully"}
 
@@ -178,17 +573,98 @@ def update_task_status(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
+    # Locked, so a concurrent update cannot read the same "before" and count the change twice
+    lock_for_write(db)
+    db_task = db.query(models.Task).filter(
+        models.Task.id == task_id, models.Task.owner_id == current_user.id
+    ).with_for_update().first()
     if not db_task:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    for key, value in status_update.dict(exclude_unset=True).items():
+
+    before = snapshot(db_task)
+    fields = status_update.dict(exclude_unset=True)
+    for key, value in fields.items():
         setattr(db_task, key, value)
+    after = snapshot(db_task, written=db.is_modified(db_task))
+    record_task_change(db, before, after)
+    record_changes(db, current_user.id, TASK, [task_id])
 
     db.commit()
     db.refresh(db_task)
+    release_session(db)
+    emit_task_activity(current_user.id, db_task.title, before, after)
+    if 'due_date' in fields or reopened(before, after):
+        reminder_scheduler.schedule(db_task.id, db_task.due_date)
     return db_task
 
+def attach_tags(db: Session, owner_id: int, task_ids, tag_ids):
+    """Links every owned task in task_ids to every owned tag in tag_ids with a single
+    INSERT ... SELECT; existing links are skipped. Returns the (task_id, tag_id) links added."""
+    pairs = select(models.Task.id, models.Tag.id).select_from(models.Task).join(models.Tag, true()).where(
+        models.Task.owner_id == owner_id,
+        models.Task.id.in_(task_ids),
+        models.Tag.owner_id == owner_id,
+        models.Tag.id.in_(tag_ids)
+    )
+    statement = dialect_insert(db, models.task_tags).from_select(["task_id", "tag_id"], pairs)
+    statement = statement.on_conflict_do_nothing().returning(models.task_tags.c.task_id, models.task_tags.c.tag_id)
+    return db.execute(statement).all()
+
+def detach_tags(db: Session, owner_id: int, task_ids, tag_ids):
+    """Removes the links between owned tasks and owned tags in one DELETE. Returns the links removed."""
+    statement = delete(models.task_tags).where(
+        models.task_tags.c.task_id.in_(
+            select(models.Task.id).where(models.Task.owner_id == owner_id, models.Task.id.in_(task_ids))
+        ),
+        models.task_tags.c.tag_id.in_(
+            select(models.Tag.id).where(models.Tag.owner_id == owner_id, models.Tag.id.in_(tag_ids))
+        )
+    ).returning(models.task_tags.c.task_id, models.task_tags.c.tag_id)
+    return db.execute(statement).all()
+
+def check_tag_assignment(request: TaskTagsRequest):
+    if len(request.task_ids) > TAG_ASSIGNMENT_MAX_IDS or len(request.tag_ids) > TAG_ASSIGNMENT_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {TAG_ASSIGNMENT_MAX_IDS} task ids and tag ids are allowed per request"
+        )
+
+@router.post("/tags/attach")
+def attach_tags_to_tasks(
+    request: TaskTagsRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Ids the user does not own are ignored; the count says how many links were new
+    check_tag_assignment(request)
+    links = attach_tags(db, current_user.id, request.task_ids, request.tag_ids)
+    if links:
+        record_changes(db, current_user.id, TASK, sorted({task_id for task_id, _ in links}))
+    db.commit()
+    return {"attached": len(links)}
+
+@router.post("/tags/detach")
+def detach_tags_from_tasks(
+    request: TaskTagsRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    check_tag_assignment(request)
+    links = detach_tags(db, current_user.id, request.task_ids, request.tag_ids)
+    if links:
+        record_changes(db, current_user.id, TASK, sorted({task_id for task_id, _ in links}))
+    db.commit()
+    return {"detached": len(links)}
+
+def check_task_and_tag(db: Session, owner_id: int, task_id: int, tag_id: int):
+    # Verify task and tag ownership without loading either row
+    task = db.scalar(select(models.Task.id).where(models.Task.id == task_id, models.Task.owner_id == owner_id))
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    tag = db.scalar(select(models.Tag.id).where(models.Tag.id == tag_id, models.Tag.owner_id == owner_id))
+    if tag is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+
 @router.post("/{task_id}/tags/{tag_id}")
 def add_tag_to_task(
     task_id: int,
@@ -196,18 +672,9 @@ def add_tag_to_task(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Verify task ownership
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Verify tag ownership
-    tag = db.query(models.Tag).filter(models.Tag.id == tag_id, models.Tag.owner_id == current_user.id).first()
-    if not tag:
-        raise HTTPException(status_code=404, detail="Tag not found")
-    
-    # Add tag to task
-    task.tags.append(tag)
+    check_task_and_tag(db, current_user.id, task_id, tag_id)
+    if attach_tags(db, current_user.id, [task_id], [tag_id]):
+        record_changes(db, current_user.id, TASK, [task_id])
     db.commit()
     return {"message": "Tag added to task successfully"}
 
@@ -218,17 +685,8 @@ def remove_tag_from_task(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Verify task ownership
-    task = db.query(models.Task).filter(models.Task.id == task_id, models.Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Verify tag ownership
-    tag = db.query(models.Tag).filter(models.Tag.id == tag_id, models.Tag.owner_id == current_user.id).first()
-    if not tag:
-        raise HTTPException(status_code=404, detail="Tag not found")
-    
-    # Remove tag from task
-    task.tags.remove(tag)
+    check_task_and_tag(db, current_user.id, task_id, tag_id)
+    if detach_tags(db, current_user.id, [task_id], [tag_id]):
+        record_changes(db, current_user.id, TASK, [task_id])
     db.commit()
-    return {"message": "Tag removed from task successfully"}
\ No newline at end of file
+    return {"message": "Tag removed from task successfully"}
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from pydantic import BaseModel
 from models import User
-from database import get_db
+from database import get_async_db, get_async_read_db
+from password_hashing import hash_password, verify_password
 from routers.auth import (
-    get_password_hash, 
-    verify_password, 
     create_access_token, 
     ACCESS_TOKEN_EXPIRE_MINUTES,
     get_current_user
@@ -36,26 +36,30 @@ class Token(BaseModel):
     token_type: str
 
 @router.post("/register", response_model=UserResponse)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == user.username).first():
+async def register_user(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_async_db),
+    read_db: AsyncSession = Depends(get_async_read_db)
+):
+    if await read_db.scalar(select(User).where(User.username == user.username)):
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    if db.query(User).filter(User.email == user.email).first():
+    if await read_db.scalar(select(User).where(User.email == user.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(username=user.username, email=user.email, hashed_password=hashed_password)
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/token", response_model=Token)  # ✅ FIXED: Token route for OAuth2
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -74,5 +78,5 @@ async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.get("/all", response_model=list[UserResponse])
-def get_all_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+async def get_all_users(db: AsyncSession = Depends(get_async_read_db)):
+    return (await db.scalars(select(User))).all()
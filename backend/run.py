@@ -6,4 +6,5 @@ if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "3000"))
     
+    # Development server with auto-reload; production runs serve.py
     uvicorn.run("main:app", host=host, port=port, reload=True) 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 class UserBase(BaseModel):
     email: str
@@ -118,15 +118,23 @@ class WeeklyInsights(BaseModel):
     high_priority_tasks: int
 
 class HighPriorityTask(Task):
+    priority: Optional[str] = None
+    due_date: Optional[datetime] = None
     days_remaining: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+class WeeklyStats(BaseModel):
+    week_start: date
+    tasks_created: int
+    tasks_completed: int
+
 class InsightsResponse(BaseModel):
     high_priority_tasks: List[HighPriorityTask]
     recent_activities: List[Activity]
     weekly_insights: WeeklyInsights
+    weekly_trend: List[WeeklyStats] = []
 
 class ReminderBase(BaseModel):
     content: str
@@ -142,6 +150,47 @@ class Reminder(ReminderBase):
     user_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    # Reminders fired for a task's due date: due_soon or overdue, and when
+    task_id: Optional[int] = None
+    kind: Optional[str] = None
+    remind_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class SyncTask(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    due_date: Optional[datetime] = None
+    category_id: Optional[int] = None
+    tag_ids: List[int] = []
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class SyncCategory(CategoryBase):
+    id: int
+    owner_id: int
+    created_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class Tombstone(BaseModel):
+    entity: str  # "task", "category", "tag", "reminder"
+    id: int
+
+class SyncResponse(BaseModel):
+    token: str
+    reset: bool = False  # the lists are a full snapshot; drop local data first
+    has_more: bool = False
+    tasks: List[SyncTask] = []
+    categories: List[SyncCategory] = []
+    tags: List[Tag] = []
+    reminders: List[Reminder] = []
+    deleted: List[Tombstone] = []
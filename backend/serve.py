@@ -0,0 +1,253 @@
+"""Production entry point: a pre-forking supervisor running uvicorn workers on one socket.
+
+    python serve.py [--workers N] [--host HOST] [--port PORT]
+
+The app is imported and migrations are applied once in the supervisor before any worker
+starts, so workers boot without racing each other over the schema and share the imported
+code copy-on-write. Workers that exit (after SERVER_MAX_REQUESTS, or by crashing) are
+replaced. SIGTERM or SIGINT drains the workers: readiness fails for SERVER_DRAIN_SECONDS,
+then each stops accepting, closes its event streams and finishes in-flight requests within
+SERVER_GRACEFUL_TIMEOUT_SECONDS. `run.py` remains the auto-reloading development server.
+"""
+import argparse
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import signal
+import sys
+import time
+
+import uvicorn
+
+from change_events import change_hub
+
+logger = logging.getLogger("uvicorn.error")
+
+def default_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+# Worker processes; defaults to the CPUs this process may run on
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers()
+# A worker is replaced after serving about this many requests, which caps slow memory
+# growth; each draws up to SERVER_MAX_REQUESTS_JITTER more so they do not restart together.
+# 0 keeps workers running indefinitely.
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000"))
+# On shutdown, /readyz answers 503 this long before workers stop accepting connections,
+# so a load balancer polling it routes new requests elsewhere first
+SERVER_DRAIN_SECONDS = float(os.getenv("SERVER_DRAIN_SECONDS", "0"))
+# In-flight requests get this long to finish once a worker stops accepting; the rest are cancelled
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+# Proxies whose X-Forwarded-For and X-Forwarded-Proto are trusted, comma-separated ("*" for
+# any); the per-IP rate limit then applies to the caller rather than to the proxy
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+# A worker that exits sooner than this after starting is replaced only after the same delay
+RESPAWN_BACKOFF_SECONDS = 1.0
+# Exit code of a worker whose app failed to start; the supervisor gives up instead of retrying
+WORKER_BOOT_FAILED = 3
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn.Server that fails readiness before it stops accepting, and ends event streams
+    as it shuts down; they would otherwise hold the worker until the graceful timeout."""
+
+    def __init__(self, config, app, drain_seconds=SERVER_DRAIN_SECONDS):
+        super().__init__(config)
+        self.app = app
+        self.drain_seconds = drain_seconds
+        self.draining = False
+
+    def handle_exit(self, sig, frame):
+        if self.draining:
+            # Ctrl+C again stops at once; the supervisor's SIGTERM after a Ctrl+C changes nothing
+            if sig == signal.SIGINT:
+                super().handle_exit(sig, frame)
+            return
+        if self.drain_seconds <= 0:
+            super().handle_exit(sig, frame)
+            return
+        self.draining = True
+        self.app.state.draining = True
+        # Called on the event loop by uvicorn's signal handlers
+        asyncio.get_event_loop().call_later(self.drain_seconds, super().handle_exit, sig, frame)
+
+    async def shutdown(self, sockets=None):
+        self.app.state.draining = True
+        change_hub.close()
+        await super().shutdown(sockets)
+
+class Supervisor:
+    """Forks `workers` uvicorn processes on a shared listening socket and keeps them running."""
+
+    def __init__(self, app, config, workers, max_requests, max_requests_jitter):
+        self.app = app
+        self.config = config
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.socket = None
+        self.children = {}
+        self.stopping = False
+        self.failed = False
+
+    def run(self):
+        self.socket = self.config.bind_socket()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self.handle_stop)
+        logger.info(
+            "Starting %d workers (loop: %s, http: %s, max requests: %s)",
+            self.workers, self.config.loop if self.config.loop != "auto" else event_loop_name(),
+            self.config.http if self.config.http != "auto" else http_parser_name(),
+            self.max_requests or "unlimited",
+        )
+        for _ in range(self.workers):
+            self.spawn()
+        while not self.stopping:
+            self.reap()
+            if self.failed:
+                self.stop()
+                break
+            started = time.monotonic()
+            for _ in range(self.workers - len(self.children)):
+                self.spawn()
+            time.sleep(max(0.0, 0.2 - (time.monotonic() - started)))
+        self.wait_for_children()
+        self.socket.close()
+        logger.info("Supervisor stopped")
+        return 1 if self.failed else 0
+
+    def spawn(self):
+        max_requests = None
+        if self.max_requests > 0:
+            max_requests = self.max_requests + random.randint(0, max(0, self.max_requests_jitter))
+        pid = os.fork()
+        if pid == 0:
+            # Worker: uvicorn installs its own handlers once serving
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(sig, signal.SIG_DFL)
+            code = 0
+            try:
+                self.config.limit_max_requests = max_requests
+                server = DrainingServer(self.config, self.app)
+                server.run(sockets=[self.socket])
+                if not server.started:
+                    code = WORKER_BOOT_FAILED
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        logger.info("Started worker %d", pid)
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            code = os.waitstatus_to_exitcode(status)
+            if self.stopping:
+                continue
+            if code == WORKER_BOOT_FAILED:
+                logger.error("Worker %d failed to boot; stopping", pid)
+                self.failed = True
+            elif code == 0:
+                logger.info("Worker %d exited, replacing it", pid)
+            else:
+                logger.warning("Worker %d exited with %d, replacing it", pid, code)
+            if started is not None and time.monotonic() - started < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS)
+
+    def handle_stop(self, sig, frame):
+        if self.stopping:
+            # A second signal: do not wait for the workers to drain
+            for pid in list(self.children):
+                self.kill(pid, signal.SIGKILL)
+            return
+        self.stop()
+
+    def stop(self):
+        self.stopping = True
+        logger.info("Stopping %d workers", len(self.children))
+        # Always SIGTERM: after Ctrl+C the workers got a SIGINT already, and a second one
+        # would make uvicorn skip the graceful wait
+        for pid in list(self.children):
+            self.kill(pid, signal.SIGTERM)
+
+    def kill(self, pid, sig):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            self.children.pop(pid, None)
+
+    def wait_for_children(self):
+        deadline = time.monotonic() + SERVER_DRAIN_SECONDS + SERVER_GRACEFUL_TIMEOUT_SECONDS + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning("Worker %d did not stop in time, killing it", pid)
+            self.kill(pid, signal.SIGKILL)
+        while self.children:
+            self.reap()
+            time.sleep(0.1)
+
+def event_loop_name():
+    return "uvloop" if importlib.util.find_spec("uvloop") and sys.platform != "win32" else "asyncio"
+
+def http_parser_name():
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run TaskFlow with several worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+
+    # Preload: import the app and migrate once here, so workers neither repeat the imports
+    # nor run migrations concurrently
+    import database
+    import main as application
+    import migrations
+
+    if application.RUN_MIGRATIONS_ON_STARTUP:
+        migrations.upgrade(database.engine)
+        application.RUN_MIGRATIONS_ON_STARTUP = False
+    # Connections must not be shared with the forked workers
+    database.engine.dispose()
+
+    config = uvicorn.Config(
+        application.app,
+        host=args.host,
+        port=args.port,
+        # uvloop and httptools when installed, asyncio and h11 otherwise
+        loop="auto",
+        http="auto",
+        log_level=args.log_level,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    )
+    if not hasattr(os, "fork"):
+        # Windows: a single process, as `uvicorn main:app` would run
+        server = DrainingServer(config, application.app)
+        server.run()
+        return 0 if server.started else 1
+    return Supervisor(
+        application.app, config, args.workers, SERVER_MAX_REQUESTS, SERVER_MAX_REQUESTS_JITTER
+    ).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+import argparse
+import os
+import sys
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, delete, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+import models
+from database import dialect_insert
+
+# Per-category counters are opt-in; without them category stats come from one
+# grouped aggregate over the owner's tasks.
+CATEGORY_COUNTERS_ENABLED = os.getenv("CATEGORY_COUNTERS", "false").lower() == "true"
+
+# The fields of a task that the counters and weekly rollups depend on
+TaskSnapshot = namedtuple("TaskSnapshot", ["owner_id", "category_id", "status", "created_at", "updated_at"])
+
+def snapshot(task, written=False):
+    """Captures a task's counted fields. Pass written=True for a task that is about to be
+    inserted or updated, so its timestamps reflect the write without reloading the row."""
+    values = inspect(task).dict
+    written_at = datetime.utcnow() if written else None
+    return TaskSnapshot(
+        task.owner_id,
+        task.category_id,
+        task.status,
+        values.get("created_at") or written_at,
+        written_at or values.get("updated_at"),
+    )
+
+def week_start(moment):
+    """Monday (UTC) of the week containing `moment`."""
+    if moment is None:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+def completed_at(task):
+    # A completed task counts in the week it was last written
+    return task.updated_at or task.created_at
+
+def _task_count_columns():
+    return (
+        func.count(models.Task.id).label("task_count"),
+        func.coalesce(func.sum(case((models.Task.status == "Completed", 1), else_=0)), 0).label("completed_tasks"),
+        func.coalesce(func.sum(case((models.Task.status == "In Progress", 1), else_=0)), 0).label("in_progress_tasks"),
+    )
+
+def aggregate_counts_query(owner_id=None):
+    query = select(models.Task.category_id, *_task_count_columns()).where(
+        models.Task.category_id.isnot(None)
+    )
+    if owner_id is not None:
+        query = query.where(models.Task.owner_id == owner_id)
+    return query.group_by(models.Task.category_id)
+
+class CounterDeltas:
+    """Accumulates counter changes for many task writes and applies them in one pass."""
+
+    def __init__(self):
+        self.categories = defaultdict(lambda: [0, 0, 0])
+        self.weeks = defaultdict(lambda: [0, 0])
+
+    def add(self, before=None, after=None):
+        if before is not None:
+            self._apply(before, -1)
+        if after is not None:
+            self._apply(after, 1)
+
+    def _apply(self, task, sign):
+        if task.created_at is not None:
+            self.weeks[(task.owner_id, week_start(task.created_at))][0] += sign
+        if task.status == "Completed":
+            self.weeks[(task.owner_id, week_start(completed_at(task)))][1] += sign
+
+        if task.category_id is None:
+            return
+        counts = self.categories[(task.owner_id, task.category_id)]
+        counts[0] += sign
+        if task.status == "Completed":
+            counts[1] += sign
+        elif task.status == "In Progress":
+            counts[2] += sign
+
+    def flush(self, db: Session):
+        if CATEGORY_COUNTERS_ENABLED:
+            missing = []
+            for (owner_id, category_id), (total, completed, in_progress) in self.categories.items():
+                if total == completed == in_progress == 0:
+                    continue
+                result = db.execute(
+                    update(models.CategoryStats)
+                    .where(models.CategoryStats.category_id == category_id)
+                    .values(
+                        task_count=models.CategoryStats.task_count + total,
+                        completed_tasks=models.CategoryStats.completed_tasks + completed,
+                        in_progress_tasks=models.CategoryStats.in_progress_tasks + in_progress,
+                    )
+                )
+                if result.rowcount == 0:
+                    missing.append((owner_id, category_id))
+            # Categories without a counter row get one built from their tasks
+            for owner_id, category_id in missing:
+                refresh_category_stats(db, owner_id, [category_id])
+
+        stats = models.WeeklyTaskStats
+        for (owner_id, week), (created, completed) in self.weeks.items():
+            if created == completed == 0:
+                continue
+            statement = dialect_insert(db, stats).values(
+                user_id=owner_id,
+                week_start=week,
+                tasks_created=max(created, 0),
+                tasks_completed=max(completed, 0),
+            )
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[stats.user_id, stats.week_start],
+                set_={
+                    "tasks_created": stats.tasks_created + created,
+                    "tasks_completed": stats.tasks_completed + completed,
+                },
+            ))
+
+        self.categories.clear()
+        self.weeks.clear()
+
+def record_task_change(db: Session, before=None, after=None):
+    deltas = CounterDeltas()
+    deltas.add(before, after)
+    deltas.flush(db)
+
+def init_category_stats(db: Session, category):
+    if CATEGORY_COUNTERS_ENABLED:
+        db.add(models.CategoryStats(category_id=category.id, owner_id=category.owner_id))
+
+def refresh_category_stats(db: Session, owner_id, category_ids):
+    """Recomputes the counter rows of the given categories from the tasks table."""
+    db.flush()
+    db.execute(delete(models.CategoryStats).where(models.CategoryStats.category_id.in_(category_ids)))
+    counts = aggregate_counts_query(owner_id).where(models.Task.category_id.in_(category_ids)).subquery()
+    db.execute(
+        insert(models.CategoryStats).from_select(
+            ["category_id", "owner_id", "task_count", "completed_tasks", "in_progress_tasks"],
+            _stats_rows_query(counts).where(models.Category.id.in_(category_ids)),
+        )
+    )
+
+def _stats_rows_query(counts):
+    return select(
+        models.Category.id,
+        models.Category.owner_id,
+        func.coalesce(counts.c.task_count, 0),
+        func.coalesce(counts.c.completed_tasks, 0),
+        func.coalesce(counts.c.in_progress_tasks, 0),
+    ).outerjoin(counts, counts.c.category_id == models.Category.id)
+
+def get_categories_with_counts(db: Session, owner_id, category_id=None):
+    """Loads the owner's categories with task counts attached in a single query."""
+    if CATEGORY_COUNTERS_ENABLED:
+        counts = select(
+            models.CategoryStats.category_id,
+            models.CategoryStats.task_count,
+            models.CategoryStats.completed_tasks,
+            models.CategoryStats.in_progress_tasks,
+        ).where(models.CategoryStats.owner_id == owner_id)
+        if category_id is not None:
+            counts = counts.where(models.CategoryStats.category_id == category_id)
+    else:
+        counts = aggregate_counts_query(owner_id)
+        if category_id is not None:
+            counts = counts.where(models.Task.category_id == category_id)
+    counts = counts.subquery()
+
+    query = db.query(
+        models.Category,
+        counts.c.task_count,
+        counts.c.completed_tasks,
+        counts.c.in_progress_tasks,
+    ).outerjoin(counts, counts.c.category_id == models.Category.id).filter(
+        models.Category.owner_id == owner_id
+    )
+    if category_id is not None:
+        query = query.filter(models.Category.id == category_id)
+
+    categories = []
+    missing = {}
+    for category, task_count, completed_tasks, in_progress_tasks in query.all():
+        if task_count is None and CATEGORY_COUNTERS_ENABLED:
+            missing[category.id] = category
+        category.task_count = task_count or 0
+        category.completed_tasks = completed_tasks or 0
+        category.in_progress_tasks = in_progress_tasks or 0
+        categories.append(category)
+
+    # Counter rows not built yet (e.g. counters enabled on an existing database)
+    if missing:
+        fallback = aggregate_counts_query(owner_id).where(models.Task.category_id.in_(list(missing)))
+        for row in db.execute(fallback):
+            category = missing[row.category_id]
+            category.task_count = row.task_count
+            category.completed_tasks = row.completed_tasks
+            category.in_progress_tasks = row.in_progress_tasks
+
+    return categories
+
+def check_counters(db: Session, owner_id=None):
+    """Returns (category_id, stored, expected) for every counter row that has drifted."""
+    counts = aggregate_counts_query(owner_id).subquery()
+    expected_query = _stats_rows_query(counts)
+    if owner_id is not None:
+        expected_query = expected_query.where(models.Category.owner_id == owner_id)
+    expected = {row[0]: tuple(row[2:]) for row in db.execute(expected_query)}
+
+    stored_query = select(
+        models.CategoryStats.category_id,
+        models.CategoryStats.task_count,
+        models.CategoryStats.completed_tasks,
+        models.CategoryStats.in_progress_tasks,
+    )
+    if owner_id is not None:
+        stored_query = stored_query.where(models.CategoryStats.owner_id == owner_id)
+    stored = {row[0]: tuple(row[1:]) for row in db.execute(stored_query)}
+
+    mismatches = []
+    for category_id in sorted(set(expected) | set(stored)):
+        if expected.get(category_id) != stored.get(category_id):
+            mismatches.append((category_id, stored.get(category_id), expected.get(category_id)))
+    return mismatches
+
+def rebuild_counters(db: Session, owner_id=None):
+    """Rebuilds counter rows from the tasks table and returns how many were written."""
+    db.flush()
+    stale = delete(models.CategoryStats)
+    if owner_id is not None:
+        stale = stale.where(models.CategoryStats.owner_id == owner_id)
+    db.execute(stale)
+
+    counts = aggregate_counts_query(owner_id).subquery()
+    rows_query = _stats_rows_query(counts)
+    if owner_id is not None:
+        rows_query = rows_query.where(models.Category.owner_id == owner_id)
+    result = db.execute(
+        insert(models.CategoryStats).from_select(
+            ["category_id", "owner_id", "task_count", "completed_tasks", "in_progress_tasks"],
+            rows_query,
+        )
+    )
+    return result.rowcount
+
+def compute_weekly_stats(executor, owner_id=None):
+    """Recomputes {(user_id, week_start): [created, completed]} by streaming the tasks table."""
+    query = select(models.Task.owner_id, models.Task.status, models.Task.created_at, models.Task.updated_at)
+    if owner_id is not None:
+        query = query.where(models.Task.owner_id == owner_id)
+    weeks = defaultdict(lambda: [0, 0])
+    for task in executor.execute(query.execution_options(yield_per=10000)):
+        if task.created_at is not None:
+            weeks[(task.owner_id, week_start(task.created_at))][0] += 1
+        if task.status == "Completed":
+            weeks[(task.owner_id, week_start(completed_at(task)))][1] += 1
+    return weeks
+
+def _stored_weekly_stats(executor, owner_id=None):
+    stats = models.WeeklyTaskStats
+    query = select(stats.user_id, stats.week_start, stats.tasks_created, stats.tasks_completed)
+    if owner_id is not None:
+        query = query.where(stats.user_id == owner_id)
+    return {
+        (row.user_id, row.week_start): [row.tasks_created, row.tasks_completed]
+        for row in executor.execute(query)
+    }
+
+def check_weekly_stats(executor, owner_id=None):
+    """Returns ((user_id, week_start), stored, expected) for every rollup row that has drifted."""
+    expected = {key: counts for key, counts in compute_weekly_stats(executor, owner_id).items() if any(counts)}
+    stored = {key: counts for key, counts in _stored_weekly_stats(executor, owner_id).items() if any(counts)}
+    return [
+        (key, stored.get(key), expected.get(key))
+        for key in sorted(set(expected) | set(stored))
+        if expected.get(key) != stored.get(key)
+    ]
+
+def rebuild_weekly_stats(executor, owner_id=None):
+    """Rebuilds the weekly rollup table from the tasks table and returns how many rows were written."""
+    weeks = compute_weekly_stats(executor, owner_id)
+    stale = delete(models.WeeklyTaskStats)
+    if owner_id is not None:
+        stale = stale.where(models.WeeklyTaskStats.user_id == owner_id)
+    executor.execute(stale)
+    rows = [
+        {"user_id": user_id, "week_start": week, "tasks_created": created, "tasks_completed": completed}
+        for (user_id, week), (created, completed) in weeks.items()
+    ]
+    if rows:
+        executor.execute(insert(models.WeeklyTaskStats), rows)
+    return len(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the category counters and weekly rollups")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--user", type=int, default=None, help="Limit to a single user id")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal, engine
+    from migrations import upgrade
+
+    upgrade(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild_counters(db, args.user)
+            weeks = rebuild_weekly_stats(db, args.user)
+            db.commit()
+            print(f"Rebuilt {written} category counter rows and {weeks} weekly rollup rows")
+            return 0
+
+        mismatches = check_counters(db, args.user) if CATEGORY_COUNTERS_ENABLED else []
+        for category_id, stored, expected in mismatches:
+            print(f"category {category_id}: stored={stored} expected={expected}")
+        weekly_mismatches = check_weekly_stats(db, args.user)
+        for (user_id, week), stored, expected in weekly_mismatches:
+            print(f"user {user_id} week {week}: stored={stored} expected={expected}")
+        print(f"{len(mismatches)} category counter rows and {len(weekly_mismatches)} weekly rollup rows out of date")
+        return 1 if mismatches or weekly_mismatches else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import os
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+import models
+from change_tracking import DELETE, TASK, record_changes
+from task_counters import CounterDeltas, TaskSnapshot
+
+# Large deletions run as a series of transactions of this many tasks, so no single one
+# holds the write lock for long
+TASK_DELETE_CHUNK_SIZE = int(os.getenv("TASK_DELETE_CHUNK_SIZE", "1000"))
+
+def delete_task_rows(db: Session, owner_id: int, condition, limit=None):
+    """Deletes up to `limit` of the owner's tasks matching `condition` in one DELETE and
+    returns [(task_id, TaskSnapshot)] of the rows it removed. Tag links go with them through
+    the ON DELETE CASCADE of task_tags."""
+    task = models.Task
+    where = (task.owner_id == owner_id, condition)
+    if limit is not None:
+        where = (task.id.in_(select(task.id).where(*where).order_by(task.id).limit(limit)),)
+    rows = db.execute(
+        delete(task).where(*where)
+        .returning(task.id, task.owner_id, task.category_id, task.status, task.created_at, task.updated_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return [(row.id, TaskSnapshot(*row[1:])) for row in rows]
+
+def delete_tasks(db: Session, owner_id: int, condition, chunk_size=TASK_DELETE_CHUNK_SIZE):
+    """Deletes the owner's tasks matching `condition`, `chunk_size` at a time, updating the
+    counters, weekly rollups and change log with each chunk. Full chunks are committed as
+    they go; the last one is left to the caller to commit with its own changes. Returns the
+    number of tasks deleted."""
+    deleted = 0
+    while True:
+        rows = delete_task_rows(db, owner_id, condition, chunk_size)
+        deltas = CounterDeltas()
+        for _, before in rows:
+            deltas.add(before=before)
+        deltas.flush(db)
+        if rows:
+            record_changes(db, owner_id, TASK, [task_id for task_id, _ in rows], DELETE)
+        deleted += len(rows)
+        if len(rows) < chunk_size:
+            return deleted
+        db.commit()
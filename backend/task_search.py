@@ -0,0 +1,96 @@
+import re
+
+from sqlalchemy import column, func, literal_column, or_, table, text
+from sqlalchemy.orm import Session
+
+import models
+
+# Postgres text search configuration; the same expression is indexed and queried, so the
+# planner can use the GIN index (a bound parameter here would not match it)
+TEXT_SEARCH_CONFIG = "english"
+SEARCH_DOCUMENT = (
+    f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(tasks.title, '') || ' ' || coalesce(tasks.description, ''))"
+)
+
+# External-content FTS5 table over tasks(title, description), kept in sync by triggers
+tasks_fts = table("tasks_fts", column("rowid"))
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN "
+    "INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO tasks_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    # Index the rows that existed before the triggers
+    "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+]
+
+# Title matches rank above description matches
+SQLITE_RANK = func.bm25(literal_column("tasks_fts"), 10.0, 1.0)
+
+_fts_available = {}
+
+def search_terms(query):
+    """Splits a free-text query into word tokens; each is matched as a prefix."""
+    return re.findall(r"\w+", query.lower())[:16]
+
+def sqlite_has_fts5(connection):
+    return bool(connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+def create_search_index(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks USING GIN ({SEARCH_DOCUMENT})"))
+    elif connection.dialect.name == "sqlite" and sqlite_has_fts5(connection):
+        for statement in SQLITE_SEARCH_DDL:
+            connection.execute(text(statement))
+
+def _sqlite_index_exists(db: Session):
+    bind = db.get_bind()
+    if bind.url not in _fts_available:
+        _fts_available[bind.url] = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+        ).first() is not None
+    return _fts_available[bind.url]
+
+def like_search_query(db: Session, owner_id: int, terms):
+    """Substring match on title or description for every term; a full scan of the owner's tasks."""
+    query = db.query(models.Task).filter(models.Task.owner_id == owner_id)
+    for term in terms:
+        pattern = "%" + term.replace("_", "\\_") + "%"
+        query = query.filter(or_(
+            models.Task.title.ilike(pattern, escape="\\"),
+            models.Task.description.ilike(pattern, escape="\\")
+        ))
+    return query.order_by(models.Task.id)
+
+def search_query(db: Session, owner_id: int, terms):
+    """Ranked full-text query over the owner's tasks, best match first."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(literal_column(f"'{TEXT_SEARCH_CONFIG}'"), " & ".join(f"{term}:*" for term in terms))
+        document = literal_column(SEARCH_DOCUMENT)
+        return db.query(models.Task).filter(
+            models.Task.owner_id == owner_id,
+            document.op("@@")(tsquery)
+        ).order_by(func.ts_rank(document, tsquery).desc(), models.Task.id)
+    if dialect == "sqlite" and _sqlite_index_exists(db):
+        match = " ".join(f'"{term}"*' for term in terms)
+        return db.query(models.Task).join(tasks_fts, tasks_fts.c.rowid == models.Task.id).filter(
+            literal_column("tasks_fts").op("MATCH")(match),
+            models.Task.owner_id == owner_id
+        ).order_by(SQLITE_RANK, models.Task.id)
+    return like_search_query(db, owner_id, terms)
+
+def search_tasks(db: Session, owner_id: int, query: str, skip=0, limit=20):
+    terms = search_terms(query)
+    if not terms:
+        return []
+    return search_query(db, owner_id, terms).offset(skip).limit(limit).all()
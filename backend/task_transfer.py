@@ -0,0 +1,256 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from change_tracking import TASK, record_changes
+from reminder_scheduler import reminder_scheduler
+from task_counters import CounterDeltas, TaskSnapshot
+
+# Columns of an exported task, in CSV order; import accepts the same layout
+EXPORT_FIELDS = [
+    "id", "title", "description", "status", "priority", "due_date",
+    "created_at", "updated_at", "category", "tags",
+]
+# Tag names inside the single CSV "tags" column
+CSV_TAG_SEPARATOR = "|"
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 100
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def export_records(db: Session, owner_id: int, batch_size=EXPORT_BATCH_SIZE):
+    """Yields the owner's tasks as plain dicts, streamed from a server-side cursor.
+
+    Category and tag names come from lookup maps built up front, and tag links are
+    fetched once per batch, so memory stays bounded by the batch size.
+    """
+    categories = dict(db.execute(
+        select(models.Category.id, models.Category.name).where(models.Category.owner_id == owner_id)
+    ).all())
+    tags = dict(db.execute(
+        select(models.Tag.id, models.Tag.name).where(models.Tag.owner_id == owner_id)
+    ).all())
+
+    task = models.Task
+    rows = db.execute(
+        select(
+            task.id, task.title, task.description, task.status, task.priority, task.due_date,
+            task.created_at, task.updated_at, task.category_id
+        ).where(task.owner_id == owner_id).order_by(task.id).execution_options(yield_per=batch_size)
+    )
+    for batch in rows.partitions():
+        task_tags = defaultdict(list)
+        links = db.execute(
+            select(models.task_tags.c.task_id, models.task_tags.c.tag_id).where(
+                models.task_tags.c.task_id.in_([row.id for row in batch])
+            )
+        )
+        for task_id, tag_id in links:
+            if tag_id in tags:
+                task_tags[task_id].append(tags[tag_id])
+        for row in batch:
+            yield {
+                "id": row.id,
+                "title": row.title,
+                "description": row.description,
+                "status": row.status,
+                "priority": row.priority,
+                "due_date": _isoformat(row.due_date),
+                "created_at": _isoformat(row.created_at),
+                "updated_at": _isoformat(row.updated_at),
+                "category": categories.get(row.category_id),
+                "tags": sorted(task_tags[row.id]),
+            }
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, separators=(",", ":")) + "\n"
+
+def csv_lines(records, batch_size=EXPORT_BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for count, record in enumerate(records, 1):
+        record = dict(record, tags=CSV_TAG_SEPARATOR.join(record["tags"]))
+        writer.writerow(["" if record[field] is None else record[field] for field in EXPORT_FIELDS])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+async def iter_lines(chunks):
+    """Splits a stream of byte chunks into decoded lines without reading it all."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+async def ndjson_records(lines):
+    """Yields (line_number, record or error message)."""
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+async def csv_records(lines):
+    """Yields (line_number, record) from CSV with a header row; quoted fields may span lines."""
+    header = None
+    number = 0
+    record_text = ""
+    async for line in lines:
+        number += 1
+        record_text = f"{record_text}\n{line}" if record_text else line
+        if record_text.count('"') % 2:
+            continue
+        values = next(csv.reader([record_text]), [])
+        record_text = ""
+        if not values:
+            continue
+        if header is None:
+            header = values
+            continue
+        record = dict(zip(header, values))
+        tags = record.get("tags") or ""
+        record["tags"] = [tag for tag in tags.split(CSV_TAG_SEPARATOR) if tag]
+        yield number, record
+
+def _parse_datetime(value, name):
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {name}")
+
+class TaskImporter:
+    """Validates imported records against the owner's categories and tags and inserts
+    them in batches: one executemany INSERT for the tasks and one for their tag links."""
+
+    def __init__(self, db: Session, owner_id: int, batch_size=IMPORT_BATCH_SIZE):
+        self.db = db
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        self.categories = dict(db.execute(
+            select(models.Category.name, models.Category.id).where(models.Category.owner_id == owner_id)
+        ).all())
+        self.tags = dict(db.execute(
+            select(models.Tag.name, models.Tag.id).where(models.Tag.owner_id == owner_id)
+        ).all())
+        # Don't hold the connection while the upload arrives; each batch is its own transaction
+        db.rollback()
+        self.pending = []
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add(self, line, record):
+        """Queues one record; returns True when a batch is ready to flush."""
+        try:
+            self.pending.append(self._row(record))
+        except ValueError as e:
+            self.fail(line, str(e))
+        return len(self.pending) >= self.batch_size
+
+    def fail(self, line, detail):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "detail": detail})
+
+    def _row(self, record):
+        if isinstance(record, str):
+            raise ValueError(record)
+        title = record.get("title")
+        if not title:
+            raise ValueError("title is required")
+        category_id = None
+        if record.get("category"):
+            category_id = self.categories.get(record["category"])
+            if category_id is None:
+                raise ValueError(f"Unknown category '{record['category']}'")
+        tag_names = record.get("tags") or []
+        if not isinstance(tag_names, list):
+            raise ValueError("tags must be a list of tag names")
+        tag_ids = []
+        for name in tag_names:
+            if name not in self.tags:
+                raise ValueError(f"Unknown tag '{name}'")
+            tag_ids.append(self.tags[name])
+        row = {
+            "title": title,
+            "description": record.get("description") or None,
+            "status": record.get("status") or "Pending",
+            "priority": record.get("priority") or "Medium",
+            "due_date": _parse_datetime(record.get("due_date"), "due_date"),
+            "created_at": _parse_datetime(record.get("created_at"), "created_at") or datetime.utcnow(),
+            "category_id": category_id,
+            "owner_id": self.owner_id,
+        }
+        return row, tag_ids
+
+    def flush(self):
+        """Inserts the queued batch and commits it."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        # Task ids only grow, so this batch's rows all lie above the current maximum
+        first_id = (self.db.scalar(select(func.max(models.Task.id))) or 0) + 1
+        # Only tagged rows need their new ids back. Ordered RETURNING is row-by-row on
+        # SQLite, so untagged rows go through a plain executemany.
+        untagged = [row for row, tag_ids in batch if not tag_ids]
+        tagged = [(row, tag_ids) for row, tag_ids in batch if tag_ids]
+        if untagged:
+            self.db.execute(insert(models.Task), untagged)
+        if tagged:
+            task_ids = self.db.scalars(
+                insert(models.Task).returning(models.Task.id, sort_by_parameter_order=True),
+                [row for row, _ in tagged]
+            ).all()
+            self.db.execute(insert(models.task_tags), [
+                {"task_id": task_id, "tag_id": tag_id}
+                for task_id, (_, tag_ids) in zip(task_ids, tagged)
+                for tag_id in set(tag_ids)
+            ])
+
+        deltas = CounterDeltas()
+        for row, _ in batch:
+            deltas.add(after=TaskSnapshot(
+                self.owner_id, row["category_id"], row["status"], row["created_at"], None
+            ))
+        deltas.flush(self.db)
+        record_changes(self.db, self.owner_id, TASK, select(models.Task.id).where(
+            models.Task.owner_id == self.owner_id,
+            models.Task.id >= first_id
+        ))
+        self.db.commit()
+        self.imported += len(batch)
+        if any(reminder_scheduler.wants(row["due_date"]) for row, _ in batch):
+            for task_id, due_date in self.db.execute(select(models.Task.id, models.Task.due_date).where(
+                models.Task.owner_id == self.owner_id,
+                models.Task.id >= first_id,
+                models.Task.due_date.isnot(None)
+            )):
+                reminder_scheduler.schedule(task_id, due_date)
+
+    def finish(self):
+        self.flush()
@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings are read when the modules are imported, so point them at a scratch database first
+_tmpdir = tempfile.mkdtemp(prefix="taskflow-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ["ADMISSION_ENABLED"] = "false"
+os.environ["REMINDER_SCHEDULER_ENABLED"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture
+def login(client):
+    """Registers a user and returns headers authenticating as them. The database is shared
+    by the whole session, so each test picks its own usernames."""
+    def login(username):
+        client.post("/users/register", json={"username": username, "email": f"{username}@example.com", "password": "pw"})
+        token = client.post("/users/token", data={"username": username, "password": "pw"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return login
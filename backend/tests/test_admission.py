@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from admission import AdmissionController, AdmissionMiddleware, ConcurrencyGate, RateLimiter, Shed
+
+def test_rate_limits_answer_429_with_retry_after(login):
+    # Admission is off for the test app; wrap it with a controller of small buckets
+    headers = login("limited")
+    controller = AdmissionController(rules="*=64")
+    controller.ips = RateLimiter("ip", rate=0.5, burst=2)
+    controller.users = RateLimiter("user", rate=0.5, burst=3)
+    with TestClient(AdmissionMiddleware(main.app, controller)) as client:
+        anonymous = [client.get("/api/tasks/") for _ in range(3)]
+        assert [response.status_code for response in anonymous] == [401, 401, 429]
+        assert 1 <= int(anonymous[2].headers["Retry-After"]) <= 2
+
+        # Authenticated requests draw from their user's bucket, not the IP's
+        signed_in = [client.get("/api/tasks/", headers=headers).status_code for _ in range(4)]
+        assert signed_in == [200, 200, 200, 429]
+        # Health probes are never limited
+        assert client.get("/healthz").status_code == 200
+    assert (controller.ips.limited, controller.users.limited) == (1, 1)
+
+def test_gate_sheds_when_the_queue_is_full_or_the_wait_too_long():
+    async def scenario():
+        gate = ConcurrencyGate("*", limit=1, queue_limit=1, queue_timeout=0.05)
+        await gate.acquire()
+        waiting = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Shed) as full:
+            await gate.acquire()
+        with pytest.raises(Shed) as timed_out:
+            await waiting
+        gate.release()
+        return gate, full.value, timed_out.value
+
+    gate, full, timed_out = asyncio.run(scenario())
+    assert (full.status_code, full.reason, full.retry_after) == (503, "queue_full", 1)
+    assert (timed_out.status_code, timed_out.reason) == (503, "queue_timeout")
+    assert gate.stats()["active"] == 0 and gate.shed == {"queue_full": 1, "queue_timeout": 1}
+
+def test_gate_hands_released_slots_to_waiters_in_order():
+    async def scenario():
+        gate = ConcurrencyGate("*", limit=1, queue_limit=2, queue_timeout=1)
+        await gate.acquire()
+        order = []
+
+        async def request(name):
+            await gate.acquire()
+            order.append(name)
+            gate.release()
+
+        waiters = [asyncio.create_task(request(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        gate.release()
+        await asyncio.gather(*waiters)
+        return gate, order
+
+    gate, order = asyncio.run(scenario())
+    assert order == ["first", "second"]
+    assert gate.active == 0 and gate.admitted == 3
+
+def test_middleware_answers_503_with_retry_after_when_busy():
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"done"})
+
+    controller = AdmissionController(rules="*=1")
+    controller.rules[0][2].queue_limit = 0
+    app = AdmissionMiddleware(slow_app, controller)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            held = asyncio.create_task(client.get("/api/tasks/"))
+            await asyncio.sleep(0.05)
+            shed = await client.get("/api/tasks/")
+            release.set()
+            return await held, shed
+
+    held, shed = asyncio.run(scenario())
+    assert held.status_code == 200
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert shed.json() == {"detail": "Server is busy, please retry shortly"}
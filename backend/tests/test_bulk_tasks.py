@@ -0,0 +1,65 @@
+import routers.tasks
+import task_counters
+
+def create_tasks(client, headers, count):
+    return [client.post("/api/tasks/", json={"title": f"Task {i}"}, headers=headers).json()["id"] for i in range(count)]
+
+def test_each_operation_reports_its_own_status(client, login):
+    headers = login("bulker")
+    first, second, third = create_tasks(client, headers, 3)
+    stranger = create_tasks(client, login("bulk-stranger"), 1)[0]
+    foreign_category = client.post("/api/categories/", json={"name": "Theirs", "color": "#000000"}, headers=login("bulk-owner")).json()
+
+    response = client.post("/api/tasks/bulk", json={"operations": [
+        {"op": "create", "task": {"title": "Created", "status": "In Progress"}},
+        {"op": "create", "task": {"description": "No title"}},
+        {"op": "update", "id": first, "task": {"title": "Renamed", "priority": "High"}},
+        {"op": "status", "id": second, "status": "Completed"},
+        {"op": "status", "id": third},
+        {"op": "delete", "id": third},
+        {"op": "delete", "id": first},
+        {"op": "delete", "id": stranger},
+        {"op": "update", "id": second, "task": {"category_id": foreign_category["id"]}},
+        {"op": "update", "id": 999999, "task": {"title": "Missing"}},
+    ]}, headers=headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [result["status_code"] for result in body["results"]] == [201, 400, 200, 200, 400, 200, 409, 404, 404, 404]
+    assert [result["ok"] for result in body["results"]] == [True, False, True, True, False, True, False, False, False, False]
+    assert (body["succeeded"], body["failed"]) == (4, 6)
+    created = body["results"][0]["id"]
+
+    tasks = {task["id"]: task for task in client.get("/api/tasks/", headers=headers).json()}
+    assert set(tasks) == {first, second, created}
+    assert (tasks[first]["title"], tasks[first]["priority"]) == ("Renamed", "High")
+    assert tasks[second]["status"] == "Completed"
+    assert tasks[second]["category_id"] is None
+    assert tasks[created]["status"] == "In Progress"
+    assert task_counters.main(["check"]) == 0
+
+def test_atomic_batch_with_a_failure_applies_nothing(client, login):
+    headers = login("atomic-bulker")
+    first, second = create_tasks(client, headers, 2)
+
+    response = client.post("/api/tasks/bulk", json={"atomic": True, "operations": [
+        {"op": "status", "id": first, "status": "Completed"},
+        {"op": "delete", "id": second},
+        {"op": "create", "task": {"title": "Not created"}},
+        {"op": "delete", "id": 999999},
+    ]}, headers=headers)
+
+    assert response.status_code == 400
+    body = response.json()
+    assert [result["status_code"] for result in body["results"]] == [424, 424, 424, 404]
+    assert (body["succeeded"], body["failed"]) == (0, 4)
+    tasks = client.get("/api/tasks/", headers=headers).json()
+    assert [(task["id"], task["status"]) for task in tasks] == [(first, "Pending"), (second, "Pending")]
+
+def test_rejects_batches_over_the_limit(client, login, monkeypatch):
+    headers = login("big-bulker")
+    monkeypatch.setattr(routers.tasks, "BULK_MAX_OPERATIONS", 2)
+    operations = [{"op": "create", "task": {"title": f"Task {i}"}} for i in range(3)]
+    response = client.post("/api/tasks/bulk", json={"operations": operations}, headers=headers)
+    assert response.status_code == 400
+    assert client.get("/api/tasks/", headers=headers).json() == []
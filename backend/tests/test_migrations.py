@@ -0,0 +1,86 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+import migrations
+from database import enforce_sqlite_foreign_keys
+
+# The schema create_all produced before any migration existed
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL PRIMARY KEY, username VARCHAR, email VARCHAR, hashed_password VARCHAR,
+    is_active BOOLEAN, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE TABLE categories (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, color VARCHAR,
+    owner_id INTEGER REFERENCES users (id), created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+CREATE TABLE tags (
+    id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, color VARCHAR, owner_id INTEGER REFERENCES users (id)
+);
+CREATE TABLE tasks (
+    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR, description VARCHAR, status VARCHAR,
+    priority VARCHAR, due_date DATETIME, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    updated_at DATETIME, owner_id INTEGER REFERENCES users (id),
+    category_id INTEGER REFERENCES categories (id)
+);
+CREATE TABLE task_tags (task_id INTEGER REFERENCES tasks (id), tag_id INTEGER REFERENCES tags (id));
+CREATE TABLE activities (
+    id INTEGER NOT NULL PRIMARY KEY, type VARCHAR, description VARCHAR,
+    timestamp DATETIME DEFAULT (CURRENT_TIMESTAMP), user_id INTEGER REFERENCES users (id)
+);
+CREATE TABLE reminders (
+    id INTEGER NOT NULL PRIMARY KEY, content VARCHAR NOT NULL,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), updated_at DATETIME,
+    user_id INTEGER REFERENCES users (id)
+);
+INSERT INTO users (id, username) VALUES (1, 'alice');
+INSERT INTO categories (id, name, owner_id) VALUES (1, 'Work', 1);
+INSERT INTO tasks (id, title, status, owner_id, category_id) VALUES (1, 'Write report', 'Pending', 1, 1);
+INSERT INTO tags (id, name, owner_id) VALUES (1, 'urgent', 1);
+"""
+
+def baseline_engine(path, links):
+    # The baseline never enforced foreign keys, so dangling links may exist
+    with sqlite3.connect(path) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+        connection.executemany("INSERT INTO task_tags (task_id, tag_id) VALUES (?, ?)", links)
+    engine = create_engine(f"sqlite:///{path}")
+    enforce_sqlite_foreign_keys(engine)
+    return engine
+
+def test_upgrade_drops_orphaned_task_tags(tmp_path):
+    engine = baseline_engine(tmp_path / "baseline.db", [(1, 1), (1, 1), (1, 99), (42, 1), (None, 1)])
+    with sqlite3.connect(tmp_path / "baseline.db") as connection:
+        # Left behind by an attempt that failed before migrations ran in a transaction
+        connection.execute("CREATE TABLE task_tags_new (task_id INTEGER, tag_id INTEGER)")
+
+    applied = migrations.upgrade(engine)
+
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT task_id, tag_id FROM task_tags")).all() == [(1, 1)]
+        assert connection.execute(text("PRAGMA foreign_key_check")).all() == []
+        assert "task_tags_new" not in inspect(connection).get_table_names()
+    assert migrations.upgrade(engine) == []
+
+def test_failed_migration_rolls_back_and_stops(tmp_path, monkeypatch):
+    engine = baseline_engine(tmp_path / "baseline.db", [(1, 1)])
+
+    def broken(connection):
+        connection.execute(text("CREATE TABLE half_applied (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO task_tags (task_id, tag_id) VALUES (1, 99)"))
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        *(item for item in migrations.MIGRATIONS if item[0] < 3),
+        (3, "broken", broken),
+        *(item for item in migrations.MIGRATIONS if item[0] > 3),
+    ])
+    with pytest.raises(IntegrityError):
+        migrations.upgrade(engine)
+
+    with engine.connect() as connection:
+        assert migrations.applied_versions(connection) == {1, 2}
+        assert "half_applied" not in inspect(connection).get_table_names()
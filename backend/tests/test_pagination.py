@@ -0,0 +1,54 @@
+def pages(client, headers, **params):
+    """Follows X-Next-Cursor from the first page to the last; returns the pages' task ids."""
+    ids = []
+    cursor = None
+    while True:
+        response = client.get("/api/tasks/", params=dict(params, cursor=cursor) if cursor else params, headers=headers)
+        assert response.status_code == 200, response.text
+        ids.append([task["id"] for task in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids
+
+def test_cursor_pages_cover_every_task_once(client, login):
+    headers = login("pager")
+    due_dates = ["2030-01-03", None, "2030-01-01", "2030-01-03", None, "2030-01-02", "2030-01-01"]
+    created = [
+        client.post("/api/tasks/", json={"title": f"Task {i}", "due_date": due}, headers=headers).json()
+        for i, due in enumerate(due_dates)
+    ]
+    ids = [task["id"] for task in created]
+
+    assert pages(client, headers, limit=3) == [ids[0:3], ids[3:6], ids[6:]]
+    backwards = ids[::-1]
+    assert pages(client, headers, limit=3, order="desc") == [backwards[0:3], backwards[3:6], backwards[6:]]
+
+    # Equal due dates are ordered by id, and tasks without one come last
+    by_due = sorted(
+        (task for task in created if task["due_date"]), key=lambda task: (task["due_date"], task["id"])
+    )
+    expected = [task["id"] for task in by_due] + [ids[1], ids[4]]
+    due_pages = pages(client, headers, limit=2, sort="due_date")
+    assert [task_id for page in due_pages for task_id in page] == expected
+    assert [len(page) for page in due_pages] == [2, 2, 2, 1]
+
+def test_filters_apply_to_every_page(client, login):
+    headers = login("filtered-pager")
+    for i in range(5):
+        client.post("/api/tasks/", json={"title": f"Task {i}", "priority": "High" if i % 2 else "Low"}, headers=headers)
+    high = pages(client, headers, limit=1, priority="High")
+    assert len(high) == 2 and all(len(page) == 1 for page in high)
+
+def test_rejects_invalid_cursors(client, login):
+    headers = login("bad-cursor")
+    for i in range(3):
+        client.post("/api/tasks/", json={"title": f"Task {i}"}, headers=headers)
+    cursor = client.get("/api/tasks/", params={"limit": 1}, headers=headers).headers["X-Next-Cursor"]
+
+    response = client.get("/api/tasks/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+    response = client.get("/api/tasks/", params={"cursor": cursor, "sort": "due_date"}, headers=headers)
+    assert response.status_code == 400
+    response = client.get("/api/tasks/", params={"cursor": cursor, "order": "desc"}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,11 @@
+from fastapi.testclient import TestClient
+
+import main
+
+def test_logins_work_across_app_restarts_in_one_process():
+    # Each TestClient runs the lifespan, whose shutdown stops the hashing pool
+    for attempt in range(2):
+        with TestClient(main.app) as client:
+            client.post("/users/register", json={"username": "restarter", "email": "restarter@example.com", "password": "pw"})
+            response = client.post("/users/token", data={"username": "restarter", "password": "pw"})
+            assert response.status_code == 200, (attempt, response.text)
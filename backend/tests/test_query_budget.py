@@ -0,0 +1,8 @@
+import main
+from query_budget import check_budgets, profile_endpoints
+
+def test_every_endpoint_stays_within_its_query_budget():
+    results = check_budgets(profile_endpoints(main.app))
+    assert results
+    over = {endpoint: problems for endpoint, _, _, problems in results if problems}
+    assert not over, "\n".join(f"{endpoint}: {'; '.join(problems)}" for endpoint, problems in over.items())
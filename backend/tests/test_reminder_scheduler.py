@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from database import SessionLocal
+from reminder_scheduler import ReminderScheduler, parse_offsets
+
+def scheduler():
+    return ReminderScheduler(
+        SessionLocal, parse_offsets("due_soon=-1440,overdue=0"), timedelta(hours=6), 60, 1000, timedelta(hours=24)
+    )
+
+def hours_ago(hours):
+    return (datetime.utcnow() - timedelta(hours=hours)).replace(microsecond=0)
+
+def reminders(client, headers):
+    return client.get("/reminders/", headers=headers).json()
+
+def test_restarts_never_fire_a_reminder_twice(client, login):
+    headers = login("reminded")
+    due = hours_ago(1)
+    client.post("/api/tasks/", json={"title": "Report", "due_date": due.isoformat()}, headers=headers)
+
+    first = scheduler()
+    first.run_once()
+    # Only "overdue" is still within the catch-up window; "due soon" was 25 hours ago
+    sent = reminders(client, headers)
+    assert [reminder["content"] for reminder in sent] == [f'Overdue: "Report" was due {due:%Y-%m-%d %H:%M} UTC']
+
+    # A restarted scheduler, or another worker, finds the same reminder due again
+    restarted = scheduler()
+    restarted.run_once()
+    first.run_once()
+    assert reminders(client, headers) == sent
+    assert restarted.duplicates >= 1 and restarted.errors == 0
+
+def test_changed_completed_and_deleted_tasks_are_skipped(client, login):
+    headers = login("rescheduled")
+    tasks = {
+        title: client.post("/api/tasks/", json={"title": title, "due_date": hours_ago(2).isoformat()}, headers=headers).json()
+        for title in ("Moved", "Done", "Gone")
+    }
+    # Entries queued for the original due date, as schedule() would have left them
+    entries = [(hours_ago(2), task["id"], "overdue", hours_ago(2)) for task in tasks.values()]
+    client.put(f"/api/tasks/{tasks['Moved']['id']}", json={"due_date": "2030-01-01"}, headers=headers)
+    client.patch(f"/api/tasks/{tasks['Done']['id']}/status", json={"status": "Completed"}, headers=headers)
+    client.delete(f"/api/tasks/{tasks['Gone']['id']}", headers=headers)
+
+    stale = scheduler()
+    assert stale.fire(entries) is True
+    assert (stale.fired, stale.stale) == (0, 3)
+    stale.run_once()
+    assert reminders(client, headers) == []
@@ -0,0 +1,70 @@
+def sync(client, headers, client_id="laptop", **params):
+    response = client.get("/api/sync/", params=dict(params, client_id=client_id), headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_changes_since_a_token_include_tombstones(client, login):
+    headers = login("syncer")
+    kept, changed, removed = [
+        client.post("/api/tasks/", json={"title": title}, headers=headers).json()["id"]
+        for title in ("Kept", "Changed", "Removed")
+    ]
+
+    snapshot = sync(client, headers)
+    assert snapshot["reset"] is True
+    assert {task["id"] for task in snapshot["tasks"]} == {kept, changed, removed}
+
+    # Added first: SQLite hands the highest deleted id out again
+    added = client.post("/api/tasks/", json={"title": "Added"}, headers=headers).json()["id"]
+    client.patch(f"/api/tasks/{changed}/status", json={"status": "Completed"}, headers=headers)
+    client.delete(f"/api/tasks/{removed}", headers=headers)
+    reminder = client.post("/reminders/", json={"content": "Call back"}, headers=headers).json()["id"]
+
+    delta = sync(client, headers, since=snapshot["token"])
+    assert delta["reset"] is False
+    assert int(delta["token"]) > int(snapshot["token"])
+    assert {task["id"]: task["status"] for task in delta["tasks"]} == {changed: "Completed", added: "Pending"}
+    assert [reminder_row["id"] for reminder_row in delta["reminders"]] == [reminder]
+    assert delta["deleted"] == [{"entity": "task", "id": removed}]
+
+    # Nothing changed since: an empty delta with the same token
+    empty = sync(client, headers, since=delta["token"])
+    assert (empty["reset"], empty["token"], empty["tasks"], empty["deleted"]) == (False, delta["token"], [], [])
+
+def test_large_deltas_come_in_pages(client, login):
+    headers = login("paged-syncer")
+    token = sync(client, headers)["token"]
+    created = {client.post("/api/tasks/", json={"title": f"Task {i}"}, headers=headers).json()["id"] for i in range(5)}
+
+    seen = set()
+    while True:
+        page = sync(client, headers, since=token, limit=2)
+        seen |= {task["id"] for task in page["tasks"]}
+        token = page["token"]
+        if not page["has_more"]:
+            break
+    assert seen == created
+
+def test_unusable_tokens_reset_the_client(client, login):
+    headers = login("stale-syncer")
+    client.post("/api/tasks/", json={"title": "First"}, headers=headers)
+    first = sync(client, headers)["token"]
+    client.post("/api/tasks/", json={"title": "Second"}, headers=headers)
+    second = sync(client, headers, since=first)["token"]
+    sync(client, headers, since=second)
+
+    # An older token than the client acknowledged, or a client the server has not seen
+    assert sync(client, headers, since=first)["reset"] is True
+    assert sync(client, headers, client_id="phone", since=second)["reset"] is True
+
+    response = client.get("/api/sync/", params={"client_id": "laptop", "since": "not-a-token"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid sync token"
+    assert client.get("/api/sync/", headers=headers).status_code == 422
+
+def test_other_users_changes_are_not_synced(client, login):
+    headers = login("private-syncer")
+    token = sync(client, headers)["token"]
+    client.post("/api/tasks/", json={"title": "Someone else's"}, headers=login("other-syncer"))
+    delta = sync(client, headers, since=token)
+    assert (delta["tasks"], delta["deleted"]) == ([], [])
@@ -0,0 +1,68 @@
+import threading
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+import main
+import models
+import task_counters
+from database import SessionLocal
+
+def test_concurrent_updates_of_one_task_keep_counters_exact():
+    with TestClient(main.app) as client:
+        client.post("/users/register", json={"username": "racer", "email": "racer@example.com", "password": "pw"})
+        token = client.post("/users/token", data={"username": "racer", "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        category = client.post("/api/categories/", json={"name": "Work", "color": "#2196F3"}, headers=headers).json()
+        task = client.post("/api/tasks/", json={"title": "Contended", "category_id": category["id"]}, headers=headers).json()
+
+        # Every thread moves the same task to the same status at once; each change may be
+        # counted only by the update that actually made it
+        threads = 8
+        barrier = threading.Barrier(threads)
+        statuses = []
+
+        def update(round_status, use_patch):
+            barrier.wait()
+            if use_patch:
+                response = client.patch(f"/api/tasks/{task['id']}/status", json={"status": round_status}, headers=headers)
+            else:
+                response = client.put(f"/api/tasks/{task['id']}", json={"status": round_status}, headers=headers)
+            statuses.append(response.status_code)
+
+        for round_status in ["Completed", "In Progress", "Completed", "Pending"] * 3:
+            workers = [threading.Thread(target=update, args=(round_status, i % 2)) for i in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+    assert set(statuses) == {200}
+    assert task_counters.main(["check"]) == 0
+
+def test_update_that_changes_nothing_keeps_the_completion_week():
+    with TestClient(main.app) as client:
+        client.post("/users/register", json={"username": "repeater", "email": "repeater@example.com", "password": "pw"})
+        token = client.post("/users/token", data={"username": "repeater", "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        task = client.post("/api/tasks/", json={"title": "Done long ago"}, headers=headers).json()
+        client.patch(f"/api/tasks/{task['id']}/status", json={"status": "Completed"}, headers=headers)
+
+        # Move the completion three weeks back and rebuild the rollup to match
+        three_weeks_ago = datetime.utcnow() - timedelta(days=21)
+        with SessionLocal() as db:
+            db.execute(
+                update(models.Task).where(models.Task.id == task["id"])
+                .values(created_at=three_weeks_ago, updated_at=three_weeks_ago)
+            )
+            db.commit()
+        assert task_counters.main(["rebuild", "--user", str(task["owner_id"])]) == 0
+
+        # Completing it again writes nothing, so it must stay in its original week
+        response = client.patch(f"/api/tasks/{task['id']}/status", json={"status": "Completed"}, headers=headers)
+        assert response.status_code == 200
+        response = client.put(f"/api/tasks/{task['id']}", json={"status": "Completed"}, headers=headers)
+        assert response.status_code == 200
+
+    assert task_counters.main(["check"]) == 0
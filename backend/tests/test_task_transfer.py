@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import task_counters
+
+def with_labels(client, headers):
+    category = client.post("/api/categories/", json={"name": "Work", "color": "#2196F3"}, headers=headers).json()
+    tags = [client.post("/api/tags/", json={"name": name, "color": "#F44336"}, headers=headers).json() for name in ("urgent", "later")]
+    return category, tags
+
+def exported(client, headers, format):
+    response = client.get("/api/tasks/export", params={"format": format}, headers=headers)
+    assert response.status_code == 200
+    return response.text
+
+def comparable(text):
+    # Ids and write times belong to the account the tasks were imported into
+    records = [json.loads(line) for line in text.splitlines()]
+    return [{key: value for key, value in record.items() if key not in ("id", "updated_at")} for record in records]
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_export_then_import_round_trips(client, login, format):
+    source = login(f"{format}-exporter")
+    category, tags = with_labels(client, source)
+    tasks = [
+        {"title": "Plain"},
+        {"title": "Quoted, \"with\" commas", "description": "Two\nlines", "priority": "High", "status": "Completed",
+         "due_date": "2030-05-01T09:30:00", "category_id": category["id"]},
+        {"title": "Tagged", "status": "In Progress"},
+    ]
+    ids = [client.post("/api/tasks/", json=task, headers=source).json()["id"] for task in tasks]
+    for tag in tags:
+        client.post(f"/api/tasks/{ids[2]}/tags/{tag['id']}", headers=source)
+
+    target = login(f"{format}-importer")
+    with_labels(client, target)
+    response = client.post("/api/tasks/import", params={"format": format}, content=exported(client, source, format), headers=target)
+    assert response.status_code == 200
+    assert response.json() == {"imported": 3, "failed": 0, "errors": []}
+
+    assert comparable(exported(client, target, "ndjson")) == comparable(exported(client, source, "ndjson"))
+    assert exported(client, target, "csv").count("\n") == exported(client, source, "csv").count("\n")
+    assert task_counters.main(["check"]) == 0
+
+def test_import_skips_and_reports_bad_rows(client, login):
+    headers = login("careless-importer")
+    with_labels(client, headers)
+    lines = [
+        {"title": "Good", "category": "Work", "tags": ["#urgent"]},
+        "{not json",
+        [1, 2],
+        {"description": "No title"},
+        {"title": "Lost", "category": "Nowhere"},
+        {"title": "Mislabeled", "tags": ["#missing"]},
+        {"title": "Late", "due_date": "someday"},
+        {"title": "Also good"},
+    ]
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+    response = client.post("/api/tasks/import", content=body, headers=headers)
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["imported"], result["failed"]) == (2, 6)
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4, 5, 6, 7]
+    assert result["errors"][3]["detail"] == "Unknown category 'Nowhere'"
+    titles = {task["title"] for task in client.get("/api/tasks/", headers=headers).json()}
+    assert titles == {"Good", "Also good"}
+
+def test_import_rejects_uploads_that_are_not_utf8(client, login):
+    headers = login("latin1-importer")
+    response = client.post("/api/tasks/import", params={"format": "csv"}, content="title\ncaf\xe9\n".encode("latin-1"), headers=headers)
+    assert response.status_code == 400
+    assert client.get("/api/tasks/", headers=headers).json() == []
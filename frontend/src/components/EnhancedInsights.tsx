@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { getInsights, InsightsResponse, HighPriorityTask, Activity, WeeklyInsights } from '../services/insightsService';
+import { subscribeToChanges } from '../services/eventsService';
 import { formatDistanceToNow } from 'date-fns';
 import { FiAlertCircle, FiCheckCircle, FiPlusCircle, FiTrendingUp, FiTrendingDown } from 'react-icons/fi';
 
@@ -22,6 +23,12 @@ const EnhancedInsights: React.FC = () => {
     };
 
     fetchInsights();
+    // Reload when tasks or categories change instead of polling
+    return subscribeToChanges((event) => {
+      if (event.changes.some((change) => change.entity === 'task' || change.entity === 'category')) {
+        fetchInsights();
+      }
+    }, fetchInsights);
   }, []);
 
   if (loading) return <div className="animate-pulse">Loading insights...</div>;
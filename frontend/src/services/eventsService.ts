@@ -0,0 +1,36 @@
+import { API_URL } from '../config/api';
+
+export interface EntityChange {
+  entity: 'task' | 'category' | 'tag' | 'reminder';
+  op: 'upsert' | 'delete';
+  ids: number[];
+}
+
+export interface ChangesEvent {
+  token: string;
+  changes: EntityChange[];
+}
+
+// Streams change notifications for the signed-in user; returns a function that closes the
+// stream. EventSource reconnects by itself (also after the server drops a client that fell
+// behind); changes made while disconnected are not replayed, so `onReconnect` should reload.
+export const subscribeToChanges = (
+  onChanges: (event: ChangesEvent) => void,
+  onReconnect?: () => void,
+): (() => void) => {
+  const token = localStorage.getItem('token');
+  const source = new EventSource(`${API_URL}/api/events/?access_token=${encodeURIComponent(token ?? '')}`);
+  let connected = false;
+
+  source.addEventListener('ready', () => {
+    if (connected && onReconnect) {
+      onReconnect();
+    }
+    connected = true;
+  });
+  source.addEventListener('changes', (message) => {
+    onChanges(JSON.parse((message as MessageEvent).data));
+  });
+
+  return () => source.close();
+};